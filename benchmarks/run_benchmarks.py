@@ -0,0 +1,271 @@
+"""python benchmarks/run_benchmarks.py results.json -compare benchmarks/baseline.json
+
+Time and peak memory of the samplers, the KD-tree sampling and the I/O paths
+of param_scan, swept over the dimension, the number of points and the number
+of rank output files. Runs offline with only the dependencies of param_scan.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+import numpy as np
+from param_scan.latin_hypercube import latin_hypercube, _format_inputs
+from param_scan.latin_hypercube_sampler import get_scipy_kdtree
+from param_scan.latin_hypercube_sampler import retrieve_lh_sample_indices
+from param_scan.helpers import write_param_chunk, cleanup_and_collate
+from param_scan.helpers import get_mpi_rank_outname
+
+SEED = 0
+
+
+def bench_latin_hypercube(n_dim, num_evaluations):
+    xmins, xmaxs = np.zeros(n_dim), np.ones(n_dim)
+
+    def run():
+        latin_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=SEED)
+
+    return None, run
+
+
+def bench_format_inputs(n_dim, num_evaluations, bounds):
+    """Per-point bounds when bounds is dense, and one scalar per dimension otherwise"""
+    if bounds == "dense":
+        rng = np.random.RandomState(SEED)
+        xmins = [rng.uniform(0, 1, num_evaluations) for __ in range(n_dim)]
+        xmaxs = [x + 1 for x in xmins]
+    else:
+        xmins, xmaxs = [0.0] * n_dim, [1.0] * n_dim
+
+    def run():
+        _format_inputs(xmins, xmaxs, n_dim, num_evaluations)
+
+    return None, run
+
+
+def bench_retrieve_lh_sample_indices(n_dim, n_batch, n_data=200_000):
+    rng = np.random.RandomState(SEED)
+    tree = get_scipy_kdtree(*rng.uniform(0, 1, (n_dim, n_data)))
+    xmins, xmaxs = np.zeros(n_dim), np.ones(n_dim)
+
+    def run():
+        retrieve_lh_sample_indices(tree, xmins, xmaxs, n_dim, n_batch, seed=SEED)
+
+    return None, run
+
+
+def bench_write_param_chunk(n_params, n_per_chunk):
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+    loss_arr = rng.uniform(0, 1, n_per_chunk)
+    drn = tempfile.mkdtemp()
+    outname = os.path.join(drn, "bench.0.0.dat")
+
+    def run():
+        write_param_chunk(outname, param_chunk, loss_arr)
+
+    return None, run, drn
+
+
+def bench_cleanup_and_collate(n_ranks, n_shards_per_rank, n_per_chunk=1_000):
+    """Collate the output files of a simulated scan with n_ranks ranks"""
+    n_params = 8
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+    loss_arr = rng.uniform(0, 1, n_per_chunk)
+    drn = tempfile.mkdtemp()
+    outname = os.path.join(drn, "bench.dat")
+
+    def setup():
+        for rank in range(n_ranks):
+            for ishard in range(n_shards_per_rank):
+                batch = rank * n_shards_per_rank + ishard
+                rank_outname = get_mpi_rank_outname(outname, rank, batch)
+                write_param_chunk(rank_outname, param_chunk, loss_arr)
+
+    def run():
+        cleanup_and_collate(outname)
+
+    return setup, run, drn
+
+
+# Each benchmark returns (setup, run), or (setup, run, drn) for benchmarks
+# writing into a temporary directory drn. setup, when not None, runs before
+# every timed call of run and is not included in the timing.
+BENCHMARKS = (
+    (bench_latin_hypercube, dict(n_dim=(2, 8, 32), num_evaluations=(1_000, 100_000))),
+    (
+        bench_format_inputs,
+        dict(
+            n_dim=(2, 8, 32),
+            num_evaluations=(1_000, 100_000),
+            bounds=("dense", "scalar"),
+        ),
+    ),
+    (bench_retrieve_lh_sample_indices, dict(n_dim=(2, 4), n_batch=(1_000, 50_000))),
+    (bench_write_param_chunk, dict(n_params=(8,), n_per_chunk=(1_000, 100_000))),
+    (bench_cleanup_and_collate, dict(n_ranks=(4, 32), n_shards_per_rank=(1, 16))),
+)
+
+
+def _time_benchmark(setup, run, n_repeat):
+    times = []
+    for __ in range(n_repeat):
+        if setup is not None:
+            setup()
+        start = perf_counter()
+        run()
+        times.append(perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    run()
+    __, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak_memory
+
+
+def run_benchmarks(n_repeat=3, pattern=None):
+    """Run every benchmark whose name contains pattern.
+
+    Returns
+    -------
+    results : dict
+        Keys are `name[param1=value1,param2=value2]`, values are dicts with
+        the best `time` in seconds out of n_repeat and the `peak_memory` in bytes
+        allocated by numpy and Python objects during a single run
+
+    """
+    results = dict()
+    for bench, grid in BENCHMARKS:
+        name = bench.__name__[len("bench_") :]
+        if pattern is not None and pattern not in name:
+            continue
+        keys = list(grid.keys())
+        for values in itertools.product(*(grid[key] for key in keys)):
+            params = dict(zip(keys, values))
+            out = bench(**params)
+            setup, run = out[:2]
+            try:
+                t, peak_memory = _time_benchmark(setup, run, n_repeat)
+            finally:
+                if len(out) > 2:
+                    shutil.rmtree(out[2])
+            label = ",".join("{0}={1}".format(*x) for x in params.items())
+            results["{0}[{1}]".format(name, label)] = dict(
+                time=t, peak_memory=peak_memory
+            )
+    return results
+
+
+def compare_to_baseline(
+    results, baseline, rtol=1.5, atol=5e-3, memory_rtol=1.5, memory_atol=2**20
+):
+    """Compare benchmark results to a baseline.
+
+    A benchmark regresses when its time is at least rtol times the baseline
+    and at least atol seconds longer, or when its peak memory is at least
+    memory_rtol times the baseline and at least memory_atol bytes larger.
+    The absolute floors keep the timing noise of sub-millisecond benchmarks
+    and small allocations from being flagged.
+
+    Returns
+    -------
+    regressions : list
+        Names of the regressed benchmarks
+
+    table : str
+        Time and peak memory of every benchmark common to results and baseline,
+        and their ratios to the baseline
+
+    """
+    regressions, lines = [], []
+    header = "{0:<70} {1:>10} {2:>10} {3:>8} {4:>10} {5:>10} {6:>8}"
+    lines.append(
+        header.format(
+            "benchmark", "time", "baseline", "ratio", "MiB", "baseline", "ratio"
+        )
+    )
+    msg = "{0:<70} {1:>10.4g} {2:>10.4g} {3:>8.2f} {4:>10.1f} {5:>10.1f} {6:>8.2f}"
+    for key in sorted(set(results) & set(baseline)):
+        t, t0 = results[key]["time"], baseline[key]["time"]
+        mem, mem0 = results[key]["peak_memory"], baseline[key]["peak_memory"]
+        ratio = t / t0
+        memory_ratio = mem / max(mem0, 1)
+        slower = (ratio >= rtol) & (t - t0 >= atol)
+        larger = (memory_ratio >= memory_rtol) & (mem - mem0 >= memory_atol)
+        if slower or larger:
+            regressions.append(key)
+        lines.append(
+            msg.format(key, t, t0, ratio, mem / 2**20, mem0 / 2**20, memory_ratio)
+        )
+    return regressions, "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("outname", help="Name of the output JSON file")
+    parser.add_argument(
+        "-n_repeat", help="Number of timed runs of each benchmark", type=int, default=3
+    )
+    parser.add_argument(
+        "-pattern", help="Only run the benchmarks whose name contains this string"
+    )
+    parser.add_argument(
+        "-compare",
+        help="Baseline JSON file written by a previous run. "
+        "Exit with status 1 if any benchmark regresses in time or peak memory",
+        default=None,
+    )
+    parser.add_argument(
+        "-rtol", help="Slowdown ratio flagged as a regression", type=float, default=1.5
+    )
+    parser.add_argument(
+        "-atol",
+        help="Slowdowns shorter than this many seconds are never flagged",
+        type=float,
+        default=5e-3,
+    )
+    parser.add_argument(
+        "-memory_rtol",
+        help="Ratio of peak memory flagged as a regression",
+        type=float,
+        default=1.5,
+    )
+    parser.add_argument(
+        "-memory_atol",
+        help="Increases of peak memory smaller than this many bytes are never flagged",
+        type=float,
+        default=2**20,
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(n_repeat=args.n_repeat, pattern=args.pattern)
+    with open(args.outname, "w") as fout:
+        json.dump(results, fout, indent=2, sort_keys=True)
+    for key, result in results.items():
+        msg = "{0:<70} {1:>10.4g} s {2:>10.1f} MiB"
+        print(msg.format(key, result["time"], result["peak_memory"] / 2**20))
+
+    if args.compare is not None:
+        with open(args.compare, "r") as fin:
+            baseline = json.load(fin)
+        regressions, table = compare_to_baseline(
+            results,
+            baseline,
+            rtol=args.rtol,
+            atol=args.atol,
+            memory_rtol=args.memory_rtol,
+            memory_atol=args.memory_atol,
+        )
+        print("\n" + table)
+        if len(regressions) > 0:
+            print("\nRegressions against {0}:".format(args.compare))
+            for key in regressions:
+                print("    " + key)
+            sys.exit(1)
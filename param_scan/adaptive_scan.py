@@ -0,0 +1,167 @@
+"""Functions refining a parameter scan around the points with the lowest loss"""
+import numpy as np
+from .latin_hypercube import latin_hypercube, latin_hypercube_from_cov
+from .latin_hypercube import get_cov_transform
+
+
+def select_best_k(params, loss, k):
+    """Select the k points with the lowest loss.
+
+    Parameters
+    ----------
+    params : ndarray of shape (n, n_params)
+
+    loss : ndarray of shape (n, )
+
+    k : int
+
+    Returns
+    -------
+    best_params : ndarray of shape (min(k, n), n_params)
+
+    best_loss : ndarray of shape (min(k, n), )
+        Sorted in ascending order
+
+    """
+    k = min(k, loss.size)
+    indx = np.argpartition(loss, k - 1)[:k] if k < loss.size else np.arange(k)
+    indx = indx[np.argsort(loss[indx], kind="stable")]
+    return params[indx], loss[indx]
+
+
+def gather_best_k(comm, params, loss, k):
+    """Select the k points with the lowest loss across all ranks of comm.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+
+    params : ndarray of shape (n, n_params)
+        Points of this rank
+
+    loss : ndarray of shape (n, )
+
+    k : int
+
+    Returns
+    -------
+    best_params : ndarray of shape (k, n_params)
+        Identical on every rank
+
+    best_loss : ndarray of shape (k, )
+        Sorted in ascending order
+
+    """
+    best_params, best_loss = select_best_k(params, loss, k)
+    collector = comm.allgather((best_params, best_loss))
+    all_params = np.concatenate([x[0] for x in collector])
+    all_loss = np.concatenate([x[1] for x in collector])
+    return select_best_k(all_params, all_loss, k)
+
+
+def get_refinement_distribution(best_params, min_sigma=0.0):
+    """Estimate the mean and covariance of the points with the lowest loss.
+
+    Parameters
+    ----------
+    best_params : ndarray of shape (k, n_params)
+
+    min_sigma : float or ndarray of shape (n_params, ), optional
+        Added in quadrature to the diagonal of the covariance, so that the
+        covariance stays positive definite when k <= n_params or when the
+        best points coincide in some dimension. When k = 1, the covariance
+        of the best points is taken to be zero, so that only min_sigma remains.
+        Default is 0.
+
+    Returns
+    -------
+    mu : ndarray of shape (n_params, )
+
+    cov : ndarray of shape (n_params, n_params)
+
+    """
+    mu = np.mean(best_params, axis=0)
+    if best_params.shape[0] < 2:
+        cov = np.zeros((mu.size, mu.size))
+    else:
+        cov = np.atleast_2d(np.cov(best_params, rowvar=False))
+    cov[np.diag_indices_from(cov)] += np.zeros_like(mu) + np.square(min_sigma)
+    return mu, cov
+
+
+def _get_refinement_sample_seeds(seed, n_seeds):
+    """The first seed is seed itself, so that the sample is unchanged whenever
+    the first draw lies within the bounds"""
+    rng = np.random.default_rng(seed)
+    return [seed] + [int(x) for x in rng.integers(0, 2**31, n_seeds - 1)]
+
+
+def sample_refinement_round(
+    mu, cov, sig, num_evaluations, xmins, xmaxs, seed=None, max_draws=4, transform=None
+):
+    """Generate a latin hypercube in the eigenbasis of cov, restricted to the bounds.
+
+    Points of the box around mu that fall outside the bounds are rejected and
+    replaced by new draws, rather than clipped onto the faces of the bounds,
+    which would create duplicate coordinates and waste loss evaluations.
+
+    Parameters
+    ----------
+    mu : ndarray of shape (n_params, )
+
+    cov : ndarray of shape (n_params, n_params)
+        Not used when transform is passed, in which case it can be None
+
+    sig : float or ndarray of shape (n_params, )
+        Number of sigma used to define the box length
+
+    num_evaluations : int
+        Number of points in sample
+
+    xmins : ndarray of shape (n_params, )
+        Lower bound of the scan in each dimension
+
+    xmaxs : ndarray of shape (n_params, )
+        Upper bound of the scan in each dimension
+
+    seed : int, optional
+        Random number seed
+
+    max_draws : int, optional
+        Maximum number of latin hypercubes drawn, each one larger by the inverse
+        of the fraction of the previous one within the bounds, up to 64 times
+        num_evaluations. Any points still missing are drawn from a latin hypercube
+        spanning the intersection of the bounds with the axis-aligned bounding
+        box of the rotated box. Default is 4.
+
+    transform : ndarray of shape (n_params, n_params), optional
+        Output of get_cov_transform(cov). Computing it once per round and
+        passing it to every call avoids a decomposition of cov per chunk.
+        Default is get_cov_transform(cov).
+
+    Returns
+    -------
+    sample : ndarray of shape (num_evaluations, n_params)
+
+    """
+    if transform is None:
+        transform = get_cov_transform(cov)
+    collector, n_found, n_draw = [], 0, num_evaluations
+    for draw_seed in _get_refinement_sample_seeds(seed, max_draws):
+        sample = latin_hypercube_from_cov(
+            mu, cov, sig, n_draw, seed=draw_seed, transform=transform
+        )
+        inside = np.all((sample >= xmins) & (sample <= xmaxs), axis=1)
+        collector.append(sample[inside][: num_evaluations - n_found])
+        n_found += collector[-1].shape[0]
+        if n_found == num_evaluations:
+            return np.concatenate(collector)
+        n_missing = num_evaluations - n_found
+        frac_inside = max(inside.mean(), 1.0 / 64)
+        n_draw = int(np.ceil(1.1 * n_missing / frac_inside))
+
+    half_width = np.sum(np.abs(transform) * (np.zeros_like(mu) + sig)[:, None], axis=0)
+    lo = np.maximum(xmins, mu - half_width)
+    hi = np.minimum(xmaxs, mu + half_width)
+    collector.append(latin_hypercube(lo, hi, mu.size, n_missing, seed=draw_seed))
+    return np.concatenate(collector)
@@ -0,0 +1,72 @@
+"""Overlap the output of a parameter scan with the evaluation of the next chunks"""
+import queue
+import threading
+
+
+class BackgroundWriter:
+    """Run write calls in order on a background thread fed by a bounded queue.
+
+    With the default max_pending=1, one chunk can be written while the next chunk
+    is computed and queued, so at most two chunks are held in memory at once.
+    When the queue is full, submit blocks until the write in progress finishes.
+
+    Parameters
+    ----------
+    max_pending : int, optional
+        Number of queued writes beyond the write in progress. Default is 1.
+
+    Notes
+    -----
+    The arrays passed to submit must not be modified afterwards. The samplers
+    and loss evaluators of param_scan return new arrays for every chunk.
+
+    An exception raised by a write stops the thread. It is re-raised by the next
+    call to submit, or by close, and later writes are not attempted.
+
+    """
+
+    def __init__(self, max_pending=1):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self.results = []
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            if self._error is not None:
+                continue
+            write_fn, args = task
+            try:
+                self.results.append(write_fn(*args))
+            except BaseException as error:
+                self._error = error
+
+    def _raise_error(self):
+        if self._error is not None:
+            msg = "Background write failed, see the exception above"
+            raise RuntimeError(msg) from self._error
+
+    def submit(self, write_fn, *args):
+        """Queue the call write_fn(*args), blocking while the queue is full.
+        The return value of each call is appended to the results attribute."""
+        self._raise_error()
+        self._queue.put((write_fn, args))
+
+    def close(self):
+        """Wait for every queued write to finish, and raise the first write error.
+
+        Returns
+        -------
+        results : list
+            Return values of the completed write calls, in submission order
+
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+        return self.results
@@ -0,0 +1,159 @@
+"""Functions generating the chunks of parameters of a parameter scan"""
+import numpy as np
+from .latin_hypercube import latin_hypercube, sobol_hypercube, halton_hypercube
+from .latin_hypercube import latin_hypercube_batch
+from .latin_hypercube_stream import latin_hypercube_block
+
+
+CHUNK_SAMPLERS = ("lhs", "fast_lhs", "global_lhs", "sobol", "halton")
+PREFETCH_MAX_BYTES = 2**24
+
+
+def get_chunk_sampler(
+    sampler, xmins, xmaxs, n_chunks, n_per_chunk, seed=0, prefetch=1, last_chunk=None
+):
+    """Get a function that generates the parameters of each chunk of a scan.
+
+    Parameters
+    ----------
+    sampler : str
+        One of the following:
+            `lhs`, for an independent latin hypercube in each chunk
+            seeded by the chunk index
+            `fast_lhs`, like `lhs` but generated with latin_hypercube_batch,
+            several chunks at a time when prefetch > 1
+            `global_lhs`, for chunks that are disjoint blocks of
+            a single latin hypercube spanning the entire scan
+            `sobol` or `halton`, for chunks that are disjoint contiguous slices of
+            a single scrambled low-discrepancy sequence spanning the entire scan
+
+    xmins : sequence of length n_dim
+        Lower bound on each dimension
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension
+
+    n_chunks : int
+        Total number of chunks in the scan across all ranks
+
+    n_per_chunk : int
+        Number of points in each chunk
+
+    seed : int, optional
+        Random number seed of the global design. Not used by `lhs` and `fast_lhs`.
+
+    prefetch : int, optional
+        Only used by `fast_lhs`. When chunk ichunk is not already generated, the
+        chunks ichunk, ichunk+1, ... up to prefetch chunks are generated at once,
+        which pays off when chunks are requested in increasing order, as with
+        the static schedule. The chunks generated at once take at most
+        PREFETCH_MAX_BYTES. Each chunk only depends on its index. Default is 1.
+
+    last_chunk : int, optional
+        Only used by `fast_lhs`. Prefetching never generates chunks past this
+        index, such as the last chunk assigned to a rank by the static schedule.
+        Default is n_chunks - 1.
+
+    Returns
+    -------
+    sample_chunk : callable
+        Function with signature sample_chunk(ichunk) returning
+        an ndarray of shape (n_per_chunk, n_dim)
+
+    """
+    n_dim = len(xmins)
+    if sampler == "lhs":
+
+        def sample_chunk(ichunk):
+            return latin_hypercube(xmins, xmaxs, n_dim, n_per_chunk, seed=ichunk)
+
+    elif sampler == "fast_lhs":
+        chunk_bytes = 2 * 8 * n_per_chunk * n_dim
+        prefetch = max(1, min(prefetch, PREFETCH_MAX_BYTES // chunk_bytes))
+        istop = n_chunks if last_chunk is None else last_chunk + 1
+        prefetched = dict()
+
+        # Chunks stay available until the next block is generated, so that
+        # a chunk requested twice, as when probing the loss, is generated once
+        def sample_chunk(ichunk):
+            if ichunk not in prefetched:
+                prefetched.clear()
+                iend = max(ichunk + 1, min(ichunk + prefetch, istop))
+                seeds = np.arange(ichunk, iend)
+                chunks = latin_hypercube_batch(xmins, xmaxs, n_dim, n_per_chunk, seeds)
+                prefetched.update(zip(seeds.tolist(), chunks))
+            return prefetched[ichunk]
+
+    elif sampler == "global_lhs":
+        num_evaluations = n_chunks * n_per_chunk
+
+        def sample_chunk(ichunk):
+            return latin_hypercube_block(
+                xmins, xmaxs, n_dim, num_evaluations, n_per_chunk, ichunk, seed
+            )
+
+    elif sampler in ("sobol", "halton"):
+        qmc_hypercube = sobol_hypercube if sampler == "sobol" else halton_hypercube
+
+        def sample_chunk(ichunk):
+            skip = ichunk * n_per_chunk
+            return qmc_hypercube(
+                xmins, xmaxs, n_dim, n_per_chunk, seed=seed, skip=skip
+            )
+
+    else:
+        msg = "sampler = {0} must be one of {1}"
+        raise ValueError(msg.format(sampler, CHUNK_SAMPLERS))
+
+    return sample_chunk
+
+
+def get_chunk_offsets(sampler, n_chunks, n_per_chunk, seed=0):
+    """Describe how get_chunk_sampler derives each chunk of the scan, so that any
+    chunk can be regenerated from the metadata of the scan alone.
+
+    Parameters
+    ----------
+    sampler : str
+        One of CHUNK_SAMPLERS
+
+    n_chunks : int
+
+    n_per_chunk : int
+
+    seed : int, optional
+        Random number seed of the global design. Default is 0.
+
+    Returns
+    -------
+    offsets : dict
+        JSON-serializable dict with the constants of the sampler, and the offset
+        of each chunk as a formula of the chunk index ichunk and these constants,
+        so that its size does not grow with n_chunks:
+            `lhs` and `fast_lhs`: `chunk_seed`, the seed of each chunk passed to
+            latin_hypercube or latin_hypercube_batch, respectively
+            `global_lhs`: the `seed` and `num_evaluations` of the design,
+            whose permutations are drawn from seed, and `row_offset`,
+            the first row of the design in each chunk of `n_per_chunk` rows
+            `sobol` and `halton`: the `seed` of the scrambling, and `skip`,
+            the number of points of the sequence skipped before each chunk
+            of `n_per_chunk` points
+
+    """
+    n_chunks, n_per_chunk = int(n_chunks), int(n_per_chunk)
+    if sampler in ("lhs", "fast_lhs"):
+        return dict(chunk_seed="ichunk")
+    elif sampler == "global_lhs":
+        return dict(
+            seed=int(seed),
+            num_evaluations=n_chunks * n_per_chunk,
+            n_per_chunk=n_per_chunk,
+            row_offset="ichunk * n_per_chunk",
+        )
+    elif sampler in ("sobol", "halton"):
+        return dict(
+            seed=int(seed), n_per_chunk=n_per_chunk, skip="ichunk * n_per_chunk"
+        )
+    else:
+        msg = "sampler = {0} must be one of {1}"
+        raise ValueError(msg.format(sampler, CHUNK_SAMPLERS))
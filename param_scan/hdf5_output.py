@@ -0,0 +1,377 @@
+"""Write the results of a parameter scan into a single shared HDF5 file"""
+import os
+import glob
+import json
+import warnings
+import numpy as np
+
+try:
+    import h5py
+
+    HAS_H5PY = True
+    HAS_PARALLEL_H5PY = h5py.get_config().mpi
+except ImportError:
+    HAS_H5PY = False
+    HAS_PARALLEL_H5PY = False
+
+
+PARAMS_KEY = "params"
+LOSS_KEY = "loss"
+CHUNK_DONE_KEY = "chunk_done"
+METADATA_KEY = "metadata"
+SHARD_CHUNKS_KEY = "ichunk"
+
+
+def _create_datasets(
+    f, n_chunks, n_per_chunk, n_params, param_dtype="f8", loss_dtype="f8"
+):
+    """Datasets are contiguous and uncompressed, so that once written their data
+    can be memory-mapped by readers at the offsets reported by h5py.
+
+    The params and loss datasets are never filled, since writing a fill value
+    would write the entire preallocated file before the first chunk. Rows of
+    chunks that are not marked in the chunk_done dataset are undefined.
+    """
+    n_rows = n_chunks * n_per_chunk
+    params_shape = (n_rows, n_params)
+    f.create_dataset(PARAMS_KEY, params_shape, dtype=param_dtype, fill_time="never")
+    f.create_dataset(LOSS_KEY, (n_rows,), dtype=loss_dtype, fill_time="never")
+    f.create_dataset(CHUNK_DONE_KEY, (n_chunks,), dtype=bool, fillvalue=False)
+
+
+def _verify_datasets(
+    f, n_chunks, n_per_chunk, n_params, param_dtype="f8", loss_dtype="f8"
+):
+    n_rows = n_chunks * n_per_chunk
+    msg = "Existing file {0} has {1} of {2} {3}, expected {4}"
+    correct_layouts = (
+        (PARAMS_KEY, (n_rows, n_params), param_dtype),
+        (LOSS_KEY, (n_rows,), loss_dtype),
+        (CHUNK_DONE_KEY, (n_chunks,), bool),
+    )
+    for key, correct_shape, correct_dtype in correct_layouts:
+        shape = f[key].shape
+        assert shape == correct_shape, msg.format(
+            f.filename, key, "shape", shape, correct_shape
+        )
+        dtype, correct_dtype = f[key].dtype, np.dtype(correct_dtype)
+        assert dtype == correct_dtype, msg.format(
+            f.filename, key, "dtype", dtype, correct_dtype
+        )
+
+
+def _write_metadata(f, metadata):
+    if metadata is not None:
+        f.attrs[METADATA_KEY] = json.dumps(metadata)
+
+
+def _write_hyperslab(f, ichunk, istart, iend, param_chunk, loss_arr):
+    f[PARAMS_KEY][istart:iend] = param_chunk
+    f[LOSS_KEY][istart:iend] = loss_arr
+    f[CHUNK_DONE_KEY][ichunk] = True
+
+
+def get_hdf5_shard_fname(fname, rank):
+    """Name of the file into which rank writes its chunks of fname
+    when h5py is not built with MPI support"""
+    return "{0}.rank{1}.h5".format(fname, rank)
+
+
+def _get_hdf5_shard_fnames(fname):
+    return sorted(glob.glob(glob.escape(fname) + ".rank*.h5"))
+
+
+def _create_shard(fname, n_per_chunk, n_params, param_dtype, loss_dtype):
+    f = h5py.File(fname, "w")
+    chunks = (n_per_chunk, n_params)
+    f.create_dataset(
+        PARAMS_KEY, (0, n_params), param_dtype, maxshape=(None, n_params), chunks=chunks
+    )
+    f.create_dataset(
+        LOSS_KEY, (0,), loss_dtype, maxshape=(None,), chunks=(n_per_chunk,)
+    )
+    f.create_dataset(SHARD_CHUNKS_KEY, (0,), "i8", maxshape=(None,), chunks=(1024,))
+    return f
+
+
+def _append_to_shard(f, ichunk, param_chunk, loss_arr):
+    """The chunk index is appended last and flushed, so that a shard left by an
+    interrupted scan only lists chunks whose rows were written in full"""
+    n_written = f[SHARD_CHUNKS_KEY].shape[0]
+    n_per_chunk = loss_arr.shape[0]
+    istart, iend = n_written * n_per_chunk, (n_written + 1) * n_per_chunk
+    for key, arr in ((PARAMS_KEY, param_chunk), (LOSS_KEY, loss_arr)):
+        f[key].resize(iend, axis=0)
+        f[key][istart:iend] = arr
+    f.flush()
+    f[SHARD_CHUNKS_KEY].resize(n_written + 1, axis=0)
+    f[SHARD_CHUNKS_KEY][n_written] = ichunk
+    f.flush()
+
+
+def _collate_shard(f, shard_fname, n_per_chunk, skip_unreadable=False):
+    """Copy the chunks of a shard into their hyperslabs of f, and remove the shard
+    once the copy is flushed. Errors writing into f propagate and keep the shard.
+
+    With skip_unreadable, a shard that cannot be opened is removed with a warning,
+    since a shard whose creation was interrupted holds no complete chunk.
+    """
+    try:
+        shard = h5py.File(shard_fname, "r")
+    except OSError:
+        if not skip_unreadable:
+            raise
+        msg = "Removing unreadable HDF5 shard {0} of an interrupted scan"
+        warnings.warn(msg.format(shard_fname))
+        os.remove(shard_fname)
+        return
+
+    with shard:
+        ichunks = []
+        if SHARD_CHUNKS_KEY in shard:
+            ichunks = shard[SHARD_CHUNKS_KEY][...]
+        for i, ichunk in enumerate(ichunks):
+            rows = slice(i * n_per_chunk, (i + 1) * n_per_chunk)
+            param_chunk = shard[PARAMS_KEY][rows]
+            loss_arr = shard[LOSS_KEY][rows]
+            istart = ichunk * n_per_chunk
+            iend = istart + n_per_chunk
+            _write_hyperslab(f, ichunk, istart, iend, param_chunk, loss_arr)
+    f.flush()
+    os.remove(shard_fname)
+
+
+def _run_on_root(comm, func, msg):
+    """Call func on rank 0 of comm, and raise on every rank if it fails,
+    so that the other ranks do not wait forever in the next collective"""
+    error = None
+    if comm.Get_rank() == 0:
+        try:
+            func()
+        except Exception as e:
+            error = e
+    failed = comm.bcast(error is not None, root=0)
+    if error is not None:
+        raise error
+    if failed:
+        raise RuntimeError(msg)
+
+
+class HDF5ScanWriter:
+    """Preallocated HDF5 file into which each rank writes its chunks of the scan.
+
+    Chunk ichunk occupies rows [ichunk*n_per_chunk, (ichunk+1)*n_per_chunk)
+    of the params and loss datasets, so ranks write disjoint hyperslabs in any
+    order and there is no collation step. The datasets are not filled, so rows
+    of chunks that were not written are undefined, and the boolean chunk_done
+    dataset marks the chunks written in full.
+
+    When h5py is built with MPI support, the file is opened collectively with
+    the mpio driver and each rank writes independently. Otherwise, rank 0
+    creates the file, each rank appends its chunks to its own shard file named
+    by get_hdf5_shard_fname, and close copies the shards into the file.
+    No file locks are needed, as these are unreliable on the network
+    filesystems used for large scans.
+
+    Parameters
+    ----------
+    fname : str
+        Name of the output HDF5 file
+
+    comm : mpi4py.MPI.Comm
+
+    n_chunks : int
+        Total number of chunks in the scan across all ranks
+
+    n_per_chunk : int
+        Number of points in each chunk
+
+    n_params : int
+        Number of parameters
+
+    use_mpio : bool, optional
+        Use the mpio driver. Default is to use it whenever h5py supports it.
+
+    resume : bool, optional
+        If True and fname already exists, reopen it after checking that its
+        datasets have the expected shapes, rather than overwriting it.
+        The shards left by an interrupted scan without the mpio driver are
+        copied into the file first. Default is False.
+
+    param_dtype, loss_dtype : str or np.dtype, optional
+        Dtypes of the params and loss datasets. Default is float64 for both.
+        Passing float32 for param_dtype halves the size of the params dataset.
+
+    metadata : dict, optional
+        JSON-serializable description of the scan, such as the parameter names,
+        bounds, seeds and sampler settings, stored as a JSON string in the
+        `metadata` attribute of the file. Not used when resuming a scan.
+
+    Notes
+    -----
+    The constructor and close method are collective over comm.
+    Calls to write_chunk are not.
+
+    """
+
+    def __init__(
+        self,
+        fname,
+        comm,
+        n_chunks,
+        n_per_chunk,
+        n_params,
+        use_mpio=None,
+        resume=False,
+        param_dtype="f8",
+        loss_dtype="f8",
+        metadata=None,
+    ):
+        if not HAS_H5PY:
+            raise ImportError("Must have h5py installed to use HDF5ScanWriter")
+        if use_mpio is None:
+            use_mpio = HAS_PARALLEL_H5PY
+        elif use_mpio and not HAS_PARALLEL_H5PY:
+            raise ValueError("h5py is not built with MPI support")
+
+        self.fname = fname
+        self.comm = comm
+        self.n_chunks = n_chunks
+        self.n_per_chunk = n_per_chunk
+        self.n_params = n_params
+        self.use_mpio = use_mpio
+        self.param_dtype = param_dtype
+        self.loss_dtype = loss_dtype
+        self.shard_fname = get_hdf5_shard_fname(fname, comm.Get_rank())
+        self._shard = None
+
+        shape_args = n_chunks, n_per_chunk, n_params
+        exists = resume and os.path.exists(fname)
+        mode = "r+" if exists else "w"
+        if self.use_mpio:
+            self._file = h5py.File(fname, mode, driver="mpio", comm=comm)
+            if exists:
+                _verify_datasets(self._file, *shape_args, param_dtype, loss_dtype)
+            else:
+                _create_datasets(self._file, *shape_args, param_dtype, loss_dtype)
+                _write_metadata(self._file, metadata)
+        else:
+            self._file = None
+
+            def create_file():
+                with h5py.File(fname, mode) as f:
+                    if exists:
+                        _verify_datasets(f, *shape_args, param_dtype, loss_dtype)
+                    else:
+                        _create_datasets(f, *shape_args, param_dtype, loss_dtype)
+                        _write_metadata(f, metadata)
+                    for shard_fname in _get_hdf5_shard_fnames(fname):
+                        if exists:
+                            _collate_shard(
+                                f, shard_fname, n_per_chunk, skip_unreadable=True
+                            )
+                        else:
+                            os.remove(shard_fname)
+
+            msg = "Rank 0 failed to create or resume {0}".format(fname)
+            _run_on_root(comm, create_file, msg)
+
+    def write_chunk(self, ichunk, param_chunk, loss_arr):
+        """Write the parameters and loss of a single chunk into its hyperslab,
+        or append them to the shard of this rank without the mpio driver.
+
+        Parameters
+        ----------
+        ichunk : int
+            Index of the chunk in the range [0, n_chunks)
+
+        param_chunk : ndarray of shape (n_per_chunk, n_params)
+
+        loss_arr : ndarray of shape (n_per_chunk, )
+
+        """
+        msg = "For ichunk = {0}, param_chunk shape = {1} and loss shape = {2}"
+        msg = msg.format(ichunk, np.shape(param_chunk), np.shape(loss_arr))
+        assert np.shape(param_chunk) == (self.n_per_chunk, self.n_params), msg
+        assert np.shape(loss_arr) == (self.n_per_chunk,), msg
+        assert 0 <= ichunk < self.n_chunks, msg
+
+        if self.use_mpio:
+            istart = ichunk * self.n_per_chunk
+            iend = istart + self.n_per_chunk
+            _write_hyperslab(self._file, ichunk, istart, iend, param_chunk, loss_arr)
+        else:
+            if self._shard is None:
+                self._shard = _create_shard(
+                    self.shard_fname,
+                    self.n_per_chunk,
+                    self.n_params,
+                    self.param_dtype,
+                    self.loss_dtype,
+                )
+            _append_to_shard(self._shard, ichunk, param_chunk, loss_arr)
+
+    def read_chunk(self, ichunk):
+        """Read the parameters and loss of a chunk written before a resumed scan
+        started, i.e., one of the chunks returned by get_completed_chunks
+        when the writer was created.
+
+        Parameters
+        ----------
+        ichunk : int
+
+        Returns
+        -------
+        param_chunk : ndarray of shape (n_per_chunk, n_params)
+
+        loss_arr : ndarray of shape (n_per_chunk, )
+
+        """
+        rows = slice(ichunk * self.n_per_chunk, (ichunk + 1) * self.n_per_chunk)
+        if self.use_mpio:
+            return self._file[PARAMS_KEY][rows], self._file[LOSS_KEY][rows]
+        with h5py.File(self.fname, "r") as f:
+            return f[PARAMS_KEY][rows], f[LOSS_KEY][rows]
+
+    def get_completed_chunks(self):
+        """Indices of the chunks that have already been written.
+
+        Returns
+        -------
+        ichunks : ndarray of int
+            Chunks whose hyperslab was written in full, including chunks
+            written before a resumed scan started. Without the mpio driver,
+            only the chunks of the shard of this rank are included
+            among those written since the scan started.
+
+        """
+        if self.use_mpio:
+            return np.flatnonzero(self._file[CHUNK_DONE_KEY][...])
+
+        with h5py.File(self.fname, "r") as f:
+            chunk_done = f[CHUNK_DONE_KEY][...]
+        if self._shard is not None:
+            chunk_done[self._shard[SHARD_CHUNKS_KEY][...]] = True
+        return np.flatnonzero(chunk_done)
+
+    def close(self):
+        """Close the file, copying the shards of every rank into it
+        without the mpio driver. Collective over comm."""
+        if self.use_mpio:
+            self._file.close()
+            return
+
+        if self._shard is not None:
+            self._shard.close()
+            self._shard = None
+        self.comm.Barrier()
+
+        def collate_shards():
+            with h5py.File(self.fname, "r+") as f:
+                for rank in range(self.comm.Get_size()):
+                    shard_fname = get_hdf5_shard_fname(self.fname, rank)
+                    if os.path.exists(shard_fname):
+                        _collate_shard(f, shard_fname, self.n_per_chunk)
+
+        msg = "Rank 0 failed to copy the HDF5 shards into {0}".format(self.fname)
+        _run_on_root(self.comm, collate_shards, msg)
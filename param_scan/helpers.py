@@ -1,9 +1,9 @@
 """
 """
 import os
+import re
+import warnings
 import numpy as np
-from glob import glob
-from subprocess import check_output, CalledProcessError
 
 
 def get_parallel_outbase_pattern(fn):
@@ -41,7 +41,72 @@ def get_equal_sized_data_chunks(n_tot, n_ranks, n_cube_max):
     return n_cubes, n_per_cube
 
 
-def write_param_chunk(outname, param_chunk, loss_arr):
+PARAMS_FIELD = "params"
+LOSS_FIELD = "loss"
+# Size of the buffer through which write_param_chunk writes each file
+WRITE_BUFFER_BYTES = 2**22
+
+
+def get_result_dtype(n_params, param_dtype="f4", loss_dtype="f8"):
+    """Structured dtype of a row of the compact result format.
+
+    Parameters
+    ----------
+    n_params : int
+
+    param_dtype : str or np.dtype, optional
+        Default is float32
+
+    loss_dtype : str or np.dtype, optional
+        Default is float64
+
+    Returns
+    -------
+    dtype : np.dtype
+        Fields are `params`, of shape (n_params, ), and `loss`
+
+    """
+    return np.dtype(
+        [(PARAMS_FIELD, param_dtype, (n_params,)), (LOSS_FIELD, loss_dtype)]
+    )
+
+
+def _get_chunk_layout(n_per_chunk, n_params, param_dtype=None, loss_dtype="f8"):
+    """Shape and dtype of the array stored by write_param_chunk"""
+    if param_dtype is None:
+        return (n_per_chunk, n_params + 1), np.dtype("f8")
+    return (n_per_chunk,), get_result_dtype(n_params, param_dtype, loss_dtype)
+
+
+def write_param_chunk(
+    outname, param_chunk, loss_arr, param_dtype=None, loss_dtype="f8"
+):
+    """Write the parameters and loss of a chunk to a .npy file.
+
+    Parameters
+    ----------
+    outname : str
+        As with np.save, the `.npy` extension is appended if not already present
+
+    param_chunk : ndarray of shape (n_chunk, n_params)
+
+    loss_arr : ndarray of shape (n_chunk, )
+
+    param_dtype : str or np.dtype, optional
+        If None, the default, the file stores a float64 array of shape
+        (n_chunk, n_params+1) whose last column is the loss. Otherwise the file
+        stores an array of shape (n_chunk, ) with dtype get_result_dtype, and
+        params and loss are cast directly into their fields.
+
+    loss_dtype : str or np.dtype, optional
+        Only used when param_dtype is not None. Default is float64.
+
+    Returns
+    -------
+    fname : str
+        Name of the file written, including the `.npy` extension
+
+    """
     n_chunk, n_params = param_chunk.shape
     n_loss = loss_arr.size
     msg = (
@@ -49,29 +114,180 @@ def write_param_chunk(outname, param_chunk, loss_arr):
         "mismatch in number of loss evaluations = {1} vs param_chunk shape = {2}"
     )
     assert n_loss == n_chunk, msg.format(outname, n_loss, param_chunk.shape)
-    output_data = np.zeros((n_chunk, n_params + 1))
-    output_data[:, :-1] = param_chunk
-    output_data[:, -1] = loss_arr
-    np.save(outname, output_data)
+    shape, dtype = _get_chunk_layout(n_chunk, n_params, param_dtype, loss_dtype)
+
+    # Write to a temporary file first so that an interrupted write
+    # never leaves behind a truncated file with the final name
+    if not outname.endswith(".npy"):
+        outname = outname + ".npy"
+    tmp_outname = outname + ".tmp"
+    with open(tmp_outname, "wb") as fout:
+        header = dict(
+            descr=np.lib.format.dtype_to_descr(dtype), fortran_order=False, shape=shape
+        )
+        np.lib.format.write_array_header_1_0(fout, header)
+        # Rows are cast into a small reusable buffer and written a block at a time,
+        # rather than assembling the entire output in memory
+        row_bytes = dtype.itemsize * int(np.prod(shape[1:]))
+        n_block = max(1, min(n_chunk, WRITE_BUFFER_BYTES // row_bytes))
+        buffer = np.empty((n_block, *shape[1:]), dtype=dtype)
+        for istart in range(0, n_chunk, n_block):
+            iend = min(istart + n_block, n_chunk)
+            block = buffer[: iend - istart]
+            if param_dtype is None:
+                block[:, :-1] = param_chunk[istart:iend]
+                block[:, -1] = loss_arr[istart:iend]
+            else:
+                block[PARAMS_FIELD] = param_chunk[istart:iend]
+                block[LOSS_FIELD] = loss_arr[istart:iend]
+            block.tofile(fout)
+    os.replace(tmp_outname, outname)
+    return outname
 
 
-def cleanup_and_collate(outname):
+def _get_rank_shards(outname):
     drn = os.path.dirname(outname)
-    _bnpat = get_parallel_outbase_pattern(outname)
-    i = _bnpat.find("*")
-    j = _bnpat.find("*", i + 1)
-    bpat = _bnpat[: j + 1]
-    fnpat = os.path.join(drn, bpat)
-    rank_fnames = glob(fnpat)
+    bnpat = re.escape(get_parallel_outbase_pattern(outname))
+    bnpat = bnpat.replace(re.escape("*"), r"(\d+)") + r"(?:\.npy)?"
+    bnregex = re.compile(bnpat)
+
     collector = []
+    for bn in os.listdir(drn or "."):
+        match = bnregex.fullmatch(bn)
+        if match is not None:
+            rank, batch = (int(x) for x in match.groups())
+            collector.append((batch, rank, os.path.join(drn, bn)))
+    return [(rank, batch, fn) for batch, rank, fn in sorted(collector)]
+
+
+def get_rank_shard_fnames(outname):
+    """Find the files written by get_mpi_rank_outname for the input outname.
+
+    Parameters
+    ----------
+    outname : str
+        Name of the collated output file
+
+    Returns
+    -------
+    rank_fnames : list of str
+        Rank files sorted by batch, and then by rank. Since each batch is
+        computed by a single rank, the order does not depend on which rank
+        computed which batch, as with the dynamic schedule. Files written by
+        np.save are matched whether or not the `.npy` extension was appended.
+
+    """
+    return [fn for rank, batch, fn in _get_rank_shards(outname)]
+
+
+def get_completed_batches(
+    outname, n_per_chunk, n_params, param_dtype=None, loss_dtype="f8", n_batches=None
+):
+    """Find the batches of a previous scan whose rank files are complete.
+
+    Parameters
+    ----------
+    outname : str
+        Name of the collated output file
+
+    n_per_chunk : int
+        Number of points in each chunk
+
+    n_params : int
+        Number of parameters
+
+    param_dtype, loss_dtype : str or np.dtype, optional
+        Same as the arguments passed to write_param_chunk
+
+    n_batches : int, optional
+        Number of batches of the scan. Rank files of batches outside the range
+        [0, n_batches), such as those left by an earlier and larger scan with
+        the same outname, are ignored with a warning and left in place.
+        Default is None, in which case every batch is accepted.
+
+    Returns
+    -------
+    completed : dict
+        Keys are the batch indices of every valid rank file,
+        values are the corresponding filenames
+
+    invalid_fnames : list of str
+        Rank files that cannot be read or have the wrong shape or dtype
+
+    """
+    completed, invalid_fnames, ignored_fnames = dict(), [], []
+    correct_layout = _get_chunk_layout(n_per_chunk, n_params, param_dtype, loss_dtype)
+    for rank, batch, fn in _get_rank_shards(outname):
+        if n_batches is not None and not 0 <= batch < n_batches:
+            ignored_fnames.append(fn)
+            continue
+        try:
+            shard = np.load(fn, mmap_mode="r")
+            layout = shard.shape, shard.dtype
+            del shard
+        except (ValueError, OSError, EOFError):
+            layout = None
+        if layout == correct_layout and batch not in completed:
+            completed[batch] = fn
+        else:
+            invalid_fnames.append(fn)
+
+    if len(ignored_fnames) > 0:
+        msg = "Ignoring {0} rank files of batches outside [0, {1}), e.g. {2}"
+        warnings.warn(msg.format(len(ignored_fnames), n_batches, ignored_fnames[0]))
+    return completed, invalid_fnames
+
+
+def cleanup_and_collate(outname, rank_fnames=None):
+    """Concatenate the rank files of outname into a single .npy file,
+    and then delete the rank files.
+
+    The collated array is preallocated on disk and each rank file is
+    memory-mapped and copied in turn, so that peak memory is set by the
+    largest rank file rather than the total size of the scan.
+
+    Parameters
+    ----------
+    outname : str
+        Name of the collated output file. As with np.save,
+        the `.npy` extension is appended if not already present.
+
+    rank_fnames : list of str, optional
+        Files to collate, in order. Default is get_rank_shard_fnames(outname).
+        Passing the files written by the scan avoids listing the output
+        directory, which can be slow on shared filesystems.
+
+    """
+    if rank_fnames is None:
+        rank_fnames = get_rank_shard_fnames(outname)
+    if len(rank_fnames) == 0:
+        raise ValueError("No rank files found for outname = {0}".format(outname))
+
+    n_rows_tot = 0
+    for i, rank_fname in enumerate(rank_fnames):
+        shard = np.load(rank_fname, mmap_mode="r")
+        if i == 0:
+            shape, dtype = shard.shape, shard.dtype
+        msg = "Rank file {0} has shape {1} and dtype {2}, expected (*, {3}) and {4}"
+        msg = msg.format(rank_fname, shard.shape, shard.dtype, shape[1:], dtype)
+        assert shard.shape[1:] == shape[1:] and shard.dtype == dtype, msg
+        n_rows_tot += shard.shape[0]
+        del shard
+
+    if not outname.endswith(".npy"):
+        outname = outname + ".npy"
+    results = np.lib.format.open_memmap(
+        outname, mode="w+", dtype=dtype, shape=(n_rows_tot, *shape[1:])
+    )
+    istart = 0
     for rank_fname in rank_fnames:
-        collector.append(np.load(rank_fname))
-    results = np.concatenate(collector)
-    np.save(outname, results)
+        shard = np.load(rank_fname, mmap_mode="r")
+        iend = istart + shard.shape[0]
+        results[istart:iend] = shard
+        istart = iend
+        del shard
+    results.flush()
+    del results
 
     for fn in rank_fnames:
-        command = "rm " + fn
-        try:
-            check_output(command, shell=True)
-        except CalledProcessError:
-            pass
+        os.remove(fn)
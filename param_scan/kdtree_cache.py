@@ -0,0 +1,158 @@
+"""Persistent on-disk cache of KD-trees keyed on the content of the input data.
+
+A cached tree is stored as a directory of .npy files holding the state of the
+scipy.spatial.cKDTree, so that loading it back memory-maps the data and index
+arrays instead of rebuilding the tree. Only the compact buffer of tree nodes
+is copied into memory.
+"""
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import scipy
+from scipy.spatial import cKDTree
+
+STATE_FNAME = "state.json"
+
+
+def get_array_fingerprint(*arrays):
+    """Content hash of a sequence of arrays.
+
+    Parameters
+    ----------
+    *arrays : sequence of ndarrays
+
+    Returns
+    -------
+    fingerprint : str
+        Hexadecimal digest that depends on the dtype, shape and values of
+        every input array, and on their order
+
+    """
+    h = hashlib.sha1()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(str((arr.dtype.str, arr.shape)).encode())
+        h.update(memoryview(arr).cast("B"))
+    return h.hexdigest()
+
+
+def get_kdtree_cache_key(*halo_properties, balanced_tree=True, compact_nodes=True):
+    """Name of the cache entry of the KD-tree of the input halo properties"""
+    fingerprint = get_array_fingerprint(*halo_properties)
+    options = "{0}-{1}-{2}".format(scipy.__version__, balanced_tree, compact_nodes)
+    h = hashlib.sha1((fingerprint + options).encode())
+    return "kdtree_" + h.hexdigest()
+
+
+def save_kdtree(tree, drn):
+    """Store the state of tree in the directory drn.
+
+    The directory is written under a temporary name and renamed once complete,
+    so that a concurrent reader never sees a partially written entry.
+    """
+    tmp_drn = drn + ".tmp{0}".format(os.getpid())
+    os.makedirs(tmp_drn)
+    state = []
+    for i, x in enumerate(tree.__getstate__()):
+        if isinstance(x, np.ndarray):
+            fn = "state_{0}.npy".format(i)
+            np.save(os.path.join(tmp_drn, fn), x)
+            state.append(dict(npy=fn))
+        else:
+            state.append(dict(value=x))
+    with open(os.path.join(tmp_drn, STATE_FNAME), "w") as fout:
+        json.dump(state, fout)
+
+    try:
+        os.rename(tmp_drn, drn)
+    except OSError:
+        # Another process stored the same entry first
+        shutil.rmtree(tmp_drn)
+
+
+def load_kdtree(drn, mmap_mode="r"):
+    """Load a KD-tree stored with save_kdtree.
+
+    Parameters
+    ----------
+    drn : str
+        Directory of the cache entry
+
+    mmap_mode : str, optional
+        Passed to np.load. Default is `r`, so that the data and index arrays
+        of the tree are memory-mapped read-only, and processes on the same node
+        loading the same entry share the pages of a single copy.
+
+    Returns
+    -------
+    tree : scipy.spatial.cKDTree instance
+
+    """
+    with open(os.path.join(drn, STATE_FNAME), "r") as fin:
+        state = json.load(fin)
+    state = tuple(
+        np.load(os.path.join(drn, x["npy"]), mmap_mode=mmap_mode)
+        if "npy" in x
+        else x["value"]
+        for x in state
+    )
+    tree = cKDTree.__new__(cKDTree)
+    tree.__setstate__(state)
+    return tree
+
+
+def _load_or_build_kdtree(cache_dir, halo_properties, balanced_tree, compact_nodes):
+    key = get_kdtree_cache_key(
+        *halo_properties, balanced_tree=balanced_tree, compact_nodes=compact_nodes
+    )
+    drn = os.path.join(cache_dir, key)
+    if not os.path.isdir(drn):
+        data = np.vstack(halo_properties).T
+        tree = cKDTree(data, balanced_tree=balanced_tree, compact_nodes=compact_nodes)
+        os.makedirs(cache_dir, exist_ok=True)
+        save_kdtree(tree, drn)
+    return drn
+
+
+def get_cached_kdtree(
+    cache_dir, *halo_properties, balanced_tree=True, compact_nodes=True, comm=None
+):
+    """Load the KD-tree of the input halo properties from cache_dir,
+    building and storing it first if it is not already cached.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache. Entries are named after a content hash of
+        the halo properties, the tree options and the scipy version.
+
+    *halo_properties : sequence of n_dim ndarrays of shape (n_data, )
+
+    balanced_tree, compact_nodes : bool, optional
+        Passed to scipy.spatial.cKDTree. Default is True.
+
+    comm : mpi4py.MPI.Comm, optional
+        If passed, only rank 0 hashes the halo properties and builds the tree
+        if needed, and the other ranks memory-map the entry written by rank 0.
+        The halo properties are then only used on rank 0.
+
+    Returns
+    -------
+    tree : scipy.spatial.cKDTree instance
+        The data and index arrays of the tree are read-only memory maps
+
+    """
+    if comm is None:
+        drn = _load_or_build_kdtree(
+            cache_dir, halo_properties, balanced_tree, compact_nodes
+        )
+    else:
+        drn = None
+        if comm.rank == 0:
+            drn = _load_or_build_kdtree(
+                cache_dir, halo_properties, balanced_tree, compact_nodes
+            )
+        drn = comm.bcast(drn, root=0)
+    return load_kdtree(drn)
@@ -1,6 +1,7 @@
 """Use the pyDOE2 library to generate latin hypercube samples."""
 import numpy as np
 import warnings
+from .optimized_latin_hypercube import optimize_latin_hypercube
 
 try:
     from pyDOE2 import lhs as lhs_pydoe
@@ -11,13 +12,19 @@ except ImportError:
 
 try:
     from scipy.stats.qmc import LatinHypercube as lhs_scipy
+    from scipy.stats.qmc import Sobol as sobol_scipy
+    from scipy.stats.qmc import Halton as halton_scipy
 
     HAS_SCIPY_QMC = True
 except ImportError:
     HAS_SCIPY_QMC = False
 
+SOBOL_MAX_POINTS = 2**30
+
 
 def _format_inputs(xmins, xmaxs, n_dim, num_evaluations):
+    """Bounds are returned as ndarrays of shape (n_dim, ) when every bound is a
+    scalar, and otherwise as ndarrays of shape (n_dim, num_evaluations)"""
     try:
         len(xmins)
         xmins_is_float = False
@@ -35,39 +42,61 @@ def _format_inputs(xmins, xmaxs, n_dim, num_evaluations):
     )
     msg_nd2 = "Each entry of xmins must be a float or ndarray of shape num_evaluations"
     msg_nd2b = "Input n_dim={0} so input xmins and xmaxs should have length {1}"
-    _zz = np.zeros(num_evaluations)
     if n_dim == 1:
-
-        if xmins_is_float:
-            xmins = np.atleast_2d([xmins + _zz])
-        else:
+        if not xmins_is_float:
             assert np.shape(xmins) == (n_dim, num_evaluations), msg_nd1
-            xmins = np.atleast_2d(xmins)
-
-        if xmaxs_is_float:
-            xmaxs = np.atleast_2d([xmaxs + _zz])
-        else:
+        if not xmaxs_is_float:
             assert np.shape(xmaxs) == (n_dim, num_evaluations), msg_nd1
-            xmaxs = np.atleast_2d(xmaxs)
+        xmins, xmaxs = [xmins], [xmaxs]
+    elif xmins_is_float or xmaxs_is_float:
+        raise ValueError(msg_nd2b.format(n_dim, n_dim))
+    else:
+        assert len(xmins) == n_dim, msg_nd2b.format(n_dim, n_dim)
+        assert len(xmaxs) == n_dim, msg_nd2b.format(n_dim, n_dim)
+
+    bounds_are_floats = all(np.ndim(x) == 0 for x in (*xmins, *xmaxs))
+    if bounds_are_floats:
+        xmins = np.array(xmins, dtype=float)
+        xmaxs = np.array(xmaxs, dtype=float)
     else:
-        if ~xmins_is_float & ~xmaxs_is_float:
-            assert len(xmins) == n_dim, msg_nd2b.format(n_dim, n_dim)
-            assert len(xmaxs) == n_dim, msg_nd2b.format(n_dim, n_dim)
-            try:
-                xmins = np.atleast_2d([x + _zz for x in xmins])
-                xmaxs = np.atleast_2d([x + _zz for x in xmaxs])
-            except ValueError:
-                raise ValueError(msg_nd2)
-        else:
-            raise ValueError(msg_nd2b.format(n_dim, n_dim))
-
-    num_params, n_eval = xmins.shape
+        _zz = np.zeros(num_evaluations)
+        try:
+            xmins = np.atleast_2d([np.ravel(x) + _zz for x in xmins])
+            xmaxs = np.atleast_2d([np.ravel(x) + _zz for x in xmaxs])
+        except ValueError:
+            raise ValueError(msg_nd2)
+
+    num_params = xmins.shape[0]
     minmax_errmsg = "All (min, max) entries must have min < max"
     assert np.all(xmaxs > xmins), minmax_errmsg
     return xmins, xmaxs, num_params
 
 
-def latin_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=None):
+def _rescale_unit_hypercube(unit_hypercube, xmins, xmaxs):
+    """Rescale unit_hypercube of shape (num_evaluations, n_dim) in place"""
+    if xmins.ndim == 2:
+        xmins, xmaxs = xmins.T, xmaxs.T
+    unit_hypercube *= xmaxs - xmins
+    unit_hypercube += xmins
+    return unit_hypercube
+
+
+def _optimize_unit_hypercube(unit_hypercube, optimization, seed):
+    if optimization is None:
+        return None
+    __, info = optimize_latin_hypercube(unit_hypercube, optimization, seed=seed)
+    return info
+
+
+def latin_hypercube(
+    xmins,
+    xmaxs,
+    n_dim,
+    num_evaluations,
+    seed=None,
+    optimization=None,
+    return_info=False,
+):
     """Generate a latin hypercube oriented with the Cartesian axes.
 
     Parameters
@@ -86,26 +115,58 @@ def latin_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=None):
     seed : int, optional
         Random number seed
 
+    optimization : str, optional
+        Improve the space-filling of the unit hypercube before rescaling by
+        swapping entries within its columns. Either `maximin` or `correlation`.
+        See optimize_latin_hypercube. Default is None for no optimization.
+        Raises a ValueError when neither scipy.stats.qmc nor pydoe2 is available,
+        rather than returning an unoptimized uniform random sample.
+
+    return_info : bool, optional
+        Also return the dictionary of optimization diagnostics, storing
+        the initial and final criterion and the runtime in seconds.
+        Default is False.
+
     Returns
     -------
     sample : ndarray, shape(num_evaluations, n_dim)
         Latin hypercube centered on zero
 
+    info : dict
+        Only returned if return_info is True. None when optimization is None.
+
     """
+    args = xmins, xmaxs, n_dim, num_evaluations
+    kwargs = dict(seed=seed, optimization=optimization, return_info=return_info)
     if HAS_SCIPY_QMC:
-        return latin_hypercube_scipy(xmins, xmaxs, n_dim, num_evaluations, seed=seed)
+        return latin_hypercube_scipy(*args, **kwargs)
     elif HAS_PYDOE2:
-        return latin_hypercube_pydoe(xmins, xmaxs, n_dim, num_evaluations, seed=seed)
+        return latin_hypercube_pydoe(*args, **kwargs)
+    elif optimization is not None:
+        msg = (
+            "scipy.stats.qmc and pydoe2 not available. Cannot generate latin "
+            "hypercube with optimization = {0}"
+        )
+        raise ValueError(msg.format(optimization))
     else:
         msg = (
             "scipy.stats.qmc and pydoe2 not unavailable."
             "Cannot generate latin hypercube. Falling back on uniform random sampler."
         )
         warnings.warn(msg)
-        return uniform_random_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=seed)
-
-
-def latin_hypercube_pydoe(xmins, xmaxs, n_dim, num_evaluations, seed=None):
+        sample = uniform_random_hypercube(*args, seed=seed)
+        return (sample, None) if return_info else sample
+
+
+def latin_hypercube_pydoe(
+    xmins,
+    xmaxs,
+    n_dim,
+    num_evaluations,
+    seed=None,
+    optimization=None,
+    return_info=False,
+):
     """Generate a latin hypercube oriented with the Cartesian axes.
 
     Parameters
@@ -124,25 +185,44 @@ def latin_hypercube_pydoe(xmins, xmaxs, n_dim, num_evaluations, seed=None):
     seed : int, optional
         Random number seed
 
+    optimization : str, optional
+        Improve the space-filling of the unit hypercube before rescaling by
+        swapping entries within its columns. Either `maximin` or `correlation`.
+        See optimize_latin_hypercube. Default is None for no optimization.
+
+    return_info : bool, optional
+        Also return the dictionary of optimization diagnostics, storing
+        the initial and final criterion and the runtime in seconds.
+        Default is False.
+
     Returns
     -------
     sample : ndarray, shape(num_evaluations, n_dim)
         Latin hypercube centered on zero
 
+    info : dict
+        Only returned if return_info is True. None when optimization is None.
+
     """
     xmins, xmaxs, num_params = _format_inputs(xmins, xmaxs, n_dim, num_evaluations)
 
     rng = np.random.RandomState(seed)
     unit_hypercube = lhs_pydoe(num_params, samples=num_evaluations, random_state=rng)
 
-    params = np.zeros_like(unit_hypercube)
-    for i in range(num_params):
-        xmin, xmax = xmins[i], xmaxs[i]
-        params[:, i] = xmin + (xmax - xmin) * unit_hypercube[:, i]
-    return params
+    info = _optimize_unit_hypercube(unit_hypercube, optimization, seed)
+    sample = _rescale_unit_hypercube(unit_hypercube, xmins, xmaxs)
+    return (sample, info) if return_info else sample
 
 
-def latin_hypercube_scipy(xmins, xmaxs, n_dim, num_evaluations, seed=None):
+def latin_hypercube_scipy(
+    xmins,
+    xmaxs,
+    n_dim,
+    num_evaluations,
+    seed=None,
+    optimization=None,
+    return_info=False,
+):
     """Generate a latin hypercube oriented with the Cartesian axes.
 
     Parameters
@@ -161,22 +241,83 @@ def latin_hypercube_scipy(xmins, xmaxs, n_dim, num_evaluations, seed=None):
     seed : int, optional
         Random number seed
 
+    optimization : str, optional
+        Improve the space-filling of the unit hypercube before rescaling by
+        swapping entries within its columns. Either `maximin` or `correlation`.
+        See optimize_latin_hypercube. Default is None for no optimization.
+
+    return_info : bool, optional
+        Also return the dictionary of optimization diagnostics, storing
+        the initial and final criterion and the runtime in seconds.
+        Default is False.
+
     Returns
     -------
     sample : ndarray, shape(num_evaluations, n_dim)
         Latin hypercube centered on zero
 
+    info : dict
+        Only returned if return_info is True. None when optimization is None.
+
     """
     xmins, xmaxs, num_params = _format_inputs(xmins, xmaxs, n_dim, num_evaluations)
 
     LH = lhs_scipy(num_params, seed=seed)
     unit_hypercube = LH.random(num_evaluations)
 
-    params = np.zeros_like(unit_hypercube)
-    for i in range(num_params):
-        xmin, xmax = xmins[i], xmaxs[i]
-        params[:, i] = xmin + (xmax - xmin) * unit_hypercube[:, i]
-    return params
+    info = _optimize_unit_hypercube(unit_hypercube, optimization, seed)
+    sample = _rescale_unit_hypercube(unit_hypercube, xmins, xmaxs)
+    return (sample, info) if return_info else sample
+
+
+def latin_hypercube_batch(xmins, xmaxs, n_dim, num_evaluations, seeds, out=None):
+    """Generate a stack of independent latin hypercubes, one per seed.
+
+    The bounds are validated once for the whole stack, and the random permutation
+    of the strata of every dimension of every hypercube is computed with a single
+    argsort. The hypercube of each seed only depends on that seed, and is drawn
+    with np.random.default_rng(seed), so it differs from latin_hypercube with
+    the same seed.
+
+    Parameters
+    ----------
+    xmins : sequence of length n_dim
+        Lower bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    num_evaluations : int
+        Number of points in each hypercube
+
+    seeds : sequence of int
+        Random number seed of each hypercube
+
+    out : ndarray of shape (n_seeds, num_evaluations, n_dim), optional
+        Buffer in which to store the hypercubes
+
+    Returns
+    -------
+    sample : ndarray of shape (n_seeds, num_evaluations, n_dim)
+
+    """
+    xmins, xmaxs, num_params = _format_inputs(xmins, xmaxs, n_dim, num_evaluations)
+    shape = (len(seeds), num_evaluations, num_params)
+    if out is None:
+        out = np.empty(shape)
+    msg = "out has shape {0}, expected {1}"
+    assert out.shape == shape, msg.format(out.shape, shape)
+
+    keys = np.empty(shape)
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        rng.random(out=keys[i])
+        rng.random(out=out[i])
+    out += np.argsort(keys, axis=1)
+    out /= num_evaluations
+    return _rescale_unit_hypercube(out, xmins, xmaxs)
 
 
 def uniform_random_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=None):
@@ -210,22 +351,162 @@ def uniform_random_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=None):
     unit_hypercube = rng.uniform(0, 1, num_params * num_evaluations)
     unit_hypercube = unit_hypercube.reshape((num_evaluations, num_params))
 
-    params = np.zeros_like(unit_hypercube)
-    for i in range(num_params):
-        xmin, xmax = xmins[i], xmaxs[i]
-        params[:, i] = xmin + (xmax - xmin) * unit_hypercube[:, i]
-    return params
+    return _rescale_unit_hypercube(unit_hypercube, xmins, xmaxs)
+
+
+def sobol_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=None, skip=0):
+    """Generate a scrambled Sobol sequence oriented with the Cartesian axes.
+
+    Parameters
+    ----------
+    xmins : sequence of length n_dim
+        Lower bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    num_evaluations : int
+        Number of points in sample
+
+    seed : int, optional
+        Random number seed of the scrambling.
+        Must be the same for every slice of a single sequence.
+
+    skip : int, optional
+        Number of initial points of the sequence to skip. Default is 0.
+        Slices with skip = i*num_evaluations for i = 0, 1, ... are disjoint
+        contiguous pieces of the same sequence.
+
+    Returns
+    -------
+    sample : ndarray, shape(num_evaluations, n_dim)
+        Points [skip, skip+num_evaluations) of the sequence
+
+    Notes
+    -----
+    The balance properties of the Sobol sequence are best preserved
+    when num_evaluations and skip are powers of 2.
+
+    """
+    if not HAS_SCIPY_QMC:
+        raise ImportError("Must have scipy.stats.qmc installed to use sobol_hypercube")
+    xmins, xmaxs, num_params = _format_inputs(xmins, xmaxs, n_dim, num_evaluations)
+
+    msg = "Sobol sequence is limited to skip + num_evaluations <= {0}"
+    assert skip + num_evaluations <= SOBOL_MAX_POINTS, msg.format(SOBOL_MAX_POINTS)
+
+    engine = sobol_scipy(num_params, scramble=True, seed=seed)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=".*balance properties.*")
+        if skip > 0:
+            engine.fast_forward(int(skip))
+        unit_hypercube = engine.random(num_evaluations)
+
+    return _rescale_unit_hypercube(unit_hypercube, xmins, xmaxs)
+
+
+def halton_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=None, skip=0):
+    """Generate a scrambled Halton sequence oriented with the Cartesian axes.
+
+    Parameters
+    ----------
+    xmins : sequence of length n_dim
+        Lower bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    num_evaluations : int
+        Number of points in sample
+
+    seed : int, optional
+        Random number seed of the scrambling.
+        Must be the same for every slice of a single sequence.
+
+    skip : int, optional
+        Number of initial points of the sequence to skip. Default is 0.
+        Slices with skip = i*num_evaluations for i = 0, 1, ... are disjoint
+        contiguous pieces of the same sequence.
+
+    Returns
+    -------
+    sample : ndarray, shape(num_evaluations, n_dim)
+        Points [skip, skip+num_evaluations) of the sequence
+
+    """
+    if not HAS_SCIPY_QMC:
+        raise ImportError("Must have scipy.stats.qmc installed to use halton_hypercube")
+    xmins, xmaxs, num_params = _format_inputs(xmins, xmaxs, n_dim, num_evaluations)
+
+    # Halton points are computed directly from their index, so skipping only
+    # moves the index, whereas fast_forward would generate every skipped point
+    engine = halton_scipy(num_params, scramble=True, seed=seed)
+    engine.num_generated = int(skip)
+    unit_hypercube = engine.random(num_evaluations)
+
+    return _rescale_unit_hypercube(unit_hypercube, xmins, xmaxs)
+
+
+COV_TRANSFORM_METHODS = ("eigh", "cholesky")
+
+
+def get_cov_transform(cov, method="eigh", rtol=1e-10):
+    """Matrix T mapping a box in the whitened basis of cov onto the original basis.
 
+    Points X_white with unit covariance are mapped to X_orig = X_white.dot(T),
+    which has covariance cov. Computing T once and passing it to
+    latin_hypercube_from_cov avoids a decomposition of cov on every call.
 
-def _get_eigenbasis_transform(cov):
-    """X_orig = X_espace.dot(T)"""
-    evals, V = np.linalg.eig(cov)
-    R, S = V, np.sqrt(np.diag(evals))
-    T = R.dot(S).T
-    return T
+    Parameters
+    ----------
+    cov : ndarray of shape (n_dim, n_dim)
+        Symmetric positive semi-definite covariance matrix
+
+    method : str, optional
+        `eigh`, for a box aligned with the eigenvectors of cov, ordered by
+        increasing eigenvalue. Handles singular matrices.
+        `cholesky`, for a box sheared along the Cholesky factor of cov,
+        which is faster but requires cov to be positive definite.
+        Default is `eigh`.
+
+    rtol : float, optional
+        Eigenvalues down to -rtol times the largest eigenvalue are attributed
+        to roundoff and set to zero. More negative eigenvalues raise a
+        ValueError. Default is 1e-10.
 
+    Returns
+    -------
+    T : ndarray of shape (n_dim, n_dim)
 
-def latin_hypercube_from_cov(mu, cov, sig, num_evaluations, seed=None):
+    """
+    cov = np.atleast_2d(cov)
+    assert np.allclose(cov, cov.T), "Input cov must be symmetric"
+    if method == "eigh":
+        evals, V = np.linalg.eigh(cov)
+        tol = rtol * max(np.abs(evals).max(), np.finfo(float).tiny)
+        if evals.min() < -tol:
+            msg = "Input cov is not positive semi-definite: smallest eigenvalue = {0}"
+            raise ValueError(msg.format(evals.min()))
+        evals = np.maximum(evals, 0.0)
+        return (V * np.sqrt(evals)).T
+    elif method == "cholesky":
+        try:
+            L = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            raise ValueError("Input cov is not positive definite")
+        return L.T
+    else:
+        msg = "method = {0} must be one of {1}"
+        raise ValueError(msg.format(method, COV_TRANSFORM_METHODS))
+
+
+def latin_hypercube_from_cov(
+    mu, cov, sig, num_evaluations, seed=None, transform=None, out=None
+):
     """Generate a latin hypercube that encompasses some multivariate Gaussian data.
 
     Parameters
@@ -233,6 +514,7 @@ def latin_hypercube_from_cov(mu, cov, sig, num_evaluations, seed=None):
     mu : ndarray, shape (n_dim, )
 
     cov : ndarray, shape (n_dim, n_dim)
+        Not used when transform is passed, in which case it can be None
 
     sig : float or ndarray of shape (n_dim, )
         Number of sigma used to define the box length
@@ -240,6 +522,15 @@ def latin_hypercube_from_cov(mu, cov, sig, num_evaluations, seed=None):
     num_evaluations : int
         Number of points in sample
 
+    seed : int, optional
+        Random number seed
+
+    transform : ndarray of shape (n_dim, n_dim), optional
+        Output of get_cov_transform. Default is get_cov_transform(cov).
+
+    out : ndarray of shape (num_evaluations, n_dim), optional
+        Buffer in which to store the sample
+
     Returns
     -------
     sample : ndarray, shape(num_evaluations, n_dim)
@@ -251,6 +542,9 @@ def latin_hypercube_from_cov(mu, cov, sig, num_evaluations, seed=None):
     xmaxs = np.zeros(n_dim) + sig
     assert np.all(xmaxs > 0), "Input sig must be strictly positive"
 
+    if transform is None:
+        transform = get_cov_transform(cov)
     lhs_box = latin_hypercube(xmins, xmaxs, n_dim, num_evaluations, seed=seed)
-    T = _get_eigenbasis_transform(cov)
-    return lhs_box.dot(T) + mu
+    sample = np.matmul(lhs_box, transform, out=out)
+    sample += mu
+    return sample
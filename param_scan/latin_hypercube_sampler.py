@@ -2,14 +2,128 @@
 """
 import numpy as np
 from scipy.spatial import cKDTree
-from .latin_hypercube import latin_hypercube
+from .latin_hypercube import latin_hypercube, latin_hypercube_batch
+from .kdtree_cache import get_cached_kdtree
 
+N_NEIGHBORS_INIT = 8
+N_NEIGHBORS_MAX = 64
+DEFAULT_MAX_MEMORY = 2**30
 
-def get_scipy_kdtree(*halo_properties):
-    return cKDTree(np.vstack(halo_properties).T)
 
+def get_scipy_kdtree(
+    *halo_properties, balanced_tree=True, compact_nodes=True, cache_dir=None, comm=None
+):
+    """Build a KD-tree of the input halo properties.
 
-def retrieve_lh_sample_indices(tree, xmins, xmaxs, n_dim, n_batch, seed=None):
+    Parameters
+    ----------
+    *halo_properties : sequence of n_dim ndarrays of shape (n_data, )
+
+    balanced_tree, compact_nodes : bool, optional
+        Passed to scipy.spatial.cKDTree. Setting both to False builds the tree
+        several times faster for large catalogs, at some cost in query speed.
+        Default is True.
+
+    cache_dir : str, optional
+        If passed, the tree is loaded memory-mapped from this directory,
+        and only built and stored there on the first call with the same data.
+        See param_scan.kdtree_cache.get_cached_kdtree.
+
+    comm : mpi4py.MPI.Comm, optional
+        Only used with cache_dir. Rank 0 builds the tree if needed and
+        the other ranks attach to the same memory-mapped cache entry.
+
+    Returns
+    -------
+    tree : scipy.spatial.cKDTree instance
+
+    """
+    if cache_dir is not None:
+        return get_cached_kdtree(
+            cache_dir,
+            *halo_properties,
+            balanced_tree=balanced_tree,
+            compact_nodes=compact_nodes,
+            comm=comm,
+        )
+    data = np.vstack(halo_properties).T
+    return cKDTree(data, balanced_tree=balanced_tree, compact_nodes=compact_nodes)
+
+
+def _resolve_unique_indices(tree, lhs, dd, indx, workers):
+    """Greedily assign each point of lhs a distinct data row, visiting candidate
+    neighbors in order of distance so that the closest point claims each row.
+
+    Points left unassigned query progressively more neighbors. Once more than
+    N_NEIGHBORS_MAX neighbors would be needed, a tree of only the unclaimed rows
+    is built instead, so that points in sparse regions surrounded by claimed rows
+    do not require very large neighbor queries.
+    """
+    n_batch = lhs.shape[0]
+    msg = "Cannot draw n_batch = {0} unique indices from n_data = {1}"
+    assert n_batch <= tree.n, msg.format(n_batch, tree.n)
+
+    unique_indx = np.full(n_batch, -1)
+    unique_dd = np.zeros(n_batch)
+    is_taken = np.zeros(tree.n, dtype=bool)
+    pending = np.arange(n_batch)
+    dd, indx = dd[:, None], indx[:, None]
+    current_tree, row_indx = tree, np.arange(tree.n)
+    k = 1
+    while pending.size > 0:
+        for icol in range(dd.shape[1]):
+            candidates, dist = row_indx[indx[:, icol]], dd[:, icol]
+            is_available = (unique_indx[pending] == -1) & ~is_taken[candidates]
+            ipts = np.flatnonzero(is_available)
+            ipts = ipts[np.argsort(dist[ipts], kind="stable")]
+            __, ifirst = np.unique(candidates[ipts], return_index=True)
+            ipts = ipts[ifirst]
+            unique_indx[pending[ipts]] = candidates[ipts]
+            unique_dd[pending[ipts]] = dist[ipts]
+            is_taken[candidates[ipts]] = True
+
+        pending = pending[unique_indx[pending] == -1]
+        if pending.size > 0:
+            k = max(N_NEIGHBORS_INIT, 2 * k)
+            if k > N_NEIGHBORS_MAX:
+                row_indx = np.flatnonzero(~is_taken)
+                current_tree = cKDTree(
+                    tree.data[row_indx], balanced_tree=False, compact_nodes=False
+                )
+                k = N_NEIGHBORS_INIT
+            k = min(k, current_tree.n)
+            dd, indx = current_tree.query(lhs[pending], k=k, workers=workers)
+            dd, indx = dd.reshape((pending.size, k)), indx.reshape((pending.size, k))
+    return unique_dd, unique_indx
+
+
+def _get_sample_diagnostics(nearest_dd, nearest_indx, dd, indx):
+    __, inverse, counts = np.unique(
+        nearest_indx, return_inverse=True, return_counts=True
+    )
+    is_collision = counts[inverse] > 1
+    return dict(
+        collision_rate=np.count_nonzero(is_collision) / nearest_indx.size,
+        n_unique=np.unique(indx).size,
+        n_reassigned=int(np.count_nonzero(indx != nearest_indx)),
+        mean_distance=dd.mean(),
+        median_distance=np.median(dd),
+        max_distance=dd.max(),
+        mean_nearest_distance=nearest_dd.mean(),
+    )
+
+
+def retrieve_lh_sample_indices(
+    tree,
+    xmins,
+    xmaxs,
+    n_dim,
+    n_batch,
+    seed=None,
+    workers=-1,
+    unique=False,
+    return_diagnostics=False,
+):
     """Get indices that sample into the data according to a latin hypercube striation.
 
     Parameters
@@ -30,12 +144,178 @@ def retrieve_lh_sample_indices(tree, xmins, xmaxs, n_dim, n_batch, seed=None):
     seed : int, optional
         Random number seed
 
+    workers : int, optional
+        Number of threads used by the KD-tree query. Default is -1 for all cores.
+
+    unique : bool, optional
+        If True, no data row is returned more than once. When several points of
+        the latin hypercube share a nearest neighbor, the closest point keeps it
+        and the others take their nearest unclaimed neighbor.
+        Requires n_batch <= n_data. Default is False.
+
+    return_diagnostics : bool, optional
+        Also return a dictionary of diagnostics. Default is False.
+
     Returns
     ----------
     indx : ndarray of shape (n_batch, )
         Array of integers in the range [0, n_data) that sample into the input dataset
 
+    diagnostics : dict
+        Only returned if return_diagnostics is True. Keys are:
+            `collision_rate`, the fraction of points whose nearest neighbor
+            is also the nearest neighbor of another point
+            `n_unique`, the number of distinct indices returned
+            `n_reassigned`, the number of points not sampled by their nearest neighbor
+            `mean_distance`, `median_distance` and `max_distance` between the
+            points and their sampled data rows
+            `mean_nearest_distance` between the points and their nearest neighbors
+
     """
     lhs = latin_hypercube(xmins, xmaxs, n_dim, n_batch, seed=seed)
-    dd, indx = tree.query(lhs)
+    nearest_dd, nearest_indx = tree.query(lhs, workers=workers)
+    if unique:
+        dd, indx = _resolve_unique_indices(
+            tree, lhs, nearest_dd, nearest_indx, workers
+        )
+    else:
+        dd, indx = nearest_dd, nearest_indx
+
+    if return_diagnostics:
+        diagnostics = _get_sample_diagnostics(nearest_dd, nearest_indx, dd, indx)
+        return indx, diagnostics
     return indx
+
+
+def retrieve_lh_sample_indices_batch(
+    tree, xmins, xmaxs, n_dim, n_batch, seeds, workers=-1
+):
+    """Get indices of many independent latin hypercube samples with a single query.
+
+    The hypercubes of every seed are generated together by latin_hypercube_batch,
+    so there is no Python loop over the seeds.
+
+    Parameters
+    ----------
+    tree : scipy.spatial.cKDTree instance
+
+    xmins : sequence of length n_dim
+        Lower bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    n_batch : int
+        Number of points in each sample
+
+    seeds : sequence of int
+        Random number seed of each sample
+
+    workers : int, optional
+        Number of threads used by the KD-tree query. Default is -1 for all cores.
+
+    Returns
+    ----------
+    indx : ndarray of shape (n_seeds, n_batch)
+        Row i only depends on seeds[i]. Since latin_hypercube_batch draws
+        different hypercubes than latin_hypercube, row i differs from
+        retrieve_lh_sample_indices with seed=seeds[i].
+
+    """
+    n_seeds = len(seeds)
+    lhs = latin_hypercube_batch(xmins, xmaxs, n_dim, n_batch, seeds)
+    dd, indx = tree.query(lhs.reshape((n_seeds * n_batch, n_dim)), workers=workers)
+    return indx.reshape((n_seeds, n_batch))
+
+
+def _get_streaming_block_size(n_dim, n_batch, max_memory):
+    """Number of data rows per block so that the peak memory of
+    retrieve_lh_sample_indices_streaming stays below max_memory bytes.
+
+    Each block holds a float64 copy of the rows plus a KD-tree of the block,
+    whose index array and node buffer take roughly 32 bytes per row. The latin
+    hypercube, the query results and the running nearest neighbors take
+    roughly n_dim + 6 floats per point.
+    """
+    bytes_per_row = 8 * n_dim + 32
+    fixed_bytes = 8 * n_batch * (n_dim + 6)
+    block_size = (max_memory - fixed_bytes) // bytes_per_row
+    msg = "max_memory = {0} bytes is too small for n_batch = {1} points"
+    assert block_size > 0, msg.format(max_memory, n_batch)
+    return int(block_size)
+
+
+def retrieve_lh_sample_indices_streaming(
+    halo_properties,
+    xmins,
+    xmaxs,
+    n_dim,
+    n_batch,
+    seed=None,
+    workers=-1,
+    max_memory=DEFAULT_MAX_MEMORY,
+):
+    """Get indices that sample into the data according to a latin hypercube striation,
+    reading the data in blocks so that it never needs to fit in memory.
+
+    The data are read one block of rows at a time. A KD-tree of each block is
+    queried for the nearest neighbor of every point of the latin hypercube, and
+    the closest neighbor found so far is kept, so the returned indices are the
+    same as those of retrieve_lh_sample_indices with a tree of the entire data.
+
+    Parameters
+    ----------
+    halo_properties : sequence of n_dim arrays of shape (n_data, )
+        Any objects supporting len and slicing into ndarrays,
+        such as np.memmap columns or h5py datasets
+
+    xmins : sequence of length n_dim
+        Lower bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension.
+        Each entry can be a float or ndarray of shape num_evaluations
+
+    n_batch : int
+        Number of points in sample
+
+    seed : int, optional
+        Random number seed
+
+    workers : int, optional
+        Number of threads used by the KD-tree queries. Default is -1 for all cores.
+
+    max_memory : int, optional
+        Approximate bound in bytes on the memory used, which sets the number
+        of rows per block. Default is 1 GiB.
+
+    Returns
+    ----------
+    indx : ndarray of shape (n_batch, )
+        Array of integers in the range [0, n_data) that sample into the input dataset
+
+    """
+    n_data = len(halo_properties[0])
+    block_size = min(_get_streaming_block_size(n_dim, n_batch, max_memory), n_data)
+
+    lhs = latin_hypercube(xmins, xmaxs, n_dim, n_batch, seed=seed)
+    best_dd = np.full(n_batch, np.inf)
+    best_indx = np.zeros(n_batch, dtype=int)
+    data_block = np.empty((block_size, n_dim))
+    for istart in range(0, n_data, block_size):
+        iend = min(istart + block_size, n_data)
+        block = data_block[: iend - istart]
+        for idim, prop in enumerate(halo_properties):
+            block[:, idim] = prop[istart:iend]
+
+        tree = cKDTree(block, balanced_tree=False, compact_nodes=False)
+        dd, indx = tree.query(lhs, workers=workers)
+        is_closer = dd < best_dd
+        best_dd[is_closer] = dd[is_closer]
+        best_indx[is_closer] = indx[is_closer] + istart
+        del tree
+
+    return best_indx
@@ -0,0 +1,154 @@
+"""Generate a single latin hypercube design one block of points at a time.
+
+Each dimension of the design uses a pseudo-random permutation of the
+num_evaluations strata, computed pointwise with a keyed Feistel network,
+so that any block of the design can be generated from (seed, block_index)
+without materializing the full design or the permutations.
+"""
+import numpy as np
+from .latin_hypercube import _format_inputs, _rescale_unit_hypercube
+
+
+N_FEISTEL_ROUNDS = 4
+
+
+def _mix64(x):
+    """splitmix64 finalizer applied elementwise to an ndarray of uint64"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return x
+
+
+def _feistel(x, keys, half_bits):
+    mask = np.uint64((1 << half_bits) - 1)
+    shift = np.uint64(half_bits)
+    left, right = x >> shift, x & mask
+    for key in keys:
+        left, right = right, left ^ (_mix64(right ^ key) & mask)
+    return (left << shift) | right
+
+
+def _permute_indices(indices, n, keys):
+    """Evaluate a pseudo-random permutation of [0, n) at the input indices.
+
+    The Feistel network permutes [0, 4**half_bits), and values outside [0, n)
+    are mapped back into range by cycle walking, which preserves bijectivity.
+    """
+    half_bits = max(1, (int(n - 1).bit_length() + 1) // 2)
+    x = _feistel(indices.astype(np.uint64), keys, half_bits)
+    out_of_range = x >= n
+    while np.any(out_of_range):
+        x[out_of_range] = _feistel(x[out_of_range], keys, half_bits)
+        out_of_range = x >= n
+    return x
+
+
+def _get_feistel_keys(seed, n_dim):
+    keys = np.random.SeedSequence(seed).generate_state(
+        n_dim * N_FEISTEL_ROUNDS, dtype=np.uint64
+    )
+    return keys.reshape((n_dim, N_FEISTEL_ROUNDS))
+
+
+def get_num_blocks(num_evaluations, block_size):
+    """Number of blocks needed to cover a design of num_evaluations points"""
+    return -(-num_evaluations // block_size)
+
+
+def latin_hypercube_block(
+    xmins, xmaxs, n_dim, num_evaluations, block_size, block_index, seed
+):
+    """Generate one block of a latin hypercube of num_evaluations points.
+
+    Parameters
+    ----------
+    xmins : sequence of length n_dim
+        Lower bound on each dimension. Each entry must be a float.
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension. Each entry must be a float.
+
+    num_evaluations : int
+        Number of points in the full design
+
+    block_size : int
+        Number of points in each block
+
+    block_index : int
+        Block to generate, in the range [0, get_num_blocks(num_evaluations, block_size))
+
+    seed : int
+        Random number seed of the full design. Must be the same for every block.
+
+    Returns
+    -------
+    sample : ndarray, shape(n_block, n_dim)
+        Rows [block_index*block_size, (block_index+1)*block_size) of the design.
+        The final block is shorter when block_size does not divide num_evaluations.
+
+    """
+    xmins, xmaxs, num_params = _format_inputs(xmins, xmaxs, n_dim, 1)
+    msg = "latin_hypercube_block only supports scalar bounds"
+    assert xmins.ndim == 1, msg
+
+    n_blocks = get_num_blocks(num_evaluations, block_size)
+    msg = "block_index = {0} must be in the range [0, {1})"
+    assert 0 <= block_index < n_blocks, msg.format(block_index, n_blocks)
+
+    istart = block_index * block_size
+    iend = min(istart + block_size, num_evaluations)
+    indices = np.arange(istart, iend, dtype=np.uint64)
+
+    keys = _get_feistel_keys(seed, num_params)
+    rng = np.random.default_rng(np.random.SeedSequence((seed, block_index)))
+    unit_hypercube = rng.uniform(0, 1, (iend - istart, num_params))
+    for idim in range(num_params):
+        strata = _permute_indices(indices, num_evaluations, keys[idim])
+        unit_hypercube[:, idim] += strata
+    unit_hypercube /= num_evaluations
+
+    return _rescale_unit_hypercube(unit_hypercube, xmins, xmaxs)
+
+
+def iter_latin_hypercube_blocks(
+    xmins, xmaxs, n_dim, num_evaluations, block_size, seed=None, block_indices=None
+):
+    """Yield blocks of a single latin hypercube design of num_evaluations points.
+
+    Parameters
+    ----------
+    xmins : sequence of length n_dim
+        Lower bound on each dimension. Each entry must be a float.
+
+    xmaxs : sequence of length n_dim
+        Upper bound on each dimension. Each entry must be a float.
+
+    num_evaluations : int
+        Number of points in the full design
+
+    block_size : int
+        Number of points in each block
+
+    seed : int, optional
+        Random number seed of the full design.
+        Ranks generating different blocks of the same design must use the same seed.
+
+    block_indices : sequence of int, optional
+        Blocks to generate. Default is all blocks in order.
+
+    Yields
+    ------
+    sample : ndarray, shape(n_block, n_dim)
+
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if block_indices is None:
+        block_indices = range(get_num_blocks(num_evaluations, block_size))
+    for block_index in block_indices:
+        yield latin_hypercube_block(
+            xmins, xmaxs, n_dim, num_evaluations, block_size, block_index, seed
+        )
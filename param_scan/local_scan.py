@@ -0,0 +1,227 @@
+"""Run a parameter scan on the cores of a single machine without MPI"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from .helpers import get_equal_sized_data_chunks
+from .chunk_samplers import get_chunk_sampler, CHUNK_SAMPLERS
+from .loss_evaluation import get_loss_evaluator, probe_vectorized_loss
+
+SCAN_BACKENDS = ("process", "thread", "serial")
+
+_WORKER_STATE = dict()
+
+
+def _create_shared_array(shape, dtype, arr=None):
+    dtype = np.dtype(dtype)
+    nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    if arr is not None:
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, shape, dtype.str)
+
+
+def _copy_shared_array(shm, spec):
+    __, shape, dtype = spec
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf).copy()
+
+
+def _attach_shared_array(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _get_sample_chunk(sampler, xmins, xmaxs, n_chunks, n_per_chunk, seed):
+    if callable(sampler):
+
+        def sample_chunk(ichunk):
+            return sampler(ichunk, n_per_chunk)
+
+        return sample_chunk
+    return get_chunk_sampler(sampler, xmins, xmaxs, n_chunks, n_per_chunk, seed=seed)
+
+
+def _init_worker(sampler_args, loss_fn, loss_args, loss_data, outputs, shm_specs):
+    """Set up the state of a worker once, so that tasks only carry a chunk index.
+
+    When shm_specs is passed, the output arrays and the loss data are instead
+    attached from shared memory without copying. loss_args stores loss_fn_batch,
+    and whether loss_fn is vectorized together with the losses of the rows of
+    the first chunk probed by run_scan, so that workers do not probe loss_fn again.
+    """
+    shms = []
+    if shm_specs is not None:
+        params_spec, loss_spec, data_spec = shm_specs
+        shm_params, params = _attach_shared_array(params_spec)
+        shm_loss, loss = _attach_shared_array(loss_spec)
+        shms.extend((shm_params, shm_loss))
+        if data_spec is not None:
+            shm_data, loss_data = _attach_shared_array(data_spec)
+            shms.append(shm_data)
+    else:
+        params, loss = outputs
+
+    sample_chunk = _get_sample_chunk(*sampler_args)
+    loss_fn_batch, vectorized, probe_loss = loss_args
+    first_chunk = None if probe_loss is None else sample_chunk(0)
+    loss_evaluator = get_loss_evaluator(
+        loss_fn, first_chunk, loss_data, loss_fn_batch, vectorized, probe_loss
+    )
+    _WORKER_STATE.update(
+        sample_chunk=sample_chunk,
+        loss_evaluator=loss_evaluator,
+        loss_data=loss_data,
+        params=params,
+        loss=loss,
+        shms=shms,
+    )
+
+
+def _evaluate_chunk(ichunk):
+    state = _WORKER_STATE
+    param_chunk = state["sample_chunk"](ichunk)
+    loss_arr = state["loss_evaluator"](param_chunk, state["loss_data"])
+    n_per_chunk = param_chunk.shape[0]
+    rows = slice(ichunk * n_per_chunk, (ichunk + 1) * n_per_chunk)
+    state["params"][rows] = param_chunk
+    state["loss"][rows] = loss_arr
+
+
+def run_scan(
+    sampler,
+    loss_fn,
+    n_tot,
+    backend="process",
+    n_workers=None,
+    n_ranks=None,
+    n_max_lh=5000,
+    xmins=None,
+    xmaxs=None,
+    seed=0,
+    loss_data=None,
+    loss_fn_batch=None,
+):
+    """Run a parameter scan with a pool of local processes or threads.
+
+    The scan is split into chunks with get_equal_sized_data_chunks exactly as
+    in scripts/parallel_scan_script.py with n_ranks MPI ranks, and chunk i is
+    sampled with seed i, so the output is identical to the collated output of
+    the MPI scan with the static schedule.
+
+    Parameters
+    ----------
+    sampler : str or callable
+        Either one of CHUNK_SAMPLERS, in which case xmins and xmaxs are required,
+        or a function with signature sampler(ichunk, n_per_chunk) returning an
+        ndarray of shape (n_per_chunk, n_params). With the process backend,
+        a callable sampler must be defined at module level so it can be pickled.
+
+    loss_fn : callable
+        Function with signature loss_fn(params, loss_data) returning a float.
+        With the process backend, must be defined at module level.
+
+    n_tot : int
+        Total number of points in the scan
+
+    backend : str, optional
+        `process`, `thread` or `serial`. Default is `process`.
+        Threads only run in parallel when loss_fn releases the GIL.
+
+    n_workers : int, optional
+        Number of processes or threads. Default is os.cpu_count().
+
+    n_ranks : int, optional
+        Number of MPI ranks whose chunking is reproduced. Default is n_workers.
+
+    n_max_lh : int, optional
+        Maximum number of points in each chunk. Default is 5000.
+
+    xmins, xmaxs : sequence of length n_params, optional
+        Bounds of the scan, required when sampler is a string
+
+    seed : int, optional
+        Random number seed of the global design. Not used by `lhs` and `fast_lhs`.
+
+    loss_data : object, optional
+        Passed to loss_fn. With the process backend, an ndarray is placed in
+        shared memory that every worker maps without a copy, and any other
+        object is pickled once per worker rather than once per chunk.
+
+    loss_fn_batch : callable, optional
+        Function with signature loss_fn_batch(param_chunk, loss_data) returning
+        an ndarray of shape (n_per_chunk, ). See get_loss_evaluator.
+
+    Returns
+    -------
+    params : ndarray of shape (n_chunks*n_per_chunk, n_params)
+        Rows are ordered by chunk index
+
+    loss : ndarray of shape (n_chunks*n_per_chunk, )
+
+    """
+    if backend not in SCAN_BACKENDS:
+        msg = "backend = {0} must be one of {1}"
+        raise ValueError(msg.format(backend, SCAN_BACKENDS))
+    if not callable(sampler):
+        msg = "sampler = {0} must be callable or one of {1}"
+        assert sampler in CHUNK_SAMPLERS, msg.format(sampler, CHUNK_SAMPLERS)
+        msg = "xmins and xmaxs are required when sampler is a string"
+        assert xmins is not None and xmaxs is not None, msg
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    n_ranks = n_workers if n_ranks is None else n_ranks
+    n_cubes_per_rank, n_per_chunk = get_equal_sized_data_chunks(
+        n_tot, n_ranks, n_max_lh
+    )
+    n_chunks = n_cubes_per_rank * n_ranks
+    sampler_args = (sampler, xmins, xmaxs, n_chunks, n_per_chunk, seed)
+    first_chunk = _get_sample_chunk(*sampler_args)(0)
+    n_params = first_chunk.shape[1]
+    n_rows = n_chunks * n_per_chunk
+    loss_args = (loss_fn_batch, None, None)
+    if loss_fn_batch is None:
+        loss_args = (None, *probe_vectorized_loss(loss_fn, first_chunk, loss_data))
+
+    if backend != "process":
+        params, loss = np.empty((n_rows, n_params)), np.empty(n_rows)
+        initargs = (sampler_args, loss_fn, loss_args, loss_data)
+        _init_worker(*initargs, (params, loss), None)
+        try:
+            if backend == "thread":
+                with ThreadPoolExecutor(n_workers) as executor:
+                    list(executor.map(_evaluate_chunk, range(n_chunks)))
+            else:
+                for ichunk in range(n_chunks):
+                    _evaluate_chunk(ichunk)
+        finally:
+            _WORKER_STATE.clear()
+        return params, loss
+
+    shms = []
+    try:
+        shm, params_spec = _create_shared_array((n_rows, n_params), "f8")
+        shms.append(shm)
+        shm, loss_spec = _create_shared_array((n_rows,), "f8")
+        shms.append(shm)
+        data_spec = None
+        if isinstance(loss_data, np.ndarray):
+            shm, data_spec = _create_shared_array(
+                loss_data.shape, loss_data.dtype, loss_data
+            )
+            shms.append(shm)
+            loss_data = None
+
+        initargs = (sampler_args, loss_fn, loss_args, loss_data)
+        initargs = (*initargs, None, (params_spec, loss_spec, data_spec))
+        with ProcessPoolExecutor(
+            n_workers, initializer=_init_worker, initargs=initargs
+        ) as executor:
+            list(executor.map(_evaluate_chunk, range(n_chunks)))
+        params = _copy_shared_array(shms[0], params_spec)
+        loss = _copy_shared_array(shms[1], loss_spec)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    return params, loss
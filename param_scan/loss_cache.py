@@ -0,0 +1,262 @@
+"""On-disk cache of loss evaluations shared across runs of a parameter scan"""
+import time
+import types
+import pickle
+import hashlib
+import sqlite3
+import numpy as np
+from .kdtree_cache import get_array_fingerprint
+
+DEFAULT_MAX_ENTRIES = 10**7
+_SQL_BATCH_SIZE = 500
+
+
+def get_loss_cache_fname(fname, rank):
+    """Name of the database of the loss cache fname used by rank"""
+    return "{0}.rank{1}".format(fname, rank)
+
+
+def _update_code_hash(h, code):
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code_hash(h, const)
+        else:
+            h.update(repr(const).encode())
+
+
+def get_loss_function_namespace(*loss_functions):
+    """Hash of the bytecode, constants and default arguments of loss functions,
+    used as the namespace of get_loss_data_fingerprint so that editing a loss
+    function invalidates the entries it stored in the cache.
+
+    Parameters
+    ----------
+    *loss_functions : callables or None
+        For callables that are not Python functions, such as compiled functions,
+        only the qualified name is hashed
+
+    Returns
+    -------
+    namespace : str
+
+    Notes
+    -----
+    Changes to the functions called by the loss functions are not detected.
+
+    """
+    h = hashlib.sha1()
+    for func in loss_functions:
+        code = getattr(func, "__code__", None)
+        if code is None:
+            h.update(repr(getattr(func, "__qualname__", func)).encode())
+        else:
+            _update_code_hash(h, code)
+            h.update(repr(getattr(func, "__defaults__", None)).encode())
+    return h.hexdigest()
+
+
+def get_loss_data_fingerprint(loss_data, namespace=""):
+    """Content hash of the loss data.
+
+    Parameters
+    ----------
+    loss_data : object
+        An ndarray, a tuple, list or dict of ndarrays and picklable objects,
+        or any picklable object
+
+    namespace : str, optional
+        Mixed into the hash, for example the output of get_loss_function_namespace,
+        to distinguish different loss functions or versions of the same loss
+        function evaluated on the same data
+
+    Returns
+    -------
+    fingerprint : str
+
+    """
+    if isinstance(loss_data, dict):
+        items = [(key, loss_data[key]) for key in sorted(loss_data)]
+    elif isinstance(loss_data, (tuple, list)):
+        items = list(enumerate(loss_data))
+    else:
+        items = [(None, loss_data)]
+
+    h = hashlib.sha1(namespace.encode())
+    h.update(type(loss_data).__name__.encode())
+    for key, value in items:
+        h.update(repr(key).encode())
+        if isinstance(value, np.ndarray):
+            h.update(get_array_fingerprint(value).encode())
+        else:
+            h.update(pickle.dumps(value))
+    return h.hexdigest()
+
+
+class LossCache:
+    """Least-recently-used cache of the loss of each parameter vector, stored
+    in an sqlite database that can be reused by later runs.
+
+    The key of each parameter vector is a hash of the loss data fingerprint
+    and of the vector rounded to a multiple of quantum, so that vectors within
+    roughly quantum of each other share the same loss.
+
+    Parameters
+    ----------
+    fname : str
+        Name of the sqlite database, created if it does not exist
+
+    data_fingerprint : str
+        Output of get_loss_data_fingerprint. Entries stored with a different
+        fingerprint are never returned.
+
+    quantum : float or ndarray of shape (n_params, )
+        Resolution of the parameter vectors in each dimension
+
+    max_entries : int, optional
+        Once the database holds more entries, the least recently used entries
+        are evicted. Default is 10**7.
+
+    Notes
+    -----
+    Several processes can share the same database, since sqlite serializes
+    writes with file locks. Those locks are unreliable on parallel filesystems
+    such as Lustre and GPFS, so each rank of an MPI scan uses its own database,
+    named by get_loss_cache_fname.
+
+    Lookups do not write to the database. The last use of the keys found by
+    lookup is recorded in bulk by the next call to store, or by close.
+
+    """
+
+    def __init__(
+        self, fname, data_fingerprint, quantum, max_entries=DEFAULT_MAX_ENTRIES
+    ):
+        self.fname = fname
+        self.data_fingerprint = data_fingerprint.encode()
+        self.quantum = np.asarray(quantum, dtype=float)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._hit_keys = set()
+
+        self._conn = sqlite3.connect(fname, timeout=600)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS loss_cache "
+                "(key BLOB PRIMARY KEY, loss REAL, last_used INTEGER)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS loss_cache_lru ON loss_cache (last_used)"
+            )
+        self._n_entries = self._count_entries()
+
+    def _count_entries(self):
+        return self._conn.execute("SELECT COUNT(*) FROM loss_cache").fetchone()[0]
+
+    def get_keys(self, param_chunk):
+        """Keys of each row of param_chunk of shape (n, n_params)"""
+        quantized = np.round(param_chunk / self.quantum).astype("i8")
+        keys = []
+        for row in quantized:
+            h = hashlib.blake2b(self.data_fingerprint, digest_size=16)
+            h.update(row.tobytes())
+            keys.append(h.digest())
+        return keys
+
+    def lookup(self, keys):
+        """Loss of each key, and whether it was found in the cache.
+
+        Returns
+        -------
+        loss : ndarray of shape (n, )
+            NaN where the key was not found
+
+        is_hit : ndarray of bool of shape (n, )
+
+        """
+        found = dict()
+        for istart in range(0, len(keys), _SQL_BATCH_SIZE):
+            batch = keys[istart : istart + _SQL_BATCH_SIZE]
+            query = "SELECT key, loss FROM loss_cache WHERE key IN ({0})"
+            query = query.format(",".join("?" * len(batch)))
+            found.update(self._conn.execute(query, batch).fetchall())
+
+        loss = np.array([found.get(key, np.nan) for key in keys], dtype=float)
+        is_hit = np.array([key in found for key in keys], dtype=bool)
+        self._hit_keys.update(found)
+        self.hits += int(is_hit.sum())
+        self.misses += int(is_hit.size - is_hit.sum())
+        return loss, is_hit
+
+    def store(self, keys, loss):
+        """Store the loss of each key, then evict the least recently used
+        entries if the database holds more than max_entries"""
+        now = time.time_ns()
+        rows = [(key, float(x), now) for key, x in zip(keys, loss)]
+        with self._conn:
+            self._touch_hit_keys(now)
+            cursor = self._conn.executemany(
+                "INSERT OR REPLACE INTO loss_cache VALUES (?, ?, ?)", rows
+            )
+        self._n_entries += max(cursor.rowcount, 0)
+
+        # Other processes also insert entries, so the running count is only
+        # an estimate that is corrected before anything is evicted
+        if self._n_entries > self.max_entries:
+            self._n_entries = self._count_entries()
+            n_evict = self._n_entries - self.max_entries
+            if n_evict > 0:
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM loss_cache WHERE key IN (SELECT key FROM "
+                        "loss_cache ORDER BY last_used LIMIT ?)",
+                        (n_evict,),
+                    )
+                self._n_entries = self.max_entries
+
+    def _touch_hit_keys(self, now):
+        """Record the last use of the keys found since the previous call,
+        within the transaction of the caller"""
+        if len(self._hit_keys) > 0:
+            self._conn.executemany(
+                "UPDATE loss_cache SET last_used = ? WHERE key = ?",
+                [(now, key) for key in self._hit_keys],
+            )
+            self._hit_keys.clear()
+
+    def close(self):
+        with self._conn:
+            self._touch_hit_keys(time.time_ns())
+        self._conn.close()
+
+
+def get_cached_loss_evaluator(loss_evaluator, cache):
+    """Wrap a loss evaluator so that only the rows missing from cache are evaluated.
+
+    Parameters
+    ----------
+    loss_evaluator : callable
+        Function with signature loss_evaluator(param_chunk, loss_data), such as
+        the output of get_loss_evaluator. Must accept any number of rows.
+
+    cache : LossCache
+
+    Returns
+    -------
+    cached_loss_evaluator : callable
+        Function with the same signature as loss_evaluator
+
+    """
+
+    def cached_loss_evaluator(param_chunk, loss_data):
+        keys = cache.get_keys(param_chunk)
+        loss_arr, is_hit = cache.lookup(keys)
+        imiss = np.flatnonzero(~is_hit)
+        if imiss.size > 0:
+            loss_arr[imiss] = loss_evaluator(param_chunk[imiss], loss_data)
+            cache.store([keys[i] for i in imiss], loss_arr[imiss])
+        return loss_arr
+
+    return cached_loss_evaluator
@@ -0,0 +1,174 @@
+"""Functions evaluating a loss function on a chunk of parameters"""
+import numpy as np
+
+
+N_PROBE = 3
+
+
+def evaluate_loss_rows(compute_loss, param_chunk, data):
+    """Evaluate a scalar loss function one row of param_chunk at a time.
+
+    Parameters
+    ----------
+    compute_loss : callable
+        Function with signature compute_loss(params, data) returning a float
+
+    param_chunk : ndarray of shape (n_chunk, n_params)
+
+    data : object
+        Loss data passed through to compute_loss
+
+    Returns
+    -------
+    loss_arr : ndarray of shape (n_chunk, )
+
+    """
+    n_chunk = param_chunk.shape[0]
+    loss_arr = np.empty(n_chunk)
+    for i in range(n_chunk):
+        loss_arr[i] = compute_loss(param_chunk[i], data)
+    return loss_arr
+
+
+def _get_probe(param_chunk):
+    n_chunk, n_params = param_chunk.shape
+    n_probe = N_PROBE if n_params != N_PROBE else N_PROBE + 1
+    return param_chunk[: min(n_probe, n_chunk)]
+
+
+def probe_vectorized_loss(compute_loss, param_chunk, data):
+    """Determine whether compute_loss can be called on an entire chunk at once,
+    keeping the losses of the rows evaluated along the way.
+
+    The function is called on a few rows of param_chunk in a single call, and
+    the result is compared to the row-by-row evaluation of the same rows.
+    Functions that only accept two-dimensional input are vectorized.
+
+    Parameters
+    ----------
+    compute_loss : callable
+        Function with signature compute_loss(params, data)
+
+    param_chunk : ndarray of shape (n_chunk, n_params)
+
+    data : object
+        Loss data passed through to compute_loss
+
+    Returns
+    -------
+    is_vectorized : bool
+
+    probe_loss : ndarray of shape (n_probe, ) or None
+        Loss of the first n_probe rows of param_chunk, which can be passed to
+        get_loss_evaluator so that these rows are not evaluated again.
+        None when no valid loss was computed.
+
+    """
+    probe = _get_probe(param_chunk)
+    try:
+        batch_loss = np.asarray(compute_loss(probe, data), dtype=float)
+    except Exception:
+        return False, None
+    if batch_loss.shape != (probe.shape[0],):
+        return False, None
+    try:
+        row_loss = evaluate_loss_rows(compute_loss, probe, data)
+    except Exception:
+        return True, batch_loss
+    return bool(np.allclose(batch_loss, row_loss, equal_nan=True)), row_loss
+
+
+def _reuse_probe_loss(loss_evaluator, probe, probe_loss):
+    """Wrap loss_evaluator so that the first chunk starting with the probed rows
+    takes their loss from probe_loss rather than evaluating them again"""
+    pending = [(probe, probe_loss)]
+
+    def evaluator_reusing_probe(param_chunk, data):
+        n_probe = probe.shape[0]
+        if not pending or not np.array_equal(param_chunk[:n_probe], probe):
+            return loss_evaluator(param_chunk, data)
+
+        pending.clear()
+        loss_arr = np.empty(param_chunk.shape[0])
+        loss_arr[:n_probe] = probe_loss
+        if param_chunk.shape[0] > n_probe:
+            loss_arr[n_probe:] = loss_evaluator(param_chunk[n_probe:], data)
+        return loss_arr
+
+    return evaluator_reusing_probe
+
+
+def get_loss_evaluator(
+    compute_loss,
+    param_chunk,
+    data,
+    compute_loss_batch=None,
+    vectorized=None,
+    probe_loss=None,
+):
+    """Get a function that evaluates the loss of an entire chunk of parameters.
+
+    Parameters
+    ----------
+    compute_loss : callable
+        Function with signature compute_loss(params, data) returning a float.
+        Used row-by-row as a fallback when compute_loss_batch is None
+        and compute_loss itself is not vectorized.
+
+    param_chunk : ndarray of shape (n_chunk, n_params)
+        Representative chunk used to detect whether compute_loss is vectorized.
+        May be None when vectorized is passed and probe_loss is None.
+
+    data : object
+        Loss data passed through to compute_loss
+
+    compute_loss_batch : callable, optional
+        Function with signature compute_loss_batch(param_chunk, data)
+        returning an ndarray of shape (n_chunk, )
+
+    vectorized : bool, optional
+        Whether compute_loss is vectorized, for example as determined once by
+        probe_vectorized_loss and shared with every process of the scan.
+        Default is None, in which case compute_loss is probed on param_chunk.
+
+    probe_loss : ndarray, optional
+        Output of probe_vectorized_loss for param_chunk, passed together with
+        vectorized. Ignored when compute_loss is probed here.
+
+    Returns
+    -------
+    loss_evaluator : callable
+        Function with signature loss_evaluator(param_chunk, data)
+        returning a new ndarray of shape (n_chunk, ) for every call, even when
+        compute_loss_batch returns the same buffer each time. The losses computed
+        while probing compute_loss are reused when the evaluator is called on
+        a chunk starting with the same rows as param_chunk, so that no row of
+        the scan is evaluated twice.
+
+    """
+    if compute_loss_batch is None and vectorized is None:
+        vectorized, probe_loss = probe_vectorized_loss(compute_loss, param_chunk, data)
+
+    if compute_loss_batch is None and not vectorized:
+
+        def loss_evaluator(param_chunk, data):
+            return evaluate_loss_rows(compute_loss, param_chunk, data)
+
+    else:
+        if compute_loss_batch is None:
+            compute_loss_batch = compute_loss
+
+        # The output is always copied, since a batch function may reuse its output
+        # buffer while earlier chunks are still queued for writing
+        def loss_evaluator(param_chunk, data):
+            loss_arr = np.array(compute_loss_batch(param_chunk, data), dtype=float)
+            msg = "Batch loss has shape {0} for param_chunk of shape {1}"
+            assert loss_arr.shape == (param_chunk.shape[0],), msg.format(
+                loss_arr.shape, param_chunk.shape
+            )
+            return loss_arr
+
+    if probe_loss is None:
+        return loss_evaluator
+    probe = _get_probe(param_chunk)[: len(probe_loss)]
+    return _reuse_probe_loss(loss_evaluator, probe, probe_loss)
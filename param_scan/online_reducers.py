@@ -0,0 +1,188 @@
+"""Summaries of a parameter scan accumulated chunk by chunk on each rank,
+and combined across ranks without writing the scan to disk"""
+import numpy as np
+from .adaptive_scan import select_best_k
+from mpi4py import MPI
+
+
+def _merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Combine the count, mean and sum of squared deviations of two samples"""
+    n = n_a + n_b
+    if n == 0:
+        return n, mean_a, m2_a
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / n)
+    m2 = m2_a + m2_b + delta**2 * (n_a * n_b / n)
+    return n, mean, m2
+
+
+class ScanReducer:
+    """Online top-k, moments and marginal histograms of a parameter scan.
+
+    Each rank calls update with every chunk it evaluates. At the end of the scan,
+    reduce combines the reducers of every rank, so that the best points and
+    the summary statistics of the entire scan are available without
+    collating the output files.
+
+    Parameters
+    ----------
+    xmins : ndarray of shape (n_params, )
+        Lower bound of the scan in each dimension
+
+    xmaxs : ndarray of shape (n_params, )
+        Upper bound of the scan in each dimension
+
+    n_best : int, optional
+        Number of lowest-loss points to keep. Default is 100.
+
+    n_bins : int, optional
+        Number of bins of the marginal histogram of each parameter, spanning
+        the bounds of the scan. Default is 50.
+
+    Notes
+    -----
+    Points with a non-finite loss are counted by the histograms of the
+    parameters, and are otherwise ignored.
+
+    """
+
+    def __init__(self, xmins, xmaxs, n_best=100, n_bins=50):
+        self.xmins = np.asarray(xmins, dtype=float)
+        self.xmaxs = np.asarray(xmaxs, dtype=float)
+        self.n_best = n_best
+        self.n_bins = n_bins
+        n_params = self.xmins.size
+
+        self.best_params = np.zeros((0, n_params))
+        self.best_loss = np.zeros(0)
+        self.n_finite = 0
+        self.mean = np.zeros(n_params + 1)
+        self.m2 = np.zeros(n_params + 1)
+        self.counts = np.zeros((n_params, n_bins), dtype="i8")
+        self.min_loss = np.full((n_params, n_bins), np.inf)
+
+    def _get_bin_indices(self, param_chunk):
+        x = (param_chunk - self.xmins) / (self.xmaxs - self.xmins)
+        ibins = np.floor(x * self.n_bins).astype("i8")
+        return np.clip(ibins, 0, self.n_bins - 1)
+
+    def update(self, param_chunk, loss_arr):
+        """Add a chunk of evaluated points.
+
+        Parameters
+        ----------
+        param_chunk : ndarray of shape (n_per_chunk, n_params)
+
+        loss_arr : ndarray of shape (n_per_chunk, )
+
+        """
+        ibins = self._get_bin_indices(param_chunk)
+        is_finite = np.isfinite(loss_arr)
+        for ip in range(self.xmins.size):
+            self.counts[ip] += np.bincount(ibins[:, ip], minlength=self.n_bins)
+            np.minimum.at(self.min_loss[ip], ibins[is_finite, ip], loss_arr[is_finite])
+
+        params, loss = param_chunk[is_finite], loss_arr[is_finite]
+        if loss.size == 0:
+            return
+        self.best_params, self.best_loss = select_best_k(
+            np.concatenate((self.best_params, params)),
+            np.concatenate((self.best_loss, loss)),
+            self.n_best,
+        )
+        x = np.column_stack((params, loss))
+        mean_b = x.mean(axis=0)
+        m2_b = np.sum((x - mean_b) ** 2, axis=0)
+        self.n_finite, self.mean, self.m2 = _merge_moments(
+            self.n_finite, self.mean, self.m2, loss.size, mean_b, m2_b
+        )
+
+    def merge(self, other):
+        """Add the points of another reducer with the same bounds and bins"""
+        self.best_params, self.best_loss = select_best_k(
+            np.concatenate((self.best_params, other.best_params)),
+            np.concatenate((self.best_loss, other.best_loss)),
+            self.n_best,
+        )
+        self.n_finite, self.mean, self.m2 = _merge_moments(
+            self.n_finite, self.mean, self.m2, other.n_finite, other.mean, other.m2
+        )
+        self.counts += other.counts
+        np.minimum(self.min_loss, other.min_loss, out=self.min_loss)
+
+    def reduce(self, comm, root=0):
+        """Combine the reducers of every rank of comm onto root.
+
+        The histograms are combined with MPI reductions, and the best points
+        and moments, which only take O(n_best + n_params) memory per rank,
+        are gathered and merged.
+
+        Returns
+        -------
+        reducer : ScanReducer or None
+            Reducer of the entire scan on root, and None on the other ranks
+
+        """
+        counts = np.zeros_like(self.counts)
+        min_loss = np.zeros_like(self.min_loss)
+        comm.Reduce(self.counts, counts, op=MPI.SUM, root=root)
+        comm.Reduce(self.min_loss, min_loss, op=MPI.MIN, root=root)
+        state = (self.best_params, self.best_loss, self.n_finite, self.mean, self.m2)
+        collector = comm.gather(state, root=root)
+        if comm.Get_rank() != root:
+            return None
+
+        result = ScanReducer(self.xmins, self.xmaxs, self.n_best, self.n_bins)
+        for best_params, best_loss, n_finite, mean, m2 in collector:
+            other = ScanReducer(self.xmins, self.xmaxs, self.n_best, self.n_bins)
+            other.best_params, other.best_loss = best_params, best_loss
+            other.n_finite, other.mean, other.m2 = n_finite, mean, m2
+            result.merge(other)
+        result.counts, result.min_loss = counts, min_loss
+        return result
+
+    def get_summary(self, param_names=None):
+        """JSON-serializable summary of the points added so far.
+
+        Parameters
+        ----------
+        param_names : sequence of str, optional
+            Default is param_0, param_1, ...
+
+        Returns
+        -------
+        summary : dict
+            Keys are `n_points` and `n_finite`, the number of points and of points
+            with a finite loss, `best_params` and `best_loss`, sorted by
+            increasing loss, `mean` and `std` of each parameter and of the loss,
+            and `histograms`, storing for each parameter the bin `edges`,
+            the `counts` of points and the `min_loss` in each bin, which is
+            None for bins without any finite loss
+
+        """
+        n_params = self.xmins.size
+        if param_names is None:
+            param_names = ["param_{0}".format(ip) for ip in range(n_params)]
+        names = list(param_names) + ["loss"]
+        std = np.sqrt(self.m2 / max(self.n_finite - 1, 1))
+
+        histograms = dict()
+        for ip, name in enumerate(param_names):
+            edges = np.linspace(self.xmins[ip], self.xmaxs[ip], self.n_bins + 1)
+            min_loss = self.min_loss[ip]
+            histograms[name] = dict(
+                edges=edges.tolist(),
+                counts=self.counts[ip].tolist(),
+                min_loss=[float(x) if np.isfinite(x) else None for x in min_loss],
+            )
+
+        return dict(
+            n_points=int(self.counts[0].sum()) if n_params > 0 else 0,
+            n_finite=int(self.n_finite),
+            param_names=list(param_names),
+            best_params=self.best_params.tolist(),
+            best_loss=self.best_loss.tolist(),
+            mean=dict(zip(names, self.mean.tolist())),
+            std=dict(zip(names, std.tolist())),
+            histograms=histograms,
+        )
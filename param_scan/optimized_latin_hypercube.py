@@ -0,0 +1,209 @@
+"""Improve the space-filling properties of a latin hypercube by swapping
+entries within its columns, which preserves the latin hypercube stratification.
+"""
+from time import time
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+OPTIMIZATION_CRITERIA = ("maximin", "correlation")
+
+
+def get_nearest_neighbor_distances(sample):
+    """Distance from each point in sample to its nearest neighbor.
+
+    Parameters
+    ----------
+    sample : ndarray of shape (n, n_dim)
+
+    Returns
+    -------
+    dnn : ndarray of shape (n, )
+
+    """
+    tree = cKDTree(sample)
+    dd, indx = tree.query(sample, k=2, workers=-1)
+    return dd[:, 1]
+
+
+def get_maximin_distance(sample):
+    """Smallest distance between any two points in sample"""
+    return get_nearest_neighbor_distances(sample).min()
+
+
+def get_max_abs_correlation(sample):
+    """Largest absolute value of the correlation between any two columns of sample"""
+    corr = np.corrcoef(sample, rowvar=False)
+    np.fill_diagonal(corr, 0.0)
+    return np.abs(corr).max()
+
+
+def _swap_entries(sample, irows, jrows, idims):
+    xi = sample[irows, idims]
+    sample[irows, idims] = sample[jrows, idims]
+    sample[jrows, idims] = xi
+
+
+def _maximin_round(sample, tree, dnn, n_swap, rng):
+    """Propose a set of disjoint swaps involving the points with the closest
+    neighbors, and apply the swaps that increase the smaller of the two
+    nearest-neighbor distances of the swapped points."""
+    n, n_dim = sample.shape
+    irows = np.argpartition(dnn, n_swap - 1)[:n_swap]
+    candidates = np.setdiff1d(np.arange(n), irows)
+    jrows = rng.choice(candidates, n_swap, replace=False)
+    idims = rng.integers(0, n_dim, n_swap)
+
+    proposal_i = sample[irows].copy()
+    proposal_j = sample[jrows].copy()
+    proposal_i[np.arange(n_swap), idims] = sample[jrows, idims]
+    proposal_j[np.arange(n_swap), idims] = sample[irows, idims]
+
+    # The tree still holds the old positions of the swapped pair,
+    # so neighbors that are either member of the pair are ignored
+    proposals = np.concatenate((proposal_i, proposal_j))
+    owners = np.concatenate((irows, jrows))[:, None]
+    partners = np.concatenate((jrows, irows))[:, None]
+    dd, indx = tree.query(proposals, k=3, workers=-1)
+    dd[(indx == owners) | (indx == partners)] = np.inf
+    new_dnn = dd.min(axis=1)
+
+    new_pair_dnn = np.minimum(new_dnn[:n_swap], new_dnn[n_swap:])
+    old_pair_dnn = np.minimum(dnn[irows], dnn[jrows])
+    accept = new_pair_dnn > old_pair_dnn
+    _swap_entries(sample, irows[accept], jrows[accept], idims[accept])
+    return irows[accept], jrows[accept], idims[accept]
+
+
+def _query_nearest_neighbors(tree, sample, rows):
+    dd, indx = tree.query(sample[rows], k=2, workers=-1)
+    return dd[:, 1], indx[:, 1]
+
+
+def _update_nearest_neighbors(tree, sample, dnn, nn, moved):
+    """Update the nearest-neighbor distances after the points in moved changed.
+
+    Exact distances are recomputed for the moved points and for the points
+    whose nearest neighbor moved. Each moved point also becomes the nearest
+    neighbor of its own nearest neighbor when it is closer. Other points that
+    a moved point approached keep a stale distance, which is never smaller than
+    the smallest nearest-neighbor distance of the moved points, so the minimum
+    of the returned distances is exact.
+    """
+    dnn, nn = dnn.copy(), nn.copy()
+    affected = np.union1d(moved, np.flatnonzero(np.isin(nn, moved)))
+    dnn[affected], nn[affected] = _query_nearest_neighbors(tree, sample, affected)
+
+    dnn_moved, nn_moved = dnn[moved], nn[moved]
+    np.minimum.at(dnn, nn_moved, dnn_moved)
+    is_closer = dnn[nn_moved] == dnn_moved
+    nn[nn_moved[is_closer]] = moved[is_closer]
+    return dnn, nn
+
+
+def _optimize_maximin(sample, n_iter, rng):
+    """Only the first round queries every point, so that the cost of later rounds
+    scales with the number of swaps rather than the number of points."""
+    n = sample.shape[0]
+    n_swap = max(min(n // 2, 16), n // 100)
+    tree = cKDTree(sample)
+    dnn, nn = _query_nearest_neighbors(tree, sample, np.arange(n))
+    initial = dnn.min()
+    for __ in range(n_iter):
+        swaps = _maximin_round(sample, tree, dnn, n_swap, rng)
+        moved = np.union1d(swaps[0], swaps[1])
+        if moved.size == 0:
+            continue
+
+        new_tree = cKDTree(sample)
+        new_dnn, new_nn = _update_nearest_neighbors(new_tree, sample, dnn, nn, moved)
+        if new_dnn.min() < dnn.min():
+            _swap_entries(sample, *swaps)
+        else:
+            tree, dnn, nn = new_tree, new_dnn, new_nn
+    return initial, dnn.min()
+
+
+def _optimize_correlation(sample, n_iter, rng, n_candidates=256):
+    """Columnwise-pairwise exchange minimizing the sum of squared correlations.
+
+    Swapping entries within a column leaves its mean and variance unchanged,
+    so the change in every correlation with that column can be computed from
+    the standardized sample for all candidate swaps at once.
+    """
+    n, n_dim = sample.shape
+    z = (sample - sample.mean(axis=0)) / sample.std(axis=0)
+    corr = z.T.dot(z) / n
+    off_diagonal = ~np.eye(n_dim, dtype=bool)
+    initial = np.abs(corr[off_diagonal]).max()
+    for it in range(n_iter):
+        idim = it % n_dim
+        irows = rng.integers(0, n, n_candidates)
+        jrows = rng.integers(0, n, n_candidates)
+
+        dz = (z[jrows, idim] - z[irows, idim])[:, None]
+        delta = dz * (z[irows] - z[jrows]) / n
+        delta[:, idim] = 0.0
+        corr_k = corr[idim]
+        change = np.sum((corr_k + delta) ** 2 - corr_k**2, axis=1)
+
+        best = np.argmin(change)
+        if change[best] < 0:
+            ibest, jbest = irows[best], jrows[best]
+            corr[idim] += delta[best]
+            corr[:, idim] += delta[best]
+            _swap_entries(z, ibest, jbest, idim)
+            _swap_entries(sample, ibest, jbest, idim)
+    return initial, np.abs(corr[off_diagonal]).max()
+
+
+def optimize_latin_hypercube(sample, criterion="maximin", n_iter=None, seed=None):
+    """Improve the space-filling of a latin hypercube by swapping column entries.
+
+    Parameters
+    ----------
+    sample : ndarray of shape (num_evaluations, n_dim)
+        Latin hypercube to optimize in place, usually on the unit hypercube
+
+    criterion : str, optional
+        `maximin` maximizes the smallest distance between any two points, using
+        rounds of many simultaneous swaps of the points with the closest
+        neighbors, each round costing one KD-tree build plus queries of the
+        points involved in the swaps.
+        `correlation` minimizes the sum of squared correlations between columns
+        by a columnwise-pairwise exchange over many candidate swaps per iteration.
+        Default is `maximin`.
+
+    n_iter : int, optional
+        Number of rounds for maximin (default 50),
+        or swaps attempted for correlation (default 100 * n_dim)
+
+    seed : int, optional
+        Random number seed
+
+    Returns
+    -------
+    sample : ndarray of shape (num_evaluations, n_dim)
+        Same array as the input sample
+
+    info : dict
+        Keys are `criterion`, `initial`, `final` and `runtime`, where initial and
+        final store the maximin distance or largest absolute correlation,
+        and runtime is the optimization time in seconds
+
+    """
+    rng = np.random.default_rng(seed)
+    start = time()
+    if criterion == "maximin":
+        n_iter = 50 if n_iter is None else n_iter
+        initial, final = _optimize_maximin(sample, n_iter, rng)
+    elif criterion == "correlation":
+        n_iter = 100 * sample.shape[1] if n_iter is None else n_iter
+        initial, final = _optimize_correlation(sample, n_iter, rng)
+    else:
+        msg = "criterion = {0} must be one of {1}"
+        raise ValueError(msg.format(criterion, OPTIMIZATION_CRITERIA))
+    runtime = time() - start
+
+    info = dict(criterion=criterion, initial=initial, final=final, runtime=runtime)
+    return sample, info
@@ -0,0 +1,133 @@
+"""Per-phase timing of a parameter scan, summarized across MPI ranks"""
+import json
+from contextlib import contextmanager
+from collections import OrderedDict
+from time import perf_counter
+import numpy as np
+
+
+SCAN_PHASES = (
+    "load",
+    "sample",
+    "evaluate",
+    "write",
+    "select",
+    "fit",
+    "reduce",
+    "barrier",
+    "collate",
+)
+
+
+class PhaseTimer:
+    """Accumulate the time spent in each phase of a scan on a single rank.
+
+    Time is recorded either with the phase context manager,
+    `with timer.phase("sample"): ...`, or directly with the add method.
+    """
+
+    def __init__(self):
+        self.times = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+
+    def get_times(self):
+        return dict(self.times)
+
+
+def _summarize(values):
+    values = np.asarray(values, dtype=float)
+    return dict(
+        min=float(values.min()),
+        median=float(np.median(values)),
+        max=float(values.max()),
+        total=float(values.sum()),
+    )
+
+
+def get_timing_summary(rank_times, rank_points, rank_wall_times):
+    """Summarize the per-phase times of every rank.
+
+    Parameters
+    ----------
+    rank_times : list of dict
+        Seconds spent in each phase by each rank. Phases missing on a rank count
+        as zero seconds on that rank.
+
+    rank_points : sequence of int
+        Number of points evaluated by each rank
+
+    rank_wall_times : sequence of float
+        Wall-clock time of each rank
+
+    Returns
+    -------
+    summary : dict
+        Keys are `n_ranks`, `n_points`, `phases`, storing the min, median, max and
+        total across ranks of the seconds spent in each phase,
+        and `points_per_second`, storing the same statistics of the
+        throughput of each rank
+
+    """
+    phases = [p for p in SCAN_PHASES if any(p in t for t in rank_times)]
+    phases += sorted(set(p for t in rank_times for p in t) - set(phases))
+    rank_points = np.asarray(rank_points, dtype=float)
+    rank_wall_times = np.asarray(rank_wall_times, dtype=float)
+    throughput = rank_points / np.maximum(rank_wall_times, np.finfo(float).tiny)
+    return dict(
+        n_ranks=len(rank_times),
+        n_points=int(rank_points.sum()),
+        phases=OrderedDict(
+            (p, _summarize([t.get(p, 0.0) for t in rank_times])) for p in phases
+        ),
+        points_per_second=_summarize(throughput),
+    )
+
+
+def gather_timing_summary(comm, timer, n_points, wall_time):
+    """Gather the timers of every rank of comm and summarize them on rank 0.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+
+    timer : PhaseTimer
+        Timer of this rank
+
+    n_points : int
+        Number of points evaluated by this rank
+
+    wall_time : float
+        Wall-clock time of this rank
+
+    Returns
+    -------
+    summary : dict or None
+        Output of get_timing_summary on rank 0, and None on the other ranks
+
+    """
+    collector = comm.gather((timer.get_times(), n_points, wall_time), root=0)
+    if comm.Get_rank() != 0:
+        return None
+    rank_times, rank_points, rank_wall_times = zip(*collector)
+    return get_timing_summary(rank_times, rank_points, rank_wall_times)
+
+
+def write_timing_summary(summary, fname):
+    with open(fname, "w") as fout:
+        json.dump(summary, fout, indent=2)
+
+
+def get_profile_fname(outname, rank):
+    """Name of the cProfile output of each rank, which does not match the
+    pattern of the rank output files collated by cleanup_and_collate"""
+    return "{0}.rank{1}.prof".format(outname, rank)
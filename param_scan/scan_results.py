@@ -0,0 +1,177 @@
+"""Read the output of a parameter scan together with its metadata"""
+import os
+import json
+import numpy as np
+from .helpers import PARAMS_FIELD, LOSS_FIELD
+from .hdf5_output import PARAMS_KEY, LOSS_KEY, METADATA_KEY
+
+try:
+    import h5py
+
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
+# Entries of the metadata that define the design of a scan,
+# which must agree between an interrupted scan and the scan resuming it
+RESUME_METADATA_KEYS = (
+    "param_names",
+    "xmins",
+    "xmaxs",
+    "sampler",
+    "seed",
+    "n_tot",
+    "n_chunks",
+    "n_per_chunk",
+    "param_dtype",
+)
+
+
+def _get_npy_fname(outname):
+    return outname if outname.endswith(".npy") else outname + ".npy"
+
+
+def get_metadata_fname(outname):
+    """Name of the JSON file describing the collated .npy output of outname"""
+    return _get_npy_fname(outname) + ".json"
+
+
+def write_scan_metadata(outname, metadata):
+    """Store a JSON-serializable dict describing the .npy output of outname.
+
+    Parameters
+    ----------
+    outname : str
+        Name of the collated output file, with or without the `.npy` extension
+
+    metadata : dict
+        Description of the scan, such as the parameter names,
+        bounds, seeds and sampler settings
+
+    """
+    with open(get_metadata_fname(outname), "w") as fout:
+        json.dump(metadata, fout, indent=2)
+
+
+def read_scan_metadata(fname):
+    """Load the metadata of a scan without reading its results.
+
+    Parameters
+    ----------
+    fname : str
+        Either an HDF5 file written by HDF5ScanWriter, or the outname of a
+        collated .npy file, with or without the `.npy` extension
+
+    Returns
+    -------
+    metadata : dict
+        Empty if the scan has no metadata
+
+    """
+    metadata = None
+    if HAS_H5PY and os.path.isfile(fname) and h5py.is_hdf5(fname):
+        with h5py.File(fname, "r") as f:
+            metadata = f.attrs.get(METADATA_KEY, None)
+    else:
+        metadata_fname = get_metadata_fname(fname)
+        if os.path.isfile(metadata_fname):
+            with open(metadata_fname, "r") as fin:
+                metadata = fin.read()
+    return dict() if metadata is None else json.loads(metadata)
+
+
+def get_metadata_mismatches(stored_metadata, metadata, keys=RESUME_METADATA_KEYS):
+    """Entries of the metadata of a scan that differ from the stored metadata
+    of the scan it resumes.
+
+    Parameters
+    ----------
+    stored_metadata : dict
+        Output of read_scan_metadata
+
+    metadata : dict
+        Metadata of the resuming scan
+
+    keys : sequence of str, optional
+        Entries that must agree for the two scans to sample the same design.
+        Default is RESUME_METADATA_KEYS.
+
+    Returns
+    -------
+    mismatches : list of tuples
+        (key, stored value, value) of every differing entry, where the stored
+        value is None for entries missing from stored_metadata
+
+    """
+    mismatches = []
+    for key in keys:
+        # Round-trip through JSON so that tuples compare equal to stored lists
+        value = json.loads(json.dumps(metadata.get(key, None)))
+        stored_value = stored_metadata.get(key, None)
+        if value != stored_value:
+            mismatches.append((key, stored_value, value))
+    return mismatches
+
+
+def _memmap_hdf5_dataset(fname, dataset):
+    """Memory-map a contiguous uncompressed dataset, and otherwise read it"""
+    offset = dataset.id.get_offset()
+    if offset is None or dataset.chunks is not None:
+        return dataset[...]
+    return np.memmap(
+        fname, dtype=dataset.dtype, mode="r", offset=offset, shape=dataset.shape
+    )
+
+
+def _load_hdf5_results(fname):
+    if not HAS_H5PY:
+        raise ImportError("Must have h5py installed to read {0}".format(fname))
+    with h5py.File(fname, "r") as f:
+        params = _memmap_hdf5_dataset(fname, f[PARAMS_KEY])
+        loss = _memmap_hdf5_dataset(fname, f[LOSS_KEY])
+        metadata = f.attrs.get(METADATA_KEY, None)
+    metadata = dict() if metadata is None else json.loads(metadata)
+    return params, loss, metadata
+
+
+def _load_npy_results(outname):
+    results = np.load(_get_npy_fname(outname), mmap_mode="r")
+    if results.dtype.names is None:
+        params, loss = results[:, :-1], results[:, -1]
+    else:
+        params, loss = results[PARAMS_FIELD], results[LOSS_FIELD]
+
+    metadata_fname = get_metadata_fname(outname)
+    metadata = dict()
+    if os.path.isfile(metadata_fname):
+        with open(metadata_fname, "r") as fin:
+            metadata = json.load(fin)
+    return params, loss, metadata
+
+
+def load_scan_results(fname):
+    """Memory-map the parameters and loss of a scan, and load its metadata.
+
+    Parameters
+    ----------
+    fname : str
+        Either an HDF5 file written by HDF5ScanWriter, or the outname of a
+        collated .npy file written by cleanup_and_collate, with or without the
+        `.npy` extension. Both the float64 layout and the compact layout of
+        write_param_chunk are supported.
+
+    Returns
+    -------
+    params : ndarray of shape (n, n_params)
+        Read-only view of the file on disk, except for HDF5 datasets that were
+        never written, which are read into memory
+
+    loss : ndarray of shape (n, )
+
+    metadata : dict
+        Empty if the scan was written without metadata
+
+    """
+    if HAS_H5PY and os.path.isfile(fname) and h5py.is_hdf5(fname):
+        return _load_hdf5_results(fname)
+    return _load_npy_results(fname)
@@ -0,0 +1,126 @@
+"""Functions assigning the seeds of a parameter scan to MPI ranks"""
+import numpy as np
+from mpi4py import MPI
+
+
+def get_static_seeds(total_seeds, rank, nranks):
+    """Split the seeds into contiguous blocks of nearly equal size, one per rank.
+
+    Parameters
+    ----------
+    total_seeds : ndarray of shape (n_seeds, )
+
+    rank : int
+
+    nranks : int
+
+    Returns
+    -------
+    seeds : ndarray
+        Seeds assigned to the input rank
+
+    """
+    return np.array_split(total_seeds, nranks)[rank]
+
+
+def _get_counter_window(comm):
+    itemsize = MPI.INT64_T.Get_size()
+    size = itemsize if comm.Get_rank() == 0 else 0
+    win = MPI.Win.Allocate(size, itemsize, comm=comm)
+    if comm.Get_rank() == 0:
+        win.Lock(0, MPI.LOCK_EXCLUSIVE)
+        win.Put(np.zeros(1, dtype="i8"), 0)
+        win.Unlock(0)
+    comm.Barrier()
+    return win
+
+
+def _fetch_and_increment(win):
+    one = np.ones(1, dtype="i8")
+    result = np.zeros(1, dtype="i8")
+    win.Lock(0, MPI.LOCK_SHARED)
+    win.Fetch_and_op(one, result, 0, 0, MPI.SUM)
+    win.Unlock(0)
+    return int(result[0])
+
+
+def iter_dynamic_seeds(comm, total_seeds, root_computes=True):
+    """Yield seeds from a queue shared by all ranks of comm.
+
+    The queue is an atomic counter stored in an MPI window on rank 0.
+    Each rank takes the next seed whenever it is idle, so ranks that draw cheap
+    chunks process more of them. The generator must be exhausted on every rank,
+    since freeing the window at the end is a collective operation.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+
+    total_seeds : ndarray of shape (n_seeds, )
+
+    root_computes : bool, optional
+        When False, no seeds are yielded on rank 0, which only waits in the
+        collective that frees the window, and so serves the queue of the other
+        ranks without delay. Ignored when comm has a single rank, which always
+        computes. Default is True.
+
+    Yields
+    ------
+    seed : int
+
+    Notes
+    -----
+    Some MPI implementations only make progress on passive-target operations
+    when the target rank enters the MPI library, e.g., MPICH requires
+    MPICH_ASYNC_PROGRESS=1 for rank 0 to serve requests while it computes.
+    Without asynchronous progress, every Fetch_and_op issued while rank 0
+    evaluates a chunk stalls until rank 0 finishes that chunk, so with many
+    ranks the idle time of the queue can exceed the one rank lost to
+    root_computes=False.
+
+    """
+    win = _get_counter_window(comm)
+    n_seeds = len(total_seeds)
+    try:
+        root_computes = root_computes or comm.Get_size() == 1
+        if comm.Get_rank() == 0 and not root_computes:
+            return
+        iseed = _fetch_and_increment(win)
+        while iseed < n_seeds:
+            yield total_seeds[iseed]
+            iseed = _fetch_and_increment(win)
+    finally:
+        win.Free()
+
+
+def get_utilization_report(comm, n_chunks, busy_time, wall_time):
+    """Gather the per-rank utilization of a scan to rank 0.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+
+    n_chunks : int
+        Number of chunks processed by this rank
+
+    busy_time : float
+        Seconds this rank spent sampling, evaluating and writing chunks
+
+    wall_time : float
+        Seconds from the start of the scan until every rank finished
+
+    Returns
+    -------
+    report : str
+        Table with one row per rank on rank 0, None on all other ranks
+
+    """
+    stats = comm.gather((n_chunks, busy_time, wall_time), root=0)
+    if comm.Get_rank() != 0:
+        return None
+
+    lines = ["rank  n_chunks  busy_time  utilization"]
+    pat = "{0:>4}  {1:>8}  {2:>9.1f}  {3:>11.1%}"
+    for rank, (n, busy, wall) in enumerate(stats):
+        lines.append(pat.format(rank, n, busy, busy / max(wall, 1e-10)))
+    return "\n".join(lines)
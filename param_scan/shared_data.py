@@ -0,0 +1,105 @@
+"""Share read-only loss data between the MPI ranks of each node"""
+import numpy as np
+from mpi4py import MPI
+
+
+def get_node_comm(comm):
+    """Split comm into communicators of the ranks that share memory"""
+    return comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+
+
+def _flatten_loss_data(loss_data):
+    """Split loss_data into its ndarrays and a picklable description of the rest"""
+    if isinstance(loss_data, np.ndarray):
+        return [loss_data], ("array",)
+    elif isinstance(loss_data, (tuple, list)):
+        is_array = [isinstance(x, np.ndarray) for x in loss_data]
+        arrays = [x for x, a in zip(loss_data, is_array) if a]
+        others = [None if a else x for x, a in zip(loss_data, is_array)]
+        return arrays, (type(loss_data).__name__, is_array, others)
+    elif isinstance(loss_data, dict):
+        keys = list(loss_data.keys())
+        is_array = [isinstance(loss_data[key], np.ndarray) for key in keys]
+        arrays = [loss_data[key] for key, a in zip(keys, is_array) if a]
+        others = [None if a else loss_data[key] for key, a in zip(keys, is_array)]
+        return arrays, ("dict", is_array, others, keys)
+    return [], ("object", loss_data)
+
+
+def _unflatten_loss_data(arrays, structure):
+    kind = structure[0]
+    if kind == "array":
+        return arrays[0]
+    elif kind == "object":
+        return structure[1]
+    is_array, others = structure[1], structure[2]
+    arrays = iter(arrays)
+    values = [next(arrays) if a else x for x, a in zip(others, is_array)]
+    if kind == "dict":
+        return dict(zip(structure[3], values))
+    elif kind == "tuple":
+        return tuple(values)
+    return values
+
+
+def _allocate_shared_array(node_comm, shape, dtype):
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    size = max(nbytes, 1) if node_comm.Get_rank() == 0 else 0
+    win = MPI.Win.Allocate_shared(size, 1, comm=node_comm)
+    buf, __ = win.Shared_query(0)
+    arr = np.frombuffer(buf, dtype=np.uint8, count=nbytes).view(dtype).reshape(shape)
+    return win, arr
+
+
+def get_node_shared_loss_data(comm, get_loss_data):
+    """Load the loss data once per node into memory shared by the ranks of the node.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+
+    get_loss_data : callable
+        Function with no arguments returning the loss data. Only called by
+        the first rank of each node. The loss data can be an ndarray, a tuple,
+        list or dict whose ndarray entries are shared, or any other object,
+        which is broadcast to each rank.
+
+    Returns
+    -------
+    loss_data : object
+        Same structure as the output of get_loss_data, where every ndarray
+        is a read-only view of an MPI shared-memory window
+
+    windows : list of mpi4py.MPI.Win
+        Must be kept alive while loss_data is in use, and released on every
+        rank with free_shared_windows
+
+    """
+    node_comm = get_node_comm(comm)
+    if node_comm.Get_rank() == 0:
+        arrays, structure = _flatten_loss_data(get_loss_data())
+        specs = [(arr.shape, arr.dtype.str) for arr in arrays]
+    else:
+        arrays, structure, specs = None, None, None
+    structure, specs = node_comm.bcast((structure, specs), root=0)
+
+    windows, shared_arrays = [], []
+    for i, (shape, dtype) in enumerate(specs):
+        win, shared_arr = _allocate_shared_array(node_comm, shape, dtype)
+        if node_comm.Get_rank() == 0:
+            shared_arr[...] = arrays[i]
+        windows.append(win)
+        shared_arrays.append(shared_arr)
+    node_comm.Barrier()
+
+    for shared_arr in shared_arrays:
+        shared_arr.flags.writeable = False
+    node_comm.Free()
+    return _unflatten_loss_data(shared_arrays, structure), windows
+
+
+def free_shared_windows(windows):
+    """Release the windows of get_node_shared_loss_data. Collective on each node."""
+    for win in windows:
+        win.Free()
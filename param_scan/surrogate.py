@@ -0,0 +1,250 @@
+"""Cheap surrogate of the loss used to prescreen the candidates of a parameter scan,
+so that the expensive loss is only evaluated at the most promising points"""
+import numpy as np
+from scipy.interpolate import RBFInterpolator
+from scipy.spatial import cKDTree
+
+DEFAULT_EXPLORE_FRACTION = 0.2
+
+
+def select_training_points(params, loss, n_train, seed=0):
+    """Select the points used to fit the surrogate.
+
+    Parameters
+    ----------
+    params : ndarray of shape (n, n_params)
+
+    loss : ndarray of shape (n, )
+
+    n_train : int
+        Maximum number of selected points. When there are more points with
+        a finite loss, half are the points with the lowest loss, and the other
+        half are drawn at random from the remaining points.
+
+    seed : int, optional
+        Random number seed. Default is 0.
+
+    Returns
+    -------
+    train_params : ndarray of shape (min(n_train, n_finite), n_params)
+
+    train_loss : ndarray of shape (min(n_train, n_finite), )
+
+    """
+    is_finite = np.isfinite(loss)
+    params, loss = params[is_finite], loss[is_finite]
+    if loss.size <= n_train:
+        return params, loss
+
+    n_best = n_train // 2
+    isort = np.argsort(loss, kind="stable")
+    rng = np.random.default_rng(seed)
+    irandom = rng.choice(isort[n_best:], n_train - n_best, replace=False)
+    indx = np.concatenate((isort[:n_best], irandom))
+    return params[indx], loss[indx]
+
+
+def get_chunk_training_indices(n_rows, n_train, seed):
+    """Rows of a chunk that become training points of the surrogate.
+
+    The rows are drawn at random rather than taken from the start of the chunk,
+    since prescreened chunks list the exploited and explored candidates in
+    the order of the candidates, so that the first rows are not representative.
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of rows of the chunk
+
+    n_train : int
+        Number of selected rows, or every row when the chunk has fewer
+
+    seed : int
+        Random number seed, such as the seed of the chunk
+
+    Returns
+    -------
+    indx : ndarray of shape (min(n_train, n_rows), )
+        Sorted in ascending order
+
+    """
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n_rows, min(n_train, n_rows), replace=False))
+
+
+class RBFSurrogate:
+    """Radial basis function interpolation of the loss in the unit hypercube
+    spanned by the bounds of the scan.
+
+    The surrogate interpolates the rank of the loss rather than its value,
+    since only the ordering of the candidates matters, and the loss of a scan
+    typically spans orders of magnitude away from the optimum.
+
+    Parameters
+    ----------
+    train_params : ndarray of shape (n_train, n_params)
+
+    train_loss : ndarray of shape (n_train, )
+
+    xmins : ndarray of shape (n_params, )
+        Lower bound of the scan in each dimension
+
+    xmaxs : ndarray of shape (n_params, )
+        Upper bound of the scan in each dimension
+
+    smoothing : float, optional
+        Smoothing parameter of scipy.interpolate.RBFInterpolator.
+        Default is 0, in which case the surrogate interpolates the training points.
+
+    kernel : str, optional
+        Kernel of scipy.interpolate.RBFInterpolator.
+        Default is thin_plate_spline.
+
+    """
+
+    def __init__(
+        self,
+        train_params,
+        train_loss,
+        xmins,
+        xmaxs,
+        smoothing=0.0,
+        kernel="thin_plate_spline",
+    ):
+        self.xmins = np.asarray(xmins, dtype=float)
+        self.xmaxs = np.asarray(xmaxs, dtype=float)
+        x = self._get_unit_coords(train_params)
+        msg = "Need at least n_params+2 distinct training points to fit the surrogate"
+        assert np.unique(x, axis=0).shape[0] >= x.shape[1] + 2, msg
+
+        rank = np.argsort(np.argsort(train_loss, kind="stable"), kind="stable")
+        self._interp = RBFInterpolator(
+            x, rank / max(rank.size - 1, 1), smoothing=smoothing, kernel=kernel
+        )
+        self._tree = cKDTree(x)
+
+    def _get_unit_coords(self, params):
+        return (np.atleast_2d(params) - self.xmins) / (self.xmaxs - self.xmins)
+
+    def predict(self, params):
+        """Predicted rank of the loss, and distance to the nearest training point.
+
+        Parameters
+        ----------
+        params : ndarray of shape (n, n_params)
+
+        Returns
+        -------
+        predicted_rank : ndarray of shape (n, )
+            Approximately 0 at the lowest loss of the training points,
+            and 1 at the highest
+
+        distance : ndarray of shape (n, )
+            Distance in the unit hypercube to the nearest training point,
+            a proxy for the uncertainty of the prediction
+
+        """
+        x = self._get_unit_coords(params)
+        distance = self._tree.query(x)[0]
+        return self._interp(x), distance
+
+
+def fit_surrogate(train_params, train_loss, xmins, xmaxs, **kwargs):
+    """Fit an RBFSurrogate, or return None when the training points cannot
+    determine one, so that the scan proceeds without prescreening.
+
+    Parameters
+    ----------
+    train_params : ndarray of shape (n_train, n_params)
+
+    train_loss : ndarray of shape (n_train, )
+        Points with a non-finite loss are ignored
+
+    xmins : ndarray of shape (n_params, )
+
+    xmaxs : ndarray of shape (n_params, )
+
+    **kwargs : dict
+        Passed to RBFSurrogate
+
+    Returns
+    -------
+    surrogate : RBFSurrogate or None
+        None when there are fewer than n_params+2 distinct points with a finite
+        loss, or when the interpolation problem is singular
+
+    """
+    is_finite = np.isfinite(train_loss)
+    train_params, train_loss = train_params[is_finite], train_loss[is_finite]
+    n_params = np.shape(xmins)[0]
+    if np.unique(train_params, axis=0).shape[0] < n_params + 2:
+        return None
+    try:
+        return RBFSurrogate(train_params, train_loss, xmins, xmaxs, **kwargs)
+    except np.linalg.LinAlgError:
+        return None
+
+
+def select_prescreened_points(
+    predicted_rank, distance, n_select, explore_fraction=DEFAULT_EXPLORE_FRACTION
+):
+    """Indices of the candidates worth evaluating with the true loss.
+
+    Parameters
+    ----------
+    predicted_rank : ndarray of shape (n_candidates, )
+
+    distance : ndarray of shape (n_candidates, )
+
+    n_select : int
+
+    explore_fraction : float, optional
+        Fraction of the selected candidates that are the farthest from
+        any training point, rather than the lowest predicted loss, so that
+        regions the surrogate knows little about are still explored. Default is 0.2.
+
+    Returns
+    -------
+    indx : ndarray of shape (min(n_select, n_candidates), )
+        Sorted in ascending order
+
+    """
+    n_candidates = predicted_rank.size
+    n_select = min(n_select, n_candidates)
+    n_explore = int(round(explore_fraction * n_select))
+    n_exploit = n_select - n_explore
+
+    isort = np.argsort(predicted_rank, kind="stable")
+    iexploit = isort[:n_exploit]
+    iremaining = isort[n_exploit:]
+    ifar = np.argsort(-distance[iremaining], kind="stable")[:n_explore]
+    return np.sort(np.concatenate((iexploit, iremaining[ifar])))
+
+
+def prescreen_candidates(
+    surrogate, candidates, n_select, explore_fraction=DEFAULT_EXPLORE_FRACTION
+):
+    """Select the most promising and the most uncertain candidates.
+
+    Parameters
+    ----------
+    surrogate : RBFSurrogate
+
+    candidates : ndarray of shape (n_candidates, n_params)
+
+    n_select : int
+
+    explore_fraction : float, optional
+        See select_prescreened_points. Default is 0.2.
+
+    Returns
+    -------
+    selected : ndarray of shape (min(n_select, n_candidates), n_params)
+        Rows of candidates, in their original order
+
+    """
+    predicted_rank, distance = surrogate.predict(candidates)
+    indx = select_prescreened_points(
+        predicted_rank, distance, n_select, explore_fraction
+    )
+    return candidates[indx]
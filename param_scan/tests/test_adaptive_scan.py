@@ -0,0 +1,97 @@
+"""
+"""
+import numpy as np
+from mpi4py import MPI
+from ..adaptive_scan import select_best_k, gather_best_k, get_refinement_distribution
+from ..adaptive_scan import sample_refinement_round
+from ..latin_hypercube import latin_hypercube, get_cov_transform
+
+
+SEED = 0
+
+
+def _quadratic_loss(param_chunk):
+    return np.sum((param_chunk - np.array((0.3, -0.2))) ** 2, axis=1)
+
+
+def test_select_best_k():
+    rng = np.random.RandomState(SEED)
+    params = rng.uniform(0, 1, (500, 3))
+    loss = rng.uniform(0, 1, 500)
+    best_params, best_loss = select_best_k(params, loss, 20)
+    assert best_params.shape == (20, 3)
+    assert np.all(best_loss == np.sort(loss)[:20])
+    assert np.all(best_params == params[np.argsort(loss)[:20]])
+
+    best_params, best_loss = select_best_k(params[:5], loss[:5], 20)
+    assert best_params.shape == (5, 3)
+    assert np.all(best_loss == np.sort(loss[:5]))
+
+
+def test_gather_best_k_single_rank():
+    rng = np.random.RandomState(SEED)
+    params = rng.uniform(0, 1, (500, 3))
+    loss = rng.uniform(0, 1, 500)
+    best_params, best_loss = gather_best_k(MPI.COMM_SELF, params, loss, 20)
+    assert np.all(best_loss == np.sort(loss)[:20])
+
+
+def test_get_refinement_distribution_is_positive_definite():
+    best_params = np.array([[0.0, 1.0, 2.0], [1.0, 1.0, 3.0]])
+    mu, cov = get_refinement_distribution(best_params, min_sigma=0.01)
+    assert np.allclose(mu, (0.5, 1.0, 2.5))
+    assert np.all(np.linalg.eigvalsh(cov) > 0)
+
+    mu, cov = get_refinement_distribution(best_params[:1], min_sigma=0.01)
+    assert np.allclose(mu, best_params[0])
+    assert np.allclose(cov, 1e-4 * np.eye(3))
+    get_cov_transform(cov)
+
+
+def test_refinement_rounds_reduce_loss():
+    xmins, xmaxs = np.array((-1.0, -1.0)), np.array((1.0, 1.0))
+    n_per_round, n_best = 200, 20
+    params = latin_hypercube(xmins, xmaxs, 2, n_per_round, seed=SEED)
+    loss = _quadratic_loss(params)
+    best_loss_seq = [loss.min()]
+    for iround in range(1, 5):
+        best_params, best_loss = select_best_k(params, loss, n_best)
+        mu, cov = get_refinement_distribution(best_params, min_sigma=1e-6)
+        sig = 3.0 * 0.5 ** (iround - 1)
+        new_params = sample_refinement_round(
+            mu, cov, sig, n_per_round, xmins, xmaxs, seed=iround
+        )
+        assert np.all(new_params >= xmins) & np.all(new_params <= xmaxs)
+        params = np.concatenate((best_params, new_params))
+        loss = np.concatenate((best_loss, _quadratic_loss(new_params)))
+        best_loss_seq.append(loss.min())
+    assert best_loss_seq[-1] < best_loss_seq[0] / 10
+
+
+def test_sample_refinement_round_near_bound_has_no_clipped_duplicates():
+    xmins, xmaxs = np.array((-1.0, -1.0)), np.array((1.0, 1.0))
+    cov = np.array([[0.01, 0.005], [0.005, 0.02]])
+    npts = 500
+    for mu, max_draws in (((0.95, 0.0), 4), ((0.99, -0.99), 1)):
+        mu = np.array(mu)
+        sample = sample_refinement_round(
+            mu, cov, 3.0, npts, xmins, xmaxs, seed=SEED, max_draws=max_draws
+        )
+        assert sample.shape == (npts, 2)
+        assert np.all(sample >= xmins) & np.all(sample <= xmaxs)
+        assert not np.any((sample == xmins) | (sample == xmaxs))
+        for idim in range(2):
+            assert np.unique(sample[:, idim]).size == npts
+
+
+def test_sample_refinement_round_accepts_precomputed_transform():
+    xmins, xmaxs = np.array((-1.0, -1.0)), np.array((1.0, 1.0))
+    mu = np.array((0.95, 0.0))
+    cov = np.array([[0.01, 0.005], [0.005, 0.02]])
+    transform = get_cov_transform(cov)
+    for seed in range(3):
+        sample = sample_refinement_round(mu, cov, 3.0, 100, xmins, xmaxs, seed=seed)
+        sample2 = sample_refinement_round(
+            mu, None, 3.0, 100, xmins, xmaxs, seed=seed, transform=transform
+        )
+        assert np.all(sample == sample2)
@@ -0,0 +1,39 @@
+"""
+"""
+import time
+from ..background_writer import BackgroundWriter
+
+
+def _slow_append(collector, x):
+    time.sleep(0.001)
+    collector.append(x)
+    return x
+
+
+def _fail(x):
+    raise OSError("disk full")
+
+
+def test_background_writer_preserves_order():
+    collector = []
+    writer = BackgroundWriter(max_pending=2)
+    for x in range(20):
+        writer.submit(_slow_append, collector, x)
+    results = writer.close()
+    assert collector == list(range(20))
+    assert results == list(range(20))
+
+
+def test_background_writer_reraises_errors():
+    collector = []
+    writer = BackgroundWriter()
+    try:
+        writer.submit(_slow_append, collector, 0)
+        writer.submit(_fail, 1)
+        writer.submit(_slow_append, collector, 2)
+        writer.close()
+        raised = False
+    except RuntimeError as error:
+        raised = isinstance(error.__cause__, OSError)
+    assert raised
+    assert collector == [0]
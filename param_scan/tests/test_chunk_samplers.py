@@ -0,0 +1,130 @@
+"""
+"""
+import numpy as np
+from ..chunk_samplers import get_chunk_sampler, get_chunk_offsets, CHUNK_SAMPLERS
+from .. import chunk_samplers as chunk_samplers_module
+from ..latin_hypercube import latin_hypercube, sobol_hypercube, halton_hypercube
+from ..latin_hypercube import latin_hypercube_batch
+from ..latin_hypercube_stream import latin_hypercube_block
+
+
+def test_get_chunk_sampler_shapes_and_bounds():
+    xmins = np.array((-3.0, -2.0, 0.0))
+    xmaxs = np.array((2.0, 3.0, 5.0))
+    n_chunks, n_per_chunk = 4, 250
+    for sampler in CHUNK_SAMPLERS:
+        sample_chunk = get_chunk_sampler(sampler, xmins, xmaxs, n_chunks, n_per_chunk)
+        for ichunk in range(n_chunks):
+            param_chunk = sample_chunk(ichunk)
+            assert param_chunk.shape == (n_per_chunk, 3)
+            assert np.all(param_chunk >= xmins)
+            assert np.all(param_chunk <= xmaxs)
+
+
+def test_lhs_chunk_sampler_matches_latin_hypercube():
+    xmins, xmaxs = (-3.0, -2.0), (2.0, 3.0)
+    sample_chunk = get_chunk_sampler("lhs", xmins, xmaxs, 10, 100)
+    correct = latin_hypercube(xmins, xmaxs, 2, 100, seed=7)
+    assert np.all(sample_chunk(7) == correct)
+
+
+def test_global_lhs_chunk_sampler_stratifies_the_full_scan():
+    xmins, xmaxs = (0.0, 0.0), (1.0, 1.0)
+    n_chunks, n_per_chunk = 8, 125
+    sample_chunk = get_chunk_sampler("global_lhs", xmins, xmaxs, n_chunks, n_per_chunk)
+    scan = np.concatenate([sample_chunk(ichunk) for ichunk in range(n_chunks)])
+    n_tot = n_chunks * n_per_chunk
+    for idim in range(2):
+        strata = np.floor(scan[:, idim] * n_tot).astype(int)
+        assert np.all(np.sort(strata) == np.arange(n_tot))
+
+
+def test_sobol_chunk_sampler_slices_a_single_sequence():
+    xmins, xmaxs = (-3.0, -2.0), (2.0, 3.0)
+    n_chunks, n_per_chunk = 4, 256
+    sample_chunk = get_chunk_sampler("sobol", xmins, xmaxs, n_chunks, n_per_chunk)
+    scan = np.concatenate([sample_chunk(ichunk) for ichunk in range(n_chunks)])
+    correct = sobol_hypercube(xmins, xmaxs, 2, n_chunks * n_per_chunk, seed=0)
+    assert np.allclose(scan, correct)
+
+
+def test_fast_lhs_chunks_do_not_depend_on_prefetch():
+    xmins, xmaxs = (-3.0, -2.0), (2.0, 3.0)
+    n_chunks, n_per_chunk = 10, 100
+    sample_chunk = get_chunk_sampler("fast_lhs", xmins, xmaxs, n_chunks, n_per_chunk)
+    sample_chunk_prefetch = get_chunk_sampler(
+        "fast_lhs", xmins, xmaxs, n_chunks, n_per_chunk, prefetch=4
+    )
+    for ichunk in (0, 1, 2, 7, 3, 9):
+        assert np.all(sample_chunk(ichunk) == sample_chunk_prefetch(ichunk))
+
+
+def test_get_chunk_offsets_regenerate_each_chunk():
+    xmins, xmaxs = (-3.0, -2.0), (2.0, 3.0)
+    n_chunks, n_per_chunk, seed = 6, 64, 11
+    for sampler in CHUNK_SAMPLERS:
+        sample_chunk = get_chunk_sampler(
+            sampler, xmins, xmaxs, n_chunks, n_per_chunk, seed=seed
+        )
+        offsets = get_chunk_offsets(sampler, n_chunks, n_per_chunk, seed=seed)
+        for ichunk in (0, 3, 5):
+            # Every formula is a function of ichunk and the constants of offsets
+            values = {
+                key: eval(value, dict(offsets, ichunk=ichunk))
+                if isinstance(value, str)
+                else value
+                for key, value in offsets.items()
+            }
+            chunk_seed = values.get("chunk_seed", None)
+            if sampler == "lhs":
+                correct = latin_hypercube(xmins, xmaxs, 2, n_per_chunk, seed=chunk_seed)
+            elif sampler == "fast_lhs":
+                correct = latin_hypercube_batch(
+                    xmins, xmaxs, 2, n_per_chunk, [chunk_seed]
+                )[0]
+            elif sampler == "global_lhs":
+                block_index = values["row_offset"] // n_per_chunk
+                correct = latin_hypercube_block(
+                    *(xmins, xmaxs, 2, values["num_evaluations"], n_per_chunk),
+                    block_index,
+                    values["seed"],
+                )
+            else:
+                is_sobol = sampler == "sobol"
+                qmc_hypercube = sobol_hypercube if is_sobol else halton_hypercube
+                correct = qmc_hypercube(
+                    *(xmins, xmaxs, 2, n_per_chunk),
+                    seed=values["seed"],
+                    skip=values["skip"],
+                )
+            assert np.allclose(sample_chunk(ichunk), correct)
+
+    try:
+        get_chunk_offsets("grid", n_chunks, n_per_chunk)
+        raised = False
+    except ValueError:
+        raised = True
+    assert raised
+
+
+def test_fast_lhs_prefetch_stops_at_last_chunk():
+    xmins, xmaxs = (-3.0, -2.0), (2.0, 3.0)
+    n_chunks, n_per_chunk = 20, 100
+    n_generated = []
+    latin_hypercube_batch = chunk_samplers_module.latin_hypercube_batch
+
+    def _counting_batch(xmins, xmaxs, n_dim, n_per_chunk, seeds):
+        n_generated.append(len(seeds))
+        return latin_hypercube_batch(xmins, xmaxs, n_dim, n_per_chunk, seeds)
+
+    chunk_samplers_module.latin_hypercube_batch = _counting_batch
+    try:
+        sample_chunk = get_chunk_sampler(
+            "fast_lhs", xmins, xmaxs, n_chunks, n_per_chunk, prefetch=8, last_chunk=9
+        )
+        probe = sample_chunk(5)
+        chunks = [sample_chunk(ichunk) for ichunk in range(5, 10)]
+    finally:
+        chunk_samplers_module.latin_hypercube_batch = latin_hypercube_batch
+    assert n_generated == [5]
+    assert np.all(probe == chunks[0])
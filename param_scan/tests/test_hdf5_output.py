@@ -0,0 +1,142 @@
+"""
+"""
+import os
+import warnings
+import numpy as np
+import h5py
+from mpi4py import MPI
+from tempfile import TemporaryDirectory
+from ..hdf5_output import HDF5ScanWriter, PARAMS_KEY, LOSS_KEY, CHUNK_DONE_KEY
+from ..hdf5_output import get_hdf5_shard_fname, _collate_shard
+
+
+SEED = 0
+
+
+def test_hdf5_scan_writer_writes_hyperslabs():
+    comm = MPI.COMM_SELF
+    n_chunks, n_per_chunk, n_params = 5, 20, 3
+    rng = np.random.RandomState(SEED)
+    with TemporaryDirectory() as drn:
+        fname = os.path.join(drn, "scan.h5")
+        writer = HDF5ScanWriter(fname, comm, n_chunks, n_per_chunk, n_params)
+        chunks = dict()
+        for ichunk in (3, 0, 1):
+            param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+            loss_arr = rng.uniform(0, 1, n_per_chunk)
+            writer.write_chunk(ichunk, param_chunk, loss_arr)
+            chunks[ichunk] = param_chunk, loss_arr
+        writer.close()
+        assert not os.path.exists(get_hdf5_shard_fname(fname, 0))
+
+        with h5py.File(fname, "r") as f:
+            params = f[PARAMS_KEY][...]
+            loss = f[LOSS_KEY][...]
+            chunk_done = f[CHUNK_DONE_KEY][...]
+    assert params.shape == (n_chunks * n_per_chunk, n_params)
+    assert loss.shape == (n_chunks * n_per_chunk,)
+    for ichunk, (param_chunk, loss_arr) in chunks.items():
+        s = slice(ichunk * n_per_chunk, (ichunk + 1) * n_per_chunk)
+        assert np.all(params[s] == param_chunk)
+        assert np.all(loss[s] == loss_arr)
+    assert np.array_equal(chunk_done, [True, True, False, True, False])
+
+
+def test_hdf5_scan_writer_resumes_existing_file():
+    comm = MPI.COMM_SELF
+    n_chunks, n_per_chunk, n_params = 5, 20, 3
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+    loss_arr = rng.uniform(0, 1, n_per_chunk)
+    with TemporaryDirectory() as drn:
+        fname = os.path.join(drn, "scan.h5")
+        writer = HDF5ScanWriter(fname, comm, n_chunks, n_per_chunk, n_params)
+        writer.write_chunk(1, param_chunk, loss_arr)
+        writer.write_chunk(4, param_chunk, loss_arr)
+        writer.close()
+
+        args = fname, comm, n_chunks, n_per_chunk, n_params
+        writer = HDF5ScanWriter(*args, resume=True)
+        assert np.all(writer.get_completed_chunks() == (1, 4))
+        params_read, loss_read = writer.read_chunk(4)
+        assert np.all(params_read == param_chunk)
+        assert np.all(loss_read == loss_arr)
+        writer.write_chunk(2, param_chunk, loss_arr)
+        assert np.all(writer.get_completed_chunks() == (1, 2, 4))
+        writer.close()
+
+        for dtype_kwarg in (dict(param_dtype="f4"), dict(loss_dtype="f4")):
+            try:
+                HDF5ScanWriter(*args, resume=True, **dtype_kwarg)
+                raised = False
+            except AssertionError:
+                raised = True
+            assert raised
+
+        writer = HDF5ScanWriter(*args)
+        assert writer.get_completed_chunks().size == 0
+        writer.close()
+
+
+def test_hdf5_scan_writer_resume_collates_shards_of_interrupted_scan():
+    comm = MPI.COMM_SELF
+    n_chunks, n_per_chunk, n_params = 5, 20, 3
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+    loss_arr = rng.uniform(0, 1, n_per_chunk)
+    with TemporaryDirectory() as drn:
+        fname = os.path.join(drn, "scan.h5")
+        args = fname, comm, n_chunks, n_per_chunk, n_params
+        writer = HDF5ScanWriter(*args, use_mpio=False)
+        writer.write_chunk(3, param_chunk, loss_arr)
+        writer._shard.close()
+        assert os.path.exists(get_hdf5_shard_fname(fname, 0))
+
+        writer = HDF5ScanWriter(*args, use_mpio=False, resume=True)
+        assert not os.path.exists(get_hdf5_shard_fname(fname, 0))
+        assert np.all(writer.get_completed_chunks() == (3,))
+        writer.close()
+        with h5py.File(fname, "r") as f:
+            assert np.all(f[LOSS_KEY][3 * n_per_chunk : 4 * n_per_chunk] == loss_arr)
+
+
+def test_hdf5_shard_is_kept_when_collation_fails():
+    comm = MPI.COMM_SELF
+    n_chunks, n_per_chunk, n_params = 5, 20, 3
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+    loss_arr = rng.uniform(0, 1, n_per_chunk)
+    with TemporaryDirectory() as drn:
+        fname = os.path.join(drn, "scan.h5")
+        args = fname, comm, n_chunks, n_per_chunk, n_params
+        writer = HDF5ScanWriter(*args, use_mpio=False)
+        writer.write_chunk(3, param_chunk, loss_arr)
+        writer._shard.close()
+        shard_fname = get_hdf5_shard_fname(fname, 0)
+
+        with h5py.File(fname, "r") as f:
+            try:
+                _collate_shard(f, shard_fname, n_per_chunk, skip_unreadable=True)
+                raised = False
+            except Exception:
+                raised = True
+        assert raised
+        assert os.path.exists(shard_fname)
+
+        with open(shard_fname, "wb") as fout:
+            fout.write(b"truncated")
+        try:
+            _collate_shard(None, shard_fname, n_per_chunk)
+            raised = False
+        except OSError:
+            raised = True
+        assert raised
+        assert os.path.exists(shard_fname)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            writer = HDF5ScanWriter(*args, use_mpio=False, resume=True)
+        assert len(caught) == 1
+        assert not os.path.exists(shard_fname)
+        assert writer.get_completed_chunks().size == 0
+        writer.close()
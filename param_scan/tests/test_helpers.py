@@ -1,9 +1,14 @@
 """
 """
 import os
+import warnings
 import numpy as np
+from tempfile import TemporaryDirectory
 from ..helpers import get_parallel_outbase_pattern, get_mpi_rank_outname
-from ..helpers import get_equal_sized_data_chunks
+from ..helpers import get_equal_sized_data_chunks, write_param_chunk
+from ..helpers import get_rank_shard_fnames, cleanup_and_collate
+from ..helpers import get_completed_batches, get_result_dtype
+from .. import helpers as helpers_module
 
 
 _THIS_DRNAME = os.path.dirname(os.path.abspath(__file__))
@@ -45,3 +50,156 @@ def test_get_equal_sized_data_chunks():
         assert 0 < n_per_cube <= n_cube_max, msg
         num_computed = n_ranks * n_cubes * n_per_cube
         assert n_scan_tot / 2 < num_computed <= n_scan_tot, msg
+
+
+def test_get_rank_shard_fnames_is_sorted_by_batch_and_rank():
+    with TemporaryDirectory() as drn:
+        outname = os.path.join(drn, "scan.dat")
+        rank_batch_seq = [(1, 10), (0, 2), (1, 3), (0, 11)]
+        for rank, batch in rank_batch_seq:
+            rank_outname = get_mpi_rank_outname(outname, rank, batch)
+            write_param_chunk(rank_outname, np.zeros((2, 2)), np.zeros(2))
+        np.save(outname, np.zeros(3))
+        rank_fnames = get_rank_shard_fnames(outname)
+
+    correct_fnames = [
+        get_mpi_rank_outname(outname, rank, batch) + ".npy"
+        for rank, batch in sorted(rank_batch_seq, key=lambda x: (x[1], x[0]))
+    ]
+    assert rank_fnames == correct_fnames
+
+
+def test_cleanup_and_collate():
+    rng = np.random.RandomState(SEED)
+    n_params = 3
+    with TemporaryDirectory() as drn:
+        outname = os.path.join(drn, "scan.dat")
+        collector = []
+        for rank in range(3):
+            for ibatch in range(4):
+                n_chunk = rng.randint(1, 50)
+                param_chunk = rng.uniform(0, 1, (n_chunk, n_params))
+                loss_arr = rng.uniform(0, 1, n_chunk)
+                batch = 4 * rank + ibatch
+                rank_outname = get_mpi_rank_outname(outname, rank, batch)
+                write_param_chunk(rank_outname, param_chunk, loss_arr)
+                collector.append(np.column_stack((param_chunk, loss_arr)))
+        cleanup_and_collate(outname)
+        results = np.load(outname + ".npy")
+        assert get_rank_shard_fnames(outname) == []
+    assert np.all(results == np.concatenate(collector))
+
+
+def test_get_completed_batches():
+    n_per_chunk, n_params = 10, 2
+    with TemporaryDirectory() as drn:
+        outname = os.path.join(drn, "scan.dat")
+        for rank, batch in [(0, 0), (0, 1), (1, 2)]:
+            rank_outname = get_mpi_rank_outname(outname, rank, batch)
+            write_param_chunk(
+                rank_outname, np.zeros((n_per_chunk, n_params)), np.zeros(n_per_chunk)
+            )
+
+        wrong_shape_fname = get_mpi_rank_outname(outname, 1, 3)
+        write_param_chunk(wrong_shape_fname, np.zeros((5, n_params)), np.zeros(5))
+        truncated_fname = get_mpi_rank_outname(outname, 1, 4) + ".npy"
+        with open(get_mpi_rank_outname(outname, 0, 0) + ".npy", "rb") as fin:
+            content = fin.read()
+        with open(truncated_fname, "wb") as fout:
+            fout.write(content[: len(content) // 2])
+
+        completed, invalid_fnames = get_completed_batches(
+            outname, n_per_chunk, n_params
+        )
+        assert sorted(completed.keys()) == [0, 1, 2]
+        assert invalid_fnames == [wrong_shape_fname + ".npy", truncated_fname]
+
+        stray_fname = get_mpi_rank_outname(outname, 0, 7)
+        write_param_chunk(
+            stray_fname, np.zeros((n_per_chunk, n_params)), np.zeros(n_per_chunk)
+        )
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            completed, invalid_fnames = get_completed_batches(
+                outname, n_per_chunk, n_params, n_batches=5
+            )
+        assert len(caught) == 1
+        assert sorted(completed.keys()) == [0, 1, 2]
+        assert stray_fname + ".npy" not in invalid_fnames
+        assert os.path.exists(stray_fname + ".npy")
+
+
+def test_write_param_chunk_compact_layout_and_resume():
+    rng = np.random.RandomState(SEED)
+    n_per_chunk, n_params = 10, 3
+    with TemporaryDirectory() as drn:
+        outname = os.path.join(drn, "scan.dat")
+        collector = []
+        for batch in range(3):
+            param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+            loss_arr = rng.uniform(0, 1, n_per_chunk)
+            rank_outname = get_mpi_rank_outname(outname, 0, batch)
+            write_param_chunk(rank_outname, param_chunk, loss_arr, param_dtype="f4")
+            collector.append((param_chunk, loss_arr))
+
+        completed, invalid_fnames = get_completed_batches(
+            outname, n_per_chunk, n_params, param_dtype="f4"
+        )
+        assert sorted(completed.keys()) == [0, 1, 2]
+        completed, invalid_fnames = get_completed_batches(
+            outname, n_per_chunk, n_params
+        )
+        assert len(completed) == 0 and len(invalid_fnames) == 3
+
+        cleanup_and_collate(outname)
+        results = np.load(outname + ".npy")
+    assert results.dtype == get_result_dtype(n_params)
+    params = np.concatenate([x[0] for x in collector])
+    loss = np.concatenate([x[1] for x in collector])
+    assert np.all(results["params"] == params.astype("f4"))
+    assert np.all(results["loss"] == loss)
+
+
+def test_cleanup_and_collate_explicit_file_list():
+    n_params = 2
+    with TemporaryDirectory() as drn:
+        outname = os.path.join(drn, "scan.dat")
+        rank_fnames = []
+        for batch in range(3):
+            param_chunk = np.zeros((5, n_params)) + batch
+            rank_outname = get_mpi_rank_outname(outname, 0, batch)
+            rank_fname = write_param_chunk(rank_outname, param_chunk, np.zeros(5))
+            rank_fnames.append(rank_fname)
+        stray_fname = write_param_chunk(
+            get_mpi_rank_outname(outname, 1, 3), np.ones((5, n_params)), np.zeros(5)
+        )
+        cleanup_and_collate(outname, rank_fnames[::-1])
+        results = np.load(outname + ".npy")
+        assert os.path.isfile(stray_fname)
+    assert np.all(results[:5, 0] == 2)
+    assert np.all(results[-5:, 0] == 0)
+
+
+def test_write_param_chunk_writes_blocks_through_small_buffer():
+    rng = np.random.RandomState(SEED)
+    n_per_chunk, n_params = 1003, 3
+    param_chunk = rng.uniform(0, 1, (n_per_chunk, n_params))
+    loss_arr = rng.uniform(0, 1, n_per_chunk)
+    write_buffer_bytes = helpers_module.WRITE_BUFFER_BYTES
+    helpers_module.WRITE_BUFFER_BYTES = 1000
+    try:
+        with TemporaryDirectory() as drn:
+            fname = write_param_chunk(os.path.join(drn, "a.dat"), param_chunk, loss_arr)
+            results = np.load(fname)
+            assert np.all(results[:, :-1] == param_chunk)
+            assert np.all(results[:, -1] == loss_arr)
+
+            fname = write_param_chunk(
+                os.path.join(drn, "b.dat"), param_chunk, loss_arr, param_dtype="f4"
+            )
+            results = np.load(fname)
+            assert np.all(results["params"] == param_chunk.astype("f4"))
+            assert np.all(results["loss"] == loss_arr)
+            assert not os.path.exists(fname + ".tmp")
+    finally:
+        helpers_module.WRITE_BUFFER_BYTES = write_buffer_bytes
@@ -0,0 +1,43 @@
+"""
+"""
+import os
+import numpy as np
+from mpi4py import MPI
+from tempfile import TemporaryDirectory
+from ..kdtree_cache import get_array_fingerprint, get_cached_kdtree
+from ..latin_hypercube_sampler import get_scipy_kdtree
+
+
+SEED = 0
+
+
+def test_get_array_fingerprint_depends_on_values_dtype_and_shape():
+    x = np.arange(12.0)
+    fingerprint = get_array_fingerprint(x)
+    assert fingerprint == get_array_fingerprint(x.copy())
+    assert fingerprint != get_array_fingerprint(x[::-1])
+    assert fingerprint != get_array_fingerprint(x.astype("f4"))
+    assert fingerprint != get_array_fingerprint(x.reshape((3, 4)))
+    assert get_array_fingerprint(x, x + 1) != get_array_fingerprint(x + 1, x)
+
+
+def test_get_cached_kdtree_agrees_with_get_scipy_kdtree():
+    rng = np.random.RandomState(SEED)
+    x, y = rng.uniform(0, 1, (2, 5_000))
+    points = rng.uniform(0, 1, (200, 2))
+    tree = get_scipy_kdtree(x, y)
+    dd, indx = tree.query(points)
+    with TemporaryDirectory() as drn:
+        cached_tree = get_cached_kdtree(drn, x, y)
+        assert len(os.listdir(drn)) == 1
+        assert isinstance(cached_tree.data, np.memmap)
+        dd2, indx2 = cached_tree.query(points)
+        assert np.all(indx == indx2)
+        assert np.allclose(dd, dd2)
+
+        cached_tree = get_scipy_kdtree(x, y, cache_dir=drn, comm=MPI.COMM_WORLD)
+        assert len(os.listdir(drn)) == 1
+        assert np.all(cached_tree.query(points)[1] == indx)
+
+        get_cached_kdtree(drn, x, y[::-1])
+        assert len(os.listdir(drn)) == 2
@@ -1,8 +1,12 @@
 """
 """
+from time import time
 import numpy as np
+from scipy.stats.qmc import Halton
 from ..latin_hypercube import latin_hypercube, latin_hypercube_from_cov
 from ..latin_hypercube import uniform_random_hypercube, latin_hypercube_pydoe
+from ..latin_hypercube import _format_inputs, sobol_hypercube, halton_hypercube
+from ..latin_hypercube import get_cov_transform, latin_hypercube_batch
 
 
 def verify_lhs_respects_bounds(box, xmins, xmaxs):
@@ -223,3 +227,115 @@ def test_latin_hypercube_from_non_diagonal_cov():
     for idim in range(2):
         assert np.all(lhs2[:, idim] > mu[idim] - 2 * sig * np.sqrt(cov[idim, idim]))
         assert np.all(lhs2[:, idim] < mu[idim] + 2 * sig * np.sqrt(cov[idim, idim]))
+
+
+def test_format_inputs_keeps_scalar_bounds_as_vectors():
+    npts = 5000
+    xmins, xmaxs, num_params = _format_inputs((-3, -2, 0), (2, 3, 5), 3, npts)
+    assert xmins.shape == xmaxs.shape == (3,)
+    assert num_params == 3
+
+    xmins, xmaxs, num_params = _format_inputs(-3, 2, 1, npts)
+    assert xmins.shape == xmaxs.shape == (1,)
+    assert num_params == 1
+
+    xmins, xmaxs, num_params = _format_inputs(
+        (-3, -2 + np.zeros(npts)), (2, 3), 2, npts
+    )
+    assert xmins.shape == xmaxs.shape == (2, npts)
+    assert num_params == 2
+
+
+def test_qmc_hypercubes_respect_bounds_and_are_reproducible():
+    xmins = (-3, -2, 0)
+    xmaxs = (2, 3, 5)
+    n_dim = len(xmins)
+    npts = 4096
+    for qmc_hypercube in (sobol_hypercube, halton_hypercube):
+        box = qmc_hypercube(xmins, xmaxs, n_dim, npts, seed=0)
+        verify_lhs_respects_bounds(box, xmins, xmaxs)
+        box1 = qmc_hypercube(xmins, xmaxs, n_dim, npts, seed=0)
+        box2 = qmc_hypercube(xmins, xmaxs, n_dim, npts, seed=2)
+        assert np.allclose(box, box1)
+        assert not np.allclose(box, box2)
+
+
+def test_qmc_hypercubes_skip_gives_disjoint_slices_of_one_sequence():
+    xmins = (-3, -2, 0)
+    xmaxs = (2, 3, 5)
+    n_dim = len(xmins)
+    npts, n_slices = 1024, 4
+    for qmc_hypercube in (sobol_hypercube, halton_hypercube):
+        full = qmc_hypercube(xmins, xmaxs, n_dim, npts * n_slices, seed=1)
+        slices = [
+            qmc_hypercube(xmins, xmaxs, n_dim, npts, seed=1, skip=i * npts)
+            for i in range(n_slices)
+        ]
+        assert np.allclose(full, np.concatenate(slices))
+
+
+def test_qmc_hypercubes_large_skip_is_fast_and_contiguous():
+    xmins = (-3, -2, 0)
+    xmaxs = (2, 3, 5)
+    n_dim = len(xmins)
+    skip, npts, overlap = 2**24, 64, 16
+    for qmc_hypercube in (sobol_hypercube, halton_hypercube):
+        start = time()
+        box = qmc_hypercube(xmins, xmaxs, n_dim, npts, seed=1, skip=skip)
+        assert time() - start < 1.0
+        box2 = qmc_hypercube(xmins, xmaxs, n_dim, npts, seed=1, skip=skip - overlap)
+        assert np.allclose(box[:-overlap], box2[overlap:])
+
+    engine = Halton(n_dim, scramble=True, seed=1)
+    engine.fast_forward(2**16)
+    correct = engine.random(npts) * (np.array(xmaxs) - xmins) + xmins
+    box = halton_hypercube(xmins, xmaxs, n_dim, npts, seed=1, skip=2**16)
+    assert np.allclose(box, correct)
+
+
+def test_get_cov_transform_reproduces_cov():
+    cov = np.array([[0.014, 0.0075], [0.0075, 0.015]])
+    for method in ("eigh", "cholesky"):
+        T = get_cov_transform(cov, method=method)
+        assert np.allclose(T.T.dot(T), cov)
+
+    singular_cov = np.array([[1.0, 1.0], [1.0, 1.0]])
+    T = get_cov_transform(singular_cov)
+    assert np.allclose(T.T.dot(T), singular_cov)
+    indefinite_cov = np.array([[1.0, 2.0], [2.0, 1.0]])
+    for cov, method in ((singular_cov, "cholesky"), (indefinite_cov, "eigh")):
+        try:
+            get_cov_transform(cov, method=method)
+            raised = False
+        except ValueError:
+            raised = True
+        assert raised
+
+
+def test_latin_hypercube_from_cov_reuses_transform_and_out():
+    mu = np.array((4.0, -5.0))
+    cov = np.array([[0.014, 0.0075], [0.0075, 0.015]])
+    n = 500
+    lhs = latin_hypercube_from_cov(mu, cov, 5, n, seed=0)
+
+    T = get_cov_transform(cov)
+    out = np.empty((n, 2))
+    lhs2 = latin_hypercube_from_cov(mu, None, 5, n, seed=0, transform=T, out=out)
+    assert lhs2 is out
+    assert np.allclose(lhs, lhs2)
+
+
+def test_latin_hypercube_batch_stratifies_each_seed():
+    xmins, xmaxs = (-3.0, -2.0, 0.0), (2.0, 3.0, 5.0)
+    n_dim, npts, seeds = 3, 200, np.arange(5)
+    out = np.empty((seeds.size, npts, n_dim))
+    sample = latin_hypercube_batch(xmins, xmaxs, n_dim, npts, seeds, out=out)
+    assert sample is out
+    for i, seed in enumerate(seeds):
+        verify_lhs_respects_bounds(sample[i], xmins, xmaxs)
+        for idim in range(n_dim):
+            x = (sample[i, :, idim] - xmins[idim]) / (xmaxs[idim] - xmins[idim])
+            strata = np.floor(x * npts).astype(int)
+            assert np.all(np.sort(strata) == np.arange(npts))
+        single = latin_hypercube_batch(xmins, xmaxs, n_dim, npts, [seed])
+        assert np.all(single[0] == sample[i])
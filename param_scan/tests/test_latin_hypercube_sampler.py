@@ -0,0 +1,122 @@
+"""
+"""
+import os
+import numpy as np
+from tempfile import TemporaryDirectory
+from ..latin_hypercube_sampler import get_scipy_kdtree, retrieve_lh_sample_indices
+from ..latin_hypercube_sampler import retrieve_lh_sample_indices_batch
+from ..latin_hypercube_sampler import _get_sample_diagnostics
+from ..latin_hypercube import latin_hypercube_batch
+from ..latin_hypercube_sampler import retrieve_lh_sample_indices_streaming
+
+
+SEED = 0
+
+
+def _get_dummy_tree(n_data=20_000):
+    rng = np.random.RandomState(SEED)
+    x = rng.uniform(-1, 1, n_data)
+    y = rng.normal(loc=0, scale=1, size=n_data)
+    return get_scipy_kdtree(x, y)
+
+
+def test_retrieve_lh_sample_indices():
+    tree = _get_dummy_tree()
+    indx = retrieve_lh_sample_indices(tree, (-1, -1), (1, 1), 2, 500, seed=0)
+    assert indx.shape == (500,)
+    assert np.all(indx >= 0) & np.all(indx < tree.n)
+
+    indx_serial = retrieve_lh_sample_indices(
+        tree, (-1, -1), (1, 1), 2, 500, seed=0, workers=1
+    )
+    assert np.all(indx == indx_serial)
+
+
+def test_retrieve_lh_sample_indices_batch_agrees_with_single_queries():
+    tree = _get_dummy_tree()
+    seeds = (3, 1, 4, 1, 5)
+    args = tree, (-1, -1), (1, 1), 2, 300
+    indx = retrieve_lh_sample_indices_batch(*args, seeds)
+    assert indx.shape == (len(seeds), 300)
+    assert np.all(indx[1] == indx[3])
+    for i, seed in enumerate(seeds):
+        lhs = latin_hypercube_batch((-1, -1), (1, 1), 2, 300, [seed])[0]
+        assert np.all(indx[i] == tree.query(lhs)[1])
+
+
+def test_get_scipy_kdtree_unbalanced_gives_same_neighbors():
+    rng = np.random.RandomState(SEED)
+    x, y = rng.uniform(0, 1, (2, 5000))
+    tree = get_scipy_kdtree(x, y)
+    tree2 = get_scipy_kdtree(x, y, balanced_tree=False, compact_nodes=False)
+    args = (0, 0), (1, 1), 2, 200
+    indx = retrieve_lh_sample_indices(tree, *args, seed=0)
+    indx2 = retrieve_lh_sample_indices(tree2, *args, seed=0)
+    assert np.all(indx == indx2)
+
+
+def test_retrieve_lh_sample_indices_unique():
+    rng = np.random.RandomState(SEED)
+    n_data = 2000
+    x = rng.normal(loc=0, scale=0.2, size=n_data)
+    y = rng.normal(loc=0, scale=0.2, size=n_data)
+    tree = get_scipy_kdtree(x, y)
+    args = tree, (-1, -1), (1, 1), 2, 1000
+
+    indx, diagnostics = retrieve_lh_sample_indices(
+        *args, seed=0, return_diagnostics=True
+    )
+    assert diagnostics["collision_rate"] > 0
+    assert diagnostics["n_unique"] < 1000
+    assert diagnostics["n_reassigned"] == 0
+
+    unique_indx, unique_diagnostics = retrieve_lh_sample_indices(
+        *args, seed=0, unique=True, return_diagnostics=True
+    )
+    assert np.unique(unique_indx).size == 1000
+    assert unique_diagnostics["n_unique"] == 1000
+    assert unique_diagnostics["collision_rate"] == diagnostics["collision_rate"]
+    assert unique_diagnostics["mean_distance"] >= diagnostics["mean_distance"]
+
+    # Every distinct nearest neighbor is kept by one of the points that share it
+    assert np.all(np.isin(np.unique(indx), unique_indx))
+    n_reassigned = 1000 - np.unique(indx).size
+    assert unique_diagnostics["n_reassigned"] == n_reassigned
+
+
+def test_retrieve_lh_sample_indices_unique_with_n_batch_equal_to_n_data():
+    rng = np.random.RandomState(SEED)
+    x, y = rng.uniform(0, 0.1, (2, 100))
+    tree = get_scipy_kdtree(x, y)
+    indx = retrieve_lh_sample_indices(tree, (0, 0), (1, 1), 2, 100, unique=True)
+    assert np.all(np.sort(indx) == np.arange(100))
+
+
+def test_retrieve_lh_sample_indices_streaming_agrees_with_kdtree():
+    rng = np.random.RandomState(SEED)
+    n_data, n_batch = 20_000, 500
+    x = rng.uniform(-1, 1, n_data)
+    y = rng.normal(loc=0, scale=1, size=n_data)
+    tree = get_scipy_kdtree(x, y)
+    indx = retrieve_lh_sample_indices(tree, (-1, -1), (1, 1), 2, n_batch, seed=0)
+
+    with TemporaryDirectory() as drn:
+        fn = os.path.join(drn, "catalog.npy")
+        np.save(fn, np.vstack((x, y)))
+        catalog = np.load(fn, mmap_mode="r")
+        max_memory = 8 * n_batch * 8 + 48 * 1_000
+        indx2 = retrieve_lh_sample_indices_streaming(
+            catalog, (-1, -1), (1, 1), 2, n_batch, seed=0, max_memory=max_memory
+        )
+    assert np.all(indx == indx2)
+
+
+def test_sample_diagnostics_collision_rate_counts_every_colliding_point():
+    nearest_indx = np.array((7, 7, 7, 2, 4, 4, 9, 5))
+    nearest_dd = np.linspace(0.1, 0.8, nearest_indx.size)
+    diagnostics = _get_sample_diagnostics(
+        nearest_dd, nearest_indx, nearest_dd, nearest_indx
+    )
+    assert np.isclose(diagnostics["collision_rate"], 5 / 8)
+    assert diagnostics["n_unique"] == 5
+    assert diagnostics["n_reassigned"] == 0
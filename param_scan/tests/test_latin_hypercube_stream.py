@@ -0,0 +1,41 @@
+"""
+"""
+import numpy as np
+from ..latin_hypercube_stream import latin_hypercube_block, iter_latin_hypercube_blocks
+from ..latin_hypercube_stream import get_num_blocks
+
+
+def test_blocks_form_a_single_latin_hypercube():
+    xmins = (-3, -2, 0)
+    xmaxs = (2, 3, 5)
+    n_dim = len(xmins)
+    npts, block_size = 10_007, 1000
+    blocks = list(
+        iter_latin_hypercube_blocks(xmins, xmaxs, n_dim, npts, block_size, seed=0)
+    )
+    assert len(blocks) == get_num_blocks(npts, block_size) == 11
+    assert blocks[-1].shape == (7, n_dim)
+    design = np.concatenate(blocks)
+    assert design.shape == (npts, n_dim)
+
+    for idim in range(n_dim):
+        x = (design[:, idim] - xmins[idim]) / (xmaxs[idim] - xmins[idim])
+        strata = np.floor(x * npts).astype(int)
+        assert np.all(np.sort(strata) == np.arange(npts))
+
+
+def test_blocks_are_reproducible_from_seed_and_block_index():
+    xmins = (-3, -2)
+    xmaxs = (2, 3)
+    npts, block_size = 5000, 512
+    args = xmins, xmaxs, 2, npts, block_size
+    blocks = list(iter_latin_hypercube_blocks(*args, seed=3))
+    for block_index in (0, 4, 9):
+        block = latin_hypercube_block(*args, block_index, 3)
+        assert np.all(block == blocks[block_index])
+    block = latin_hypercube_block(*args, 4, 2)
+    assert not np.allclose(block, blocks[4])
+
+    some_blocks = list(iter_latin_hypercube_blocks(*args, seed=3, block_indices=(9, 4)))
+    assert np.all(some_blocks[0] == blocks[9])
+    assert np.all(some_blocks[1] == blocks[4])
@@ -0,0 +1,43 @@
+"""
+"""
+import numpy as np
+from ..local_scan import run_scan
+from ..helpers import get_equal_sized_data_chunks
+from ..chunk_samplers import get_chunk_sampler
+
+
+XMINS, XMAXS = (-5, 5), (5, 10)
+
+
+def _quadratic_loss(params, loss_data):
+    return np.sum((params - loss_data[0]) ** 2)
+
+
+def test_run_scan_backends_agree_with_chunked_mpi_layout():
+    n_tot, n_ranks, n_max_lh = 2_000, 3, 200
+    loss_data = np.array([[1.0, 7.0]])
+    results = dict()
+    for backend in ("serial", "thread", "process"):
+        results[backend] = run_scan(
+            "lhs",
+            _quadratic_loss,
+            n_tot,
+            backend=backend,
+            n_workers=2,
+            n_ranks=n_ranks,
+            n_max_lh=n_max_lh,
+            xmins=XMINS,
+            xmaxs=XMAXS,
+            loss_data=loss_data,
+        )
+
+    n_cubes_per_rank, n_per_chunk = get_equal_sized_data_chunks(
+        n_tot, n_ranks, n_max_lh
+    )
+    n_chunks = n_cubes_per_rank * n_ranks
+    sample_chunk = get_chunk_sampler("lhs", XMINS, XMAXS, n_chunks, n_per_chunk)
+    correct_params = np.concatenate([sample_chunk(i) for i in range(n_chunks)])
+    correct_loss = np.sum((correct_params - loss_data[0]) ** 2, axis=1)
+    for params, loss in results.values():
+        assert np.array_equal(params, correct_params)
+        assert np.allclose(loss, correct_loss)
@@ -0,0 +1,114 @@
+"""
+"""
+import os
+import sqlite3
+import tempfile
+import numpy as np
+from ..loss_cache import LossCache, get_cached_loss_evaluator
+from ..loss_cache import get_loss_data_fingerprint, get_loss_function_namespace
+from ..loss_cache import get_loss_cache_fname
+
+
+def _loss_evaluator(param_chunk, loss_data):
+    _loss_evaluator.n_calls += param_chunk.shape[0]
+    return np.sum((param_chunk - loss_data) ** 2, axis=1)
+
+
+def test_cached_loss_evaluator_only_evaluates_misses():
+    loss_data = np.array([1.0, 2.0])
+    fingerprint = get_loss_data_fingerprint(loss_data)
+    params = np.random.RandomState(43).uniform(0, 1, size=(100, 2))
+    _loss_evaluator.n_calls = 0
+    with tempfile.TemporaryDirectory() as drn:
+        fname = os.path.join(drn, "cache.sqlite")
+        cache = LossCache(fname, fingerprint, 1e-9)
+        cached_evaluator = get_cached_loss_evaluator(_loss_evaluator, cache)
+        loss = cached_evaluator(params[:60], loss_data)
+        assert _loss_evaluator.n_calls == 60
+        cache.close()
+
+        cache = LossCache(fname, fingerprint, 1e-9)
+        cached_evaluator = get_cached_loss_evaluator(_loss_evaluator, cache)
+        loss2 = cached_evaluator(params + 1e-12, loss_data)
+        assert _loss_evaluator.n_calls == 100
+        assert (cache.hits, cache.misses) == (60, 40)
+        assert np.allclose(loss2[:60], loss)
+        assert np.allclose(loss2, _loss_evaluator(params, loss_data))
+        cache.close()
+
+        other_fingerprint = get_loss_data_fingerprint(loss_data + 1)
+        assert other_fingerprint != fingerprint
+        cache = LossCache(fname, other_fingerprint, 1e-9)
+        loss, is_hit = cache.lookup(cache.get_keys(params))
+        assert not np.any(is_hit)
+        assert np.all(np.isnan(loss))
+        cache.close()
+
+
+def test_loss_cache_evicts_least_recently_used_entries():
+    params = np.arange(10, dtype=float).reshape((5, 2))
+    with tempfile.TemporaryDirectory() as drn:
+        cache = LossCache(os.path.join(drn, "cache.sqlite"), "abc", 0.1, 4)
+        keys = cache.get_keys(params)
+        cache.store(keys[:4], np.arange(4.0))
+        cache.lookup(keys[:1])
+        cache.store(keys[4:], np.array([4.0]))
+        loss, is_hit = cache.lookup(keys)
+        assert np.array_equal(is_hit, [True, False, True, True, True])
+        assert np.allclose(loss[is_hit], [0.0, 2.0, 3.0, 4.0])
+        cache.close()
+
+
+def _get_last_used(fname):
+    conn = sqlite3.connect(fname)
+    last_used = dict(conn.execute("SELECT key, last_used FROM loss_cache").fetchall())
+    conn.close()
+    return last_used
+
+
+def test_loss_cache_lookup_defers_lru_update_to_store_and_close():
+    params = np.arange(10, dtype=float).reshape((5, 2))
+    with tempfile.TemporaryDirectory() as drn:
+        fname = os.path.join(drn, "cache.sqlite")
+        cache = LossCache(fname, "abc", 0.1)
+        keys = cache.get_keys(params)
+        cache.store(keys[:2], np.arange(2.0))
+        last_used = _get_last_used(fname)
+
+        cache.lookup(keys[:1])
+        assert _get_last_used(fname) == last_used
+        cache.store(keys[2:3], np.array([2.0]))
+        last_used2 = _get_last_used(fname)
+        assert last_used2[keys[0]] > last_used[keys[0]]
+        assert last_used2[keys[1]] == last_used[keys[1]]
+
+        cache.lookup(keys[1:2])
+        cache.close()
+        assert _get_last_used(fname)[keys[1]] > last_used[keys[1]]
+
+    assert get_loss_cache_fname("cache.sqlite", 3) == "cache.sqlite.rank3"
+
+
+def _loss_a(params, data):
+    return np.sum((params - data) ** 2)
+
+
+def _loss_b(params, data):
+    return np.sum((params - data) ** 4)
+
+
+def _loss_c(params, data, power=2):
+    return np.sum(np.abs(params - data) ** power)
+
+
+def _loss_d(params, data, power=3):
+    return np.sum(np.abs(params - data) ** power)
+
+
+def test_get_loss_function_namespace_changes_with_the_code():
+    namespace = get_loss_function_namespace(_loss_a)
+    assert namespace == get_loss_function_namespace(_loss_a)
+    assert namespace != get_loss_function_namespace(_loss_b)
+    assert namespace != get_loss_function_namespace(_loss_a, _loss_evaluator)
+    assert get_loss_function_namespace(_loss_c) != get_loss_function_namespace(_loss_d)
+    assert namespace != get_loss_function_namespace(_loss_a, None)
@@ -0,0 +1,111 @@
+"""
+"""
+import numpy as np
+from ..loss_evaluation import evaluate_loss_rows, probe_vectorized_loss
+from ..loss_evaluation import get_loss_evaluator
+
+
+SEED = 43
+
+
+def _row_loss(params, data):
+    a, b = params
+    return (a - data[0]) ** 2 + (b - data[1]) ** 2
+
+
+def _batch_loss(param_chunk, data):
+    return np.sum((param_chunk - data) ** 2, axis=1)
+
+
+def _constant_loss(params, data):
+    return -1.0
+
+
+def test_evaluate_loss_rows():
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (50, 2))
+    data = np.array((0.5, 0.25))
+    loss_arr = evaluate_loss_rows(_row_loss, param_chunk, data)
+    assert loss_arr.shape == (50,)
+    assert np.allclose(loss_arr, _batch_loss(param_chunk, data))
+
+
+def test_probe_vectorized_loss():
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (50, 2))
+    data = np.array((0.5, 0.25))
+    vectorized, probe_loss = probe_vectorized_loss(_batch_loss, param_chunk, data)
+    assert vectorized
+    n_probe = probe_loss.size
+    assert np.allclose(probe_loss, _batch_loss(param_chunk[:n_probe], data))
+    assert not probe_vectorized_loss(_row_loss, param_chunk, data)[0]
+    assert not probe_vectorized_loss(_constant_loss, param_chunk, data)[0]
+
+
+def test_get_loss_evaluator_agrees_across_paths():
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (50, 2))
+    data = np.array((0.5, 0.25))
+    correct_loss = _batch_loss(param_chunk, data)
+
+    evaluator = get_loss_evaluator(_row_loss, param_chunk, data)
+    assert np.allclose(evaluator(param_chunk, data), correct_loss)
+
+    evaluator = get_loss_evaluator(_batch_loss, param_chunk, data)
+    assert np.allclose(evaluator(param_chunk, data), correct_loss)
+
+    evaluator = get_loss_evaluator(
+        _row_loss, param_chunk, data, compute_loss_batch=_batch_loss
+    )
+    assert np.allclose(evaluator(param_chunk, data), correct_loss)
+
+    evaluator = get_loss_evaluator(_constant_loss, param_chunk, data)
+    assert np.allclose(evaluator(param_chunk, data), -1.0)
+
+
+def test_get_loss_evaluator_reuses_probe_loss():
+    rng = np.random.RandomState(SEED)
+    param_chunk = rng.uniform(0, 1, (50, 2))
+    data = np.array((0.5, 0.25))
+    n_rows = []
+
+    def _counting_loss(params, data):
+        n_rows.append(np.atleast_2d(params).shape[0])
+        return np.sum((params - data) ** 2, axis=-1)
+
+    vectorized, probe_loss = probe_vectorized_loss(_counting_loss, param_chunk, data)
+    assert vectorized
+    n_probe = probe_loss.size
+    assert sum(n_rows) == 2 * n_probe
+
+    evaluator = get_loss_evaluator(
+        _counting_loss, param_chunk, data, vectorized=True, probe_loss=probe_loss
+    )
+    loss_arr = evaluator(param_chunk, data)
+    assert np.allclose(loss_arr, _batch_loss(param_chunk, data))
+    assert sum(n_rows) == 2 * n_probe + 50 - n_probe
+    evaluator(param_chunk, data)
+    assert sum(n_rows) == 2 * n_probe + 100 - n_probe
+
+    n_rows.clear()
+    evaluator = get_loss_evaluator(_counting_loss, None, data, vectorized=True)
+    assert sum(n_rows) == 0
+    assert np.allclose(evaluator(param_chunk, data), loss_arr)
+
+
+def test_get_loss_evaluator_copies_reused_batch_buffer():
+    rng = np.random.RandomState(SEED)
+    data = np.array((0.5, 0.25))
+    buffer = np.empty(50)
+
+    def _buffer_loss(param_chunk, data):
+        buffer[:] = _batch_loss(param_chunk, data)
+        return buffer
+
+    evaluator = get_loss_evaluator(
+        _row_loss, None, data, compute_loss_batch=_buffer_loss
+    )
+    param_chunk, param_chunk2 = rng.uniform(0, 1, (2, 50, 2))
+    loss_arr = evaluator(param_chunk, data)
+    evaluator(param_chunk2, data)
+    assert np.allclose(loss_arr, _batch_loss(param_chunk, data))
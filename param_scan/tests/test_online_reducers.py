@@ -0,0 +1,58 @@
+"""
+"""
+import numpy as np
+from mpi4py import MPI
+from ..online_reducers import ScanReducer
+from ..adaptive_scan import select_best_k
+
+
+SEED = 0
+
+
+def test_scan_reducer_agrees_with_full_scan():
+    rng = np.random.RandomState(SEED)
+    xmins, xmaxs = np.array((-1.0, 0.0)), np.array((1.0, 5.0))
+    params = rng.uniform(xmins, xmaxs, (1_000, 2))
+    loss = np.sum(params**2, axis=1)
+    loss[::97] = np.nan
+
+    reducers = [ScanReducer(xmins, xmaxs, n_best=10, n_bins=5) for __ in range(3)]
+    for ichunk, s in enumerate(np.array_split(np.arange(1_000), 7)):
+        reducers[ichunk % 3].update(params[s], loss[s])
+    reducer = reducers[0]
+    for other in reducers[1:]:
+        reducer.merge(other)
+
+    is_finite = np.isfinite(loss)
+    best_params, best_loss = select_best_k(params[is_finite], loss[is_finite], 10)
+    assert np.all(reducer.best_loss == best_loss)
+    assert np.all(reducer.best_params == best_params)
+
+    x = np.column_stack((params, loss))[is_finite]
+    summary = reducer.get_summary(["a", "b"])
+    assert summary["n_points"] == 1_000
+    assert summary["n_finite"] == is_finite.sum()
+    assert np.allclose(list(summary["mean"].values()), x.mean(axis=0))
+    assert np.allclose(list(summary["std"].values()), x.std(axis=0, ddof=1))
+
+    counts, edges = np.histogram(params[:, 1], bins=5, range=(0.0, 5.0))
+    assert summary["histograms"]["b"]["counts"] == counts.tolist()
+    assert np.allclose(summary["histograms"]["b"]["edges"], edges)
+    ibin = np.minimum((params[:, 1] // 1).astype(int), 4)
+    for i in range(5):
+        msk = is_finite & (ibin == i)
+        assert np.isclose(summary["histograms"]["b"]["min_loss"][i], loss[msk].min())
+
+
+def test_scan_reducer_reduce_over_comm():
+    comm = MPI.COMM_WORLD
+    rng = np.random.RandomState(SEED + comm.Get_rank())
+    reducer = ScanReducer((0.0,), (1.0,), n_best=3, n_bins=4)
+    params = rng.uniform(0, 1, (50, 1))
+    reducer.update(params, params[:, 0])
+    result = reducer.reduce(comm)
+    if comm.Get_rank() == 0:
+        assert result.counts.sum() == 50 * comm.Get_size()
+        assert result.best_loss.size == 3
+    else:
+        assert result is None
@@ -0,0 +1,69 @@
+"""
+"""
+import numpy as np
+from ..optimized_latin_hypercube import optimize_latin_hypercube
+from ..optimized_latin_hypercube import get_maximin_distance, get_max_abs_correlation
+from .. import latin_hypercube as lhs_module
+from ..latin_hypercube import latin_hypercube
+
+
+def _get_strata(sample):
+    n = sample.shape[0]
+    return np.sort(np.floor(sample * n).astype(int), axis=0)
+
+
+def test_optimize_latin_hypercube_maximin():
+    npts, n_dim = 2000, 3
+    rng = np.random.RandomState(0)
+    strata = np.array([rng.permutation(npts) for __ in range(n_dim)]).T
+    sample = (strata + rng.uniform(0, 1, strata.shape)) / npts
+    initial = get_maximin_distance(sample)
+    sample, info = optimize_latin_hypercube(sample, "maximin", seed=1)
+    assert np.all(_get_strata(sample) == np.arange(npts)[:, None])
+    assert info["initial"] == initial
+    assert np.allclose(info["final"], get_maximin_distance(sample))
+    assert info["final"] > info["initial"]
+    assert info["runtime"] >= 0
+
+
+def test_optimize_latin_hypercube_correlation():
+    npts, n_dim = 2000, 4
+    rng = np.random.RandomState(0)
+    strata = np.array([rng.permutation(npts) for __ in range(n_dim)]).T
+    sample = (strata + rng.uniform(0, 1, strata.shape)) / npts
+    initial = get_max_abs_correlation(sample)
+    sample, info = optimize_latin_hypercube(sample, "correlation", seed=1)
+    assert np.all(_get_strata(sample) == np.arange(npts)[:, None])
+    assert np.allclose(info["initial"], initial)
+    assert np.allclose(info["final"], get_max_abs_correlation(sample))
+    assert info["final"] < info["initial"] / 10
+
+
+def test_latin_hypercube_optimization_respects_bounds_and_is_reproducible():
+    xmins = (-3, -2, 0)
+    xmaxs = (2, 3, 5)
+    n_dim = len(xmins)
+    npts = 1000
+    for optimization in ("maximin", "correlation"):
+        args = xmins, xmaxs, n_dim, npts
+        box, info = latin_hypercube(
+            *args, seed=0, optimization=optimization, return_info=True
+        )
+        assert info["criterion"] == optimization
+        assert np.all(box >= xmins) & np.all(box <= xmaxs)
+        box2 = latin_hypercube(*args, seed=0, optimization=optimization)
+        assert np.all(box == box2)
+
+
+def test_latin_hypercube_optimization_raises_without_lhs_backend():
+    has_scipy_qmc, has_pydoe2 = lhs_module.HAS_SCIPY_QMC, lhs_module.HAS_PYDOE2
+    lhs_module.HAS_SCIPY_QMC, lhs_module.HAS_PYDOE2 = False, False
+    try:
+        try:
+            latin_hypercube((0, 0), (1, 1), 2, 100, seed=0, optimization="maximin")
+            raised = False
+        except ValueError:
+            raised = True
+        assert raised
+    finally:
+        lhs_module.HAS_SCIPY_QMC, lhs_module.HAS_PYDOE2 = has_scipy_qmc, has_pydoe2
@@ -0,0 +1,40 @@
+"""
+"""
+import numpy as np
+from mpi4py import MPI
+from ..profiling import PhaseTimer, get_timing_summary, gather_timing_summary
+
+
+def test_phase_timer_accumulates_phases():
+    timer = PhaseTimer()
+    for __ in range(3):
+        with timer.phase("sample"):
+            pass
+    timer.add("evaluate", 2.0)
+    timer.add("evaluate", 1.0)
+    times = timer.get_times()
+    assert set(times.keys()) == set(("sample", "evaluate"))
+    assert times["evaluate"] == 3.0
+    assert times["sample"] >= 0
+
+
+def test_get_timing_summary_statistics_across_ranks():
+    rank_times = [dict(evaluate=1.0, write=0.5), dict(evaluate=3.0), dict(evaluate=2.0)]
+    summary = get_timing_summary(rank_times, (100, 300, 200), (1.0, 3.0, 4.0))
+    assert summary["n_ranks"] == 3
+    assert summary["n_points"] == 600
+    assert list(summary["phases"].keys()) == ["evaluate", "write"]
+    evaluate = summary["phases"]["evaluate"]
+    assert (evaluate["min"], evaluate["median"], evaluate["max"]) == (1.0, 2.0, 3.0)
+    assert summary["phases"]["write"]["min"] == 0.0
+    assert np.isclose(summary["points_per_second"]["min"], 50.0)
+    assert np.isclose(summary["points_per_second"]["max"], 100.0)
+
+
+def test_gather_timing_summary_on_rank_zero():
+    comm = MPI.COMM_WORLD
+    timer = PhaseTimer()
+    timer.add("evaluate", 1.0)
+    summary = gather_timing_summary(comm, timer, 10, 2.0)
+    if comm.Get_rank() == 0:
+        assert summary["n_ranks"] == comm.Get_size()
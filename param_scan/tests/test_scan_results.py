@@ -0,0 +1,86 @@
+"""
+"""
+import os
+import numpy as np
+from mpi4py import MPI
+from tempfile import TemporaryDirectory
+from ..helpers import write_param_chunk, get_mpi_rank_outname, cleanup_and_collate
+from ..hdf5_output import HDF5ScanWriter
+from ..scan_results import load_scan_results, write_scan_metadata
+from ..scan_results import read_scan_metadata, get_metadata_mismatches
+
+
+SEED = 0
+METADATA = dict(param_names=["a", "b"], xmins=[0, 0], xmaxs=[1, 2], sampler="lhs")
+
+
+def test_load_scan_results_npy():
+    rng = np.random.RandomState(SEED)
+    params = rng.uniform(0, 1, (20, 2))
+    loss = rng.uniform(0, 1, 20)
+    with TemporaryDirectory() as drn:
+        for param_dtype in (None, "f4"):
+            outname = os.path.join(drn, "scan.dat")
+            for batch in range(2):
+                s = slice(batch * 10, (batch + 1) * 10)
+                rank_outname = get_mpi_rank_outname(outname, 0, batch)
+                write_param_chunk(rank_outname, params[s], loss[s], param_dtype)
+            cleanup_and_collate(outname)
+            write_scan_metadata(outname, METADATA)
+
+            params2, loss2, metadata = load_scan_results(outname)
+            assert isinstance(params2, np.memmap)
+            assert np.allclose(params2, params, rtol=1e-6)
+            assert np.all(loss2 == loss)
+            assert metadata == METADATA
+            del params2, loss2
+
+
+def test_load_scan_results_hdf5():
+    rng = np.random.RandomState(SEED)
+    n_chunks, n_per_chunk, n_params = 3, 10, 2
+    params = rng.uniform(0, 1, (n_chunks * n_per_chunk, n_params))
+    loss = rng.uniform(0, 1, n_chunks * n_per_chunk)
+    with TemporaryDirectory() as drn:
+        fname = os.path.join(drn, "scan.h5")
+        writer = HDF5ScanWriter(
+            fname,
+            MPI.COMM_SELF,
+            n_chunks,
+            n_per_chunk,
+            n_params,
+            param_dtype="f4",
+            metadata=METADATA,
+        )
+        for ichunk in range(n_chunks):
+            s = slice(ichunk * n_per_chunk, (ichunk + 1) * n_per_chunk)
+            writer.write_chunk(ichunk, params[s], loss[s])
+        writer.close()
+
+        params2, loss2, metadata = load_scan_results(fname)
+        assert isinstance(params2, np.memmap)
+        assert params2.dtype == np.float32
+        assert np.all(params2 == params.astype("f4"))
+        assert np.all(loss2 == loss)
+        assert metadata == METADATA
+        del params2, loss2
+
+
+def test_get_metadata_mismatches_of_resumed_scan():
+    with TemporaryDirectory() as drn:
+        outname = os.path.join(drn, "scan.dat")
+        assert read_scan_metadata(outname) == dict()
+        write_scan_metadata(outname, METADATA)
+        stored_metadata = read_scan_metadata(outname)
+        assert stored_metadata == METADATA
+
+        fname = os.path.join(drn, "scan.h5")
+        writer = HDF5ScanWriter(fname, MPI.COMM_SELF, 2, 10, 2, metadata=METADATA)
+        writer.close()
+        assert read_scan_metadata(fname) == METADATA
+
+    metadata = dict(METADATA, xmins=(0, 0), seed=None)
+    assert get_metadata_mismatches(stored_metadata, metadata) == []
+    metadata = dict(METADATA, sampler="sobol", seed=3)
+    mismatches = get_metadata_mismatches(stored_metadata, metadata)
+    assert mismatches == [("sampler", "lhs", "sobol"), ("seed", None, 3)]
@@ -0,0 +1,37 @@
+"""
+"""
+import numpy as np
+from mpi4py import MPI
+from ..scheduler import get_static_seeds, iter_dynamic_seeds, get_utilization_report
+
+
+def test_get_static_seeds_covers_all_seeds():
+    total_seeds = np.arange(103).astype("i8")
+    nranks = 7
+    collector = [get_static_seeds(total_seeds, rank, nranks) for rank in range(nranks)]
+    assert np.all(np.concatenate(collector) == total_seeds)
+
+
+def test_iter_dynamic_seeds_single_rank():
+    comm = MPI.COMM_WORLD
+    if comm.Get_size() == 1:
+        total_seeds = np.arange(20).astype("i8")
+        seeds = list(iter_dynamic_seeds(comm, total_seeds))
+        assert np.all(np.array(seeds) == total_seeds)
+
+
+def test_get_utilization_report():
+    comm = MPI.COMM_WORLD
+    report = get_utilization_report(comm, 4, 1.5, 2.0)
+    if comm.Get_rank() == 0:
+        assert "75.0%" in report.splitlines()[1]
+    else:
+        assert report is None
+
+
+def test_iter_dynamic_seeds_single_rank_root_always_computes():
+    comm = MPI.COMM_WORLD
+    if comm.Get_size() == 1:
+        total_seeds = np.arange(20).astype("i8")
+        seeds = list(iter_dynamic_seeds(comm, total_seeds, root_computes=False))
+        assert np.all(np.array(seeds) == total_seeds)
@@ -0,0 +1,33 @@
+"""
+"""
+import numpy as np
+from mpi4py import MPI
+from ..shared_data import get_node_shared_loss_data, free_shared_windows
+
+
+def test_get_node_shared_loss_data_preserves_structure():
+    obs = np.arange(6.0).reshape((2, 3))
+    cov = np.eye(3)
+
+    def get_loss_data():
+        return dict(obs=obs, cov=cov, name="dummy")
+
+    loss_data, windows = get_node_shared_loss_data(MPI.COMM_WORLD, get_loss_data)
+    assert set(loss_data.keys()) == set(("obs", "cov", "name"))
+    assert np.array_equal(loss_data["obs"], obs)
+    assert np.array_equal(loss_data["cov"], cov)
+    assert loss_data["name"] == "dummy"
+    assert not loss_data["obs"].flags.writeable
+    assert len(windows) == 2
+    del loss_data
+    free_shared_windows(windows)
+
+    loss_data, windows = get_node_shared_loss_data(MPI.COMM_WORLD, lambda: None)
+    assert loss_data is None
+    assert len(windows) == 0
+
+    loss_data, windows = get_node_shared_loss_data(MPI.COMM_WORLD, lambda: (obs, 2))
+    assert np.array_equal(loss_data[0], obs)
+    assert loss_data[1] == 2
+    del loss_data
+    free_shared_windows(windows)
@@ -0,0 +1,80 @@
+"""
+"""
+import numpy as np
+from ..surrogate import RBFSurrogate, select_training_points
+from ..surrogate import select_prescreened_points, prescreen_candidates
+from ..surrogate import fit_surrogate, get_chunk_training_indices
+from ..latin_hypercube import latin_hypercube
+
+
+XMINS, XMAXS = np.array((-5.0, 0.0, 1.0)), np.array((5.0, 2.0, 3.0))
+X_OPT = np.array((1.0, 0.5, 2.5))
+
+
+def _quadratic_loss(params):
+    return np.sum(((params - X_OPT) / (XMAXS - XMINS)) ** 2, axis=1)
+
+
+def test_select_training_points_keeps_best_half_and_drops_nan():
+    rng = np.random.RandomState(0)
+    params = rng.uniform(0, 1, (500, 3))
+    loss = rng.uniform(0, 1, 500)
+    loss[:10] = np.nan
+    train_params, train_loss = select_training_points(params, loss, 100)
+    assert train_params.shape == (100, 3)
+    assert np.all(np.isfinite(train_loss))
+    assert np.all(train_loss[:50] == np.sort(loss[10:])[:50])
+
+    train_params, train_loss = select_training_points(params, loss, 1000)
+    assert train_params.shape == (490, 3)
+
+
+def test_prescreened_candidates_have_lower_loss_than_unscreened():
+    train_params = latin_hypercube(XMINS, XMAXS, 3, 300, seed=0)
+    surrogate = RBFSurrogate(train_params, _quadratic_loss(train_params), XMINS, XMAXS)
+    candidates = latin_hypercube(XMINS, XMAXS, 3, 5000, seed=1)
+    selected = prescreen_candidates(surrogate, candidates, 100, explore_fraction=0)
+    assert selected.shape == (100, 3)
+    loss_selected = _quadratic_loss(selected)
+    loss_candidates = _quadratic_loss(candidates)
+    assert np.max(loss_selected) < np.percentile(loss_candidates, 10)
+
+
+def test_select_prescreened_points_explores_far_candidates():
+    predicted_rank = np.linspace(0, 1, 10)
+    distance = np.zeros(10)
+    distance[7] = 1.0
+    indx = select_prescreened_points(predicted_rank, distance, 4, explore_fraction=0.25)
+    assert np.array_equal(indx, [0, 1, 2, 7])
+    indx = select_prescreened_points(predicted_rank, distance, 20)
+    assert np.array_equal(indx, np.arange(10))
+
+
+def test_get_chunk_training_indices_are_random_rows():
+    indx = get_chunk_training_indices(1000, 50, seed=3)
+    assert indx.shape == (50,)
+    assert np.unique(indx).size == 50
+    assert np.all(np.diff(indx) > 0)
+    assert indx[-1] >= 50
+    assert np.array_equal(indx, get_chunk_training_indices(1000, 50, seed=3))
+    assert not np.array_equal(indx, get_chunk_training_indices(1000, 50, seed=4))
+    assert np.array_equal(get_chunk_training_indices(20, 50, seed=3), np.arange(20))
+
+
+def test_fit_surrogate_falls_back_to_none():
+    train_params = latin_hypercube(XMINS, XMAXS, 3, 100, seed=0)
+    train_loss = _quadratic_loss(train_params)
+    surrogate = fit_surrogate(train_params, train_loss, XMINS, XMAXS)
+    assert isinstance(surrogate, RBFSurrogate)
+
+    nan_loss = np.where(np.arange(100) < 96, np.nan, train_loss)
+    assert fit_surrogate(train_params, nan_loss, XMINS, XMAXS) is None
+
+    repeated_params = np.repeat(train_params[:4], 25, axis=0)
+    repeated_loss = _quadratic_loss(repeated_params)
+    assert fit_surrogate(repeated_params, repeated_loss, XMINS, XMAXS) is None
+
+    coplanar_params = train_params.copy()
+    coplanar_params[:, 2] = XMINS[2]
+    surrogate = fit_surrogate(coplanar_params, train_loss, XMINS, XMAXS)
+    assert surrogate is None
@@ -1,11 +1,35 @@
 """mpiexec -n 2 python parallel_scan_script.py outname n_pts"""
 import argparse
+import cProfile
+import json
 from time import time
 from mpi4py import MPI
 import numpy as np
-from param_scan.latin_hypercube import latin_hypercube
 from param_scan.helpers import get_equal_sized_data_chunks, cleanup_and_collate
 from param_scan.helpers import get_mpi_rank_outname, write_param_chunk
+from param_scan.helpers import get_completed_batches
+from param_scan.scan_results import write_scan_metadata, read_scan_metadata
+from param_scan.scan_results import get_metadata_mismatches, load_scan_results
+from param_scan.background_writer import BackgroundWriter
+from param_scan.online_reducers import ScanReducer
+from param_scan.loss_cache import LossCache, get_cached_loss_evaluator
+from param_scan.loss_cache import get_loss_data_fingerprint, get_loss_cache_fname
+from param_scan.loss_cache import get_loss_function_namespace
+from param_scan.loss_evaluation import get_loss_evaluator, probe_vectorized_loss
+from param_scan.scheduler import get_static_seeds, iter_dynamic_seeds
+from param_scan.scheduler import get_utilization_report
+from param_scan.hdf5_output import HDF5ScanWriter
+from param_scan.chunk_samplers import get_chunk_sampler, CHUNK_SAMPLERS
+from param_scan.chunk_samplers import get_chunk_offsets
+from param_scan.adaptive_scan import select_best_k, gather_best_k
+from param_scan.adaptive_scan import get_refinement_distribution
+from param_scan.adaptive_scan import sample_refinement_round
+from param_scan.latin_hypercube import get_cov_transform
+from param_scan.surrogate import fit_surrogate, select_training_points
+from param_scan.surrogate import prescreen_candidates, get_chunk_training_indices
+from param_scan.shared_data import get_node_shared_loss_data, free_shared_windows
+from param_scan.profiling import PhaseTimer, gather_timing_summary
+from param_scan.profiling import write_timing_summary, get_profile_fname
 
 
 def get_param_bounds():
@@ -20,16 +44,29 @@ def compute_loss(params, data):
     return -1.0
 
 
+# Optionally replace with a function compute_loss_batch(param_chunk, data)
+# returning an ndarray of shape (n_per_chunk, ) to bypass the per-row loop.
+# Its output is copied, so it may reuse the same output buffer for every chunk.
+# When None, compute_loss is checked for vectorization on the first chunk.
+compute_loss_batch = None
+
+
+# Called once per node. Any ndarrays in the returned data, including inside
+# a tuple, list or dict, are shared read-only by the ranks of the node.
 def get_loss_data():
     return None
 
 
 PARAM_BOUNDS = get_param_bounds()
+N_PARAMS = len(PARAM_BOUNDS)
+XMINS, XMAXS = np.array(PARAM_BOUNDS).T
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        "outname", help="Name of the output file. Must conclude with `.dat`"
+        "outname",
+        help="Name of the output file. "
+        "Must conclude with `.dat`, or with `.h5` for HDF5 output",
     )
     parser.add_argument(
         "n_tot", help="Total number of points in the param scan", type=int
@@ -40,6 +77,183 @@ if __name__ == "__main__":
         type=int,
         default=5000,
     )
+    parser.add_argument(
+        "-schedule",
+        help="Split seeds evenly across ranks up front, "
+        "or have idle ranks take the next seed from a shared queue",
+        choices=["static", "dynamic"],
+        default="static",
+    )
+    parser.add_argument(
+        "-queue_nranks",
+        help="With the dynamic schedule and at least this many ranks, rank 0 only "
+        "serves the shared queue, since MPI implementations without asynchronous "
+        "progress stall every request to the queue while rank 0 computes",
+        type=int,
+        default=64,
+    )
+    parser.add_argument(
+        "-output",
+        help="Write one .npy file per chunk and collate them at the end, "
+        "or write every chunk directly into a single preallocated HDF5 file. "
+        "Without parallel h5py, chunks go to one HDF5 shard per rank instead, "
+        "copied into the file at the end",
+        choices=["npy", "hdf5"],
+        default="npy",
+    )
+    parser.add_argument(
+        "-sampler",
+        help="Independent latin hypercube per chunk (lhs), "
+        "or the same generated many chunks at a time with numpy (fast_lhs), "
+        "or chunks drawn from a single latin hypercube (global_lhs) "
+        "or scrambled Sobol/Halton sequence (sobol, halton) spanning the scan",
+        choices=CHUNK_SAMPLERS,
+        default="lhs",
+    )
+    parser.add_argument(
+        "-seed",
+        help="Random number seed of the global design or sequence. "
+        "Not used by `lhs` and `fast_lhs`",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "-resume",
+        help="Keep the chunks already written by an interrupted scan with the same "
+        "outname, n_tot, n_max_lh and number of ranks, and only compute the rest. "
+        "Aborts without touching the existing files when the bounds, sampler, seed, "
+        "chunk layout or -param_dtype differ from those of the interrupted scan",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-n_rounds",
+        help="Number of rounds of the scan. Each round after the first resamples "
+        "around the -n_best points with the lowest loss found so far",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-n_best",
+        help="Number of lowest-loss points defining each refinement round",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "-sig",
+        help="Number of sigma of the box of the first refinement round",
+        type=float,
+        default=3.0,
+    )
+    parser.add_argument(
+        "-sig_shrink",
+        help="Factor by which -sig shrinks in each subsequent round",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "-target_loss",
+        help="Stop refining once the lowest loss falls below this value",
+        type=float,
+        default=-np.inf,
+    )
+    parser.add_argument(
+        "-prescreen",
+        help="In each refinement round, sample this many times more candidates "
+        "than are evaluated, and only evaluate those ranked best or most uncertain "
+        "by an RBF surrogate of the loss fitted to the previous rounds. "
+        "Requires -n_rounds > 1: the first round is a plain Latin hypercube that "
+        "is never prescreened, and the candidates of later rounds are drawn from "
+        "the refinement distribution rather than the full parameter box",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-n_train",
+        help="Number of evaluated points the -prescreen surrogate is fitted to",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "-explore_fraction",
+        help="Fraction of the -prescreen points chosen farthest from any "
+        "training point rather than lowest predicted loss",
+        type=float,
+        default=0.2,
+    )
+    parser.add_argument(
+        "-timing_json",
+        help="Write the min/median/max across ranks of the time spent in each "
+        "phase of the scan, and of the throughput, to this JSON file",
+        default=None,
+    )
+    parser.add_argument(
+        "-param_dtype",
+        help="Precision of the stored parameters. The loss is always stored as f8. "
+        "With f4 and -output npy, each row is a record with `params` and `loss` fields",
+        choices=["f8", "f4"],
+        default="f8",
+    )
+    parser.add_argument(
+        "-summary_json",
+        help="Write the -n_top lowest-loss points, the mean and std of each "
+        "parameter and of the loss, and the marginal histogram and lowest loss "
+        "in -n_bins bins of each parameter, reduced across ranks, to this JSON file. "
+        "With -resume, the chunks of the earlier run are read back and included",
+        default=None,
+    )
+    parser.add_argument(
+        "-n_top",
+        help="Number of lowest-loss points stored in -summary_json",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "-n_bins",
+        help="Number of bins of the marginal histograms in -summary_json",
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        "-loss_cache",
+        help="sqlite database caching the loss of each parameter vector, "
+        "shared across runs with the same loss data. Each rank uses its own "
+        "database -loss_cache.rank<rank>, so entries are reused by later runs "
+        "that give the same chunks to the same ranks",
+        default=None,
+    )
+    parser.add_argument(
+        "-loss_cache_namespace",
+        help="Mixed into the keys of -loss_cache together with a hash of the code "
+        "of compute_loss and compute_loss_batch. Change it whenever the loss "
+        "changes in a way the hash does not capture, such as an edit of a "
+        "function called by compute_loss",
+        default="",
+    )
+    parser.add_argument(
+        "-loss_cache_size",
+        help="Maximum number of entries of -loss_cache, "
+        "beyond which the least recently used entries are evicted",
+        type=int,
+        default=10**7,
+    )
+    parser.add_argument(
+        "-loss_cache_quantum",
+        help="Parameter vectors closer than this fraction of the scan range "
+        "in every dimension share the same entry of -loss_cache",
+        type=float,
+        default=1e-9,
+    )
+    parser.add_argument(
+        "-sync_write",
+        help="Write each chunk before computing the next one, rather than on a "
+        "background thread. HDF5 output with the mpio driver is always synchronous",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-profile",
+        help="Dump the cProfile statistics of each rank to outname.rank<rank>.prof",
+        action="store_true",
+    )
     args = parser.parse_args()
     outname = args.outname
     n_tot = args.n_tot
@@ -47,8 +261,12 @@ if __name__ == "__main__":
 
     comm = MPI.COMM_WORLD
     rank, nranks = comm.Get_rank(), comm.Get_size()
-    msg = "outname = {0} must conclude with `.dat`"
-    assert outname[-4:] == ".dat", msg.format(outname)
+    if args.output == "npy":
+        msg = "outname = {0} must conclude with `.dat`"
+        assert outname[-4:] == ".dat", msg.format(outname)
+    else:
+        msg = "outname = {0} must conclude with `.h5`"
+        assert outname[-3:] == ".h5", msg.format(outname)
 
     if rank == 0:
         print("...running parallel parameter scan and writing to `{}`".format(outname))
@@ -56,25 +274,376 @@ if __name__ == "__main__":
     n_cubes_per_rank, n_per_chunk = get_equal_sized_data_chunks(n_tot, nranks, n_max_lh)
     total_cubes = n_cubes_per_rank * nranks
     total_seeds = np.arange(total_cubes).astype("i8")
-    seeds_per_rank = np.array_split(total_seeds, nranks)[rank]
+    # Ranks of the static schedule take their chunks in increasing order,
+    # so fast_lhs can generate many of them at once, up to the last chunk of the rank
+    prefetch, last_chunk = 1, None
+    if args.schedule == "static":
+        prefetch = 64
+        last_chunk = get_static_seeds(total_seeds, rank, nranks)[-1]
+    sample_chunk = get_chunk_sampler(
+        args.sampler,
+        XMINS,
+        XMAXS,
+        total_cubes,
+        n_per_chunk,
+        seed=args.seed,
+        prefetch=prefetch,
+        last_chunk=last_chunk,
+    )
+    msg = "-resume is only supported for scans with a single round"
+    assert not (args.resume and args.n_rounds > 1), msg
+    msg = "-prescreen needs a first round to fit the surrogate, so -n_rounds > 1"
+    assert args.prescreen == 1 or args.n_rounds > 1, msg
+
+    # The float64 .npy output keeps the original layout with the loss in the last column
+    npy_param_dtype = None if args.param_dtype == "f8" else args.param_dtype
+    metadata = dict(
+        param_names=list(get_param_names()),
+        xmins=XMINS.tolist(),
+        xmaxs=XMAXS.tolist(),
+        sampler=args.sampler,
+        seed=args.seed,
+        chunk_offsets=get_chunk_offsets(
+            args.sampler, total_cubes, n_per_chunk, seed=args.seed
+        ),
+        refinement_seeds="chunk i of round r > 0 is sampled with seed r*n_chunks + i",
+        n_tot=n_tot,
+        n_chunks=int(total_cubes),
+        n_per_chunk=int(n_per_chunk),
+        n_ranks=nranks,
+        n_rounds=args.n_rounds,
+        prescreen=args.prescreen,
+        schedule=args.schedule,
+        param_dtype=args.param_dtype,
+    )
+
+    # A resumed scan must sample the same design as the interrupted one, so the
+    # stored metadata and the layout of the existing rank files are checked, and
+    # the scan is aborted rather than mixing designs or deleting finished chunks
+    if args.resume:
+        resume_error = None
+        if rank == 0:
+            stored_metadata = read_scan_metadata(outname)
+            mismatches = []
+            if len(stored_metadata) > 0:
+                mismatches = get_metadata_mismatches(stored_metadata, metadata)
+            if len(mismatches) > 0:
+                resume_error = "Cannot resume {0}, which was run with ".format(outname)
+                resume_error += ", ".join(
+                    "{0}={1} rather than {2}".format(*x) for x in mismatches
+                )
+        resume_error = comm.bcast(resume_error, root=0)
+        if resume_error is not None:
+            raise ValueError(resume_error)
+
+    completed_seeds = np.zeros(0, dtype="i8")
+    completed = dict()
+    if args.output == "hdf5":
+        writer = HDF5ScanWriter(
+            outname,
+            comm,
+            total_cubes * args.n_rounds,
+            n_per_chunk,
+            N_PARAMS,
+            resume=args.resume,
+            param_dtype=args.param_dtype,
+            metadata=metadata,
+        )
+        if args.resume:
+            completed_seeds = writer.get_completed_chunks()
+    elif args.resume:
+        resume_error = None
+        if rank == 0:
+            completed, invalid_fnames = get_completed_batches(
+                outname,
+                n_per_chunk,
+                N_PARAMS,
+                param_dtype=npy_param_dtype,
+                n_batches=total_cubes * args.n_rounds,
+            )
+            completed_seeds = np.array(sorted(completed), dtype="i8")
+            if len(invalid_fnames) > 0:
+                resume_error = (
+                    "Cannot resume {0}: expected rank files of {1} rows of {2} "
+                    "params with -param_dtype {3}, but these rank files differ:"
+                ).format(outname, n_per_chunk, N_PARAMS, args.param_dtype)
+                resume_error += "".join("\n    " + fn for fn in invalid_fnames)
+        completed_seeds, completed, resume_error = comm.bcast(
+            (completed_seeds, completed, resume_error), root=0
+        )
+        if resume_error is not None:
+            raise ValueError(resume_error)
+    if args.output == "npy" and rank == 0 and not (args.resume and completed):
+        write_scan_metadata(outname, metadata)
+    if rank == 0 and args.resume:
+        msg = "...resuming scan with {0} of {1} chunks already complete"
+        print(msg.format(completed_seeds.size, total_cubes))
 
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    timer = PhaseTimer()
     start = time()
-    for ichunk, seed in enumerate(seeds_per_rank):
-        param_chunk = latin_hypercube(PARAM_BOUNDS, n_per_chunk, seed=seed)
-        loss_data = get_loss_data()
-        rank_outname = get_mpi_rank_outname(outname, rank, ichunk)
-        loss_collector = []
-        for params in param_chunk:
-            loss = compute_loss(params, loss_data)
-            loss_collector.append(loss)
-        write_param_chunk(rank_outname, param_chunk, np.array(loss_collector))
-        comm.Barrier()
+    with timer.phase("load"):
+        loss_data, loss_data_windows = get_node_shared_loss_data(comm, get_loss_data)
+    # Whether compute_loss is vectorized is probed once on rank 0 and broadcast.
+    # With the static schedule, rank 0 probes the first chunk it computes, and the
+    # rows it evaluates while probing are reused rather than evaluated again.
+    # Otherwise no chunk is known to be computed by rank 0, so the probed losses
+    # are discarded.
+    vectorized, probe_chunk, probe_loss = None, None, None
+    if compute_loss_batch is None:
+        if rank == 0:
+            probe_seeds = np.zeros(0, dtype="i8")
+            if args.schedule == "static":
+                probe_seeds = get_static_seeds(total_seeds, rank, nranks)
+                probe_seeds = np.setdiff1d(probe_seeds, completed_seeds)
+            probe_chunk = sample_chunk(probe_seeds[0] if probe_seeds.size else 0)
+            with timer.phase("evaluate"):
+                vectorized, probe_loss = probe_vectorized_loss(
+                    compute_loss, probe_chunk, loss_data
+                )
+            if probe_seeds.size == 0:
+                probe_loss = None
+        vectorized = comm.bcast(vectorized, root=0)
+    loss_evaluator = get_loss_evaluator(
+        compute_loss,
+        probe_chunk,
+        loss_data,
+        compute_loss_batch,
+        vectorized=vectorized,
+        probe_loss=probe_loss,
+    )
+    loss_cache = None
+    if args.loss_cache is not None:
+        data_fingerprint = None
+        if rank == 0:
+            namespace = get_loss_function_namespace(compute_loss, compute_loss_batch)
+            data_fingerprint = get_loss_data_fingerprint(
+                loss_data, namespace=namespace + args.loss_cache_namespace
+            )
+        data_fingerprint = comm.bcast(data_fingerprint, root=0)
+        loss_cache = LossCache(
+            get_loss_cache_fname(args.loss_cache, rank),
+            data_fingerprint,
+            args.loss_cache_quantum * (XMAXS - XMINS),
+            max_entries=args.loss_cache_size,
+        )
+        loss_evaluator = get_cached_loss_evaluator(loss_evaluator, loss_cache)
+    n_chunks, n_points, busy_time = 0, 0, 0.0
+    # Calls to MPI-IO from a background thread would require MPI_THREAD_MULTIPLE
+    use_mpio = args.output == "hdf5" and writer.use_mpio
+    background_writer = None
+    if not (args.sync_write or use_mpio):
+        background_writer = BackgroundWriter()
+    written_seeds, written_fnames = [], []
+    reducer = None
+    if args.summary_json is not None:
+        reducer = ScanReducer(XMINS, XMAXS, n_best=args.n_top, n_bins=args.n_bins)
+        # The chunks completed before a resumed scan started are split among
+        # the ranks and read back, so that the summary covers the entire scan
+        with timer.phase("reduce"):
+            for seed in get_static_seeds(completed_seeds, rank, nranks):
+                if args.output == "hdf5":
+                    param_chunk, loss_arr = writer.read_chunk(seed)
+                else:
+                    param_chunk, loss_arr, __ = load_scan_results(completed[seed])
+                reducer.update(np.asarray(param_chunk, dtype=float), loss_arr)
+    best_params, best_loss = np.zeros((0, N_PARAMS)), np.zeros(0)
+    min_sigma = 1e-6 * (XMAXS - XMINS)
+    # Random rows of every chunk of every rank together give roughly
+    # n_train new training points for the surrogate in each round
+    n_train_per_chunk = -(-args.n_train // total_cubes)
+    train_params, train_loss = np.zeros((0, N_PARAMS)), np.zeros(0)
+    new_train_params, new_train_loss = [], []
+    surrogate = None
+    n_screened = 0
+    for iround in range(args.n_rounds):
+        # Each round uses its own block of seeds, so that every chunk of
+        # every round has a unique seed and a unique rank output file
+        round_seeds = total_seeds + iround * total_cubes
+        if iround == 0:
+            get_param_chunk = sample_chunk
+        else:
+            mu, cov = get_refinement_distribution(best_params, min_sigma=min_sigma)
+            transform = get_cov_transform(cov)
+            sig = args.sig * args.sig_shrink ** (iround - 1)
+
+            def get_param_chunk(seed):
+                if surrogate is None:
+                    return sample_refinement_round(
+                        mu,
+                        None,
+                        sig,
+                        n_per_chunk,
+                        XMINS,
+                        XMAXS,
+                        seed,
+                        transform=transform,
+                    )
+                n_candidates = args.prescreen * n_per_chunk
+                candidates = sample_refinement_round(
+                    mu,
+                    None,
+                    sig,
+                    n_candidates,
+                    XMINS,
+                    XMAXS,
+                    seed,
+                    transform=transform,
+                )
+                return prescreen_candidates(
+                    surrogate, candidates, n_per_chunk, args.explore_fraction
+                )
+
+        # Seeds map to chunks deterministically, and the static schedule gives each
+        # rank the same seeds as in the uninterrupted scan, so resumed output is
+        # identical to that of a scan that was never interrupted
+        if args.schedule == "static":
+            seeds_per_rank = get_static_seeds(round_seeds, rank, nranks)
+            seeds_per_rank = np.setdiff1d(seeds_per_rank, completed_seeds)
+        else:
+            remaining_seeds = np.setdiff1d(round_seeds, completed_seeds)
+            seeds_per_rank = iter_dynamic_seeds(
+                comm, remaining_seeds, root_computes=nranks < args.queue_nranks
+            )
+
+        for seed in seeds_per_rank:
+            chunk_start = time()
+            with timer.phase("sample"):
+                param_chunk = get_param_chunk(seed)
+            with timer.phase("evaluate"):
+                loss_arr = loss_evaluator(param_chunk, loss_data)
+            with timer.phase("write"):
+                if args.output == "hdf5":
+                    write_fn = writer.write_chunk
+                    write_args = (seed, param_chunk, loss_arr)
+                else:
+                    rank_outname = get_mpi_rank_outname(outname, rank, seed)
+                    write_fn = write_param_chunk
+                    write_args = (rank_outname, param_chunk, loss_arr, npy_param_dtype)
+                if background_writer is None:
+                    written_fnames.append(write_fn(*write_args))
+                else:
+                    background_writer.submit(write_fn, *write_args)
+                written_seeds.append(seed)
+            if reducer is not None:
+                with timer.phase("reduce"):
+                    reducer.update(param_chunk, loss_arr)
+            if args.prescreen > 1:
+                itrain = get_chunk_training_indices(
+                    param_chunk.shape[0], n_train_per_chunk, seed
+                )
+                new_train_params.append(param_chunk[itrain])
+                new_train_loss.append(loss_arr[itrain])
+                if surrogate is not None:
+                    n_screened += (args.prescreen - 1) * param_chunk.shape[0]
+            if args.n_rounds > 1:
+                with timer.phase("select"):
+                    best_params, best_loss = select_best_k(
+                        np.concatenate((best_params, param_chunk)),
+                        np.concatenate((best_loss, loss_arr)),
+                        args.n_best,
+                    )
+            n_chunks += 1
+            n_points += param_chunk.shape[0]
+            busy_time += time() - chunk_start
 
-    comm.Barrier()
+        if args.n_rounds > 1:
+            with timer.phase("barrier"):
+                best_params, best_loss = gather_best_k(
+                    comm, best_params, best_loss, args.n_best
+                )
+            if rank == 0:
+                msg = "...round {0}: lowest loss = {1:.4g} after {2} evaluations"
+                n_evaluated = (iround + 1) * total_cubes * n_per_chunk
+                print(msg.format(iround, best_loss[0], n_evaluated))
+            if best_loss[0] < args.target_loss:
+                break
+        # The surrogate is fitted once on rank 0 and broadcast to every rank
+        if args.prescreen > 1 and iround < args.n_rounds - 1:
+            with timer.phase("fit"):
+                collector = comm.gather((new_train_params, new_train_loss), root=0)
+                new_train_params, new_train_loss = [], []
+                surrogate = None
+                if rank == 0:
+                    train_params, train_loss = select_training_points(
+                        np.concatenate(
+                            [train_params] + sum([x[0] for x in collector], [])
+                        ),
+                        np.concatenate(
+                            [train_loss] + sum([x[1] for x in collector], [])
+                        ),
+                        args.n_train,
+                        seed=iround,
+                    )
+                    surrogate = fit_surrogate(train_params, train_loss, XMINS, XMAXS)
+                    if surrogate is None:
+                        msg = "...too few points to fit the surrogate, round {0} "
+                        msg += "is not prescreened"
+                        print(msg.format(iround + 1))
+                surrogate = comm.bcast(surrogate, root=0)
+
+    with timer.phase("write"):
+        if background_writer is not None:
+            written_fnames = background_writer.close()
+        if args.output == "hdf5":
+            writer.close()
+    free_shared_windows(loss_data_windows)
+    with timer.phase("barrier"):
+        comm.Barrier()
+    end = time()
+    report = get_utilization_report(comm, n_chunks, busy_time, end - start)
+    written = comm.gather([(rank, *x) for x in zip(written_seeds, written_fnames)])
+    if loss_cache is not None:
+        loss_cache.close()
+        cache_counts = comm.reduce(
+            np.array((loss_cache.hits, loss_cache.misses)), op=MPI.SUM, root=0
+        )
+    prescreen_counts = comm.reduce(
+        np.array((n_screened, n_points)), op=MPI.SUM, root=0
+    )
+    if reducer is not None:
+        with timer.phase("reduce"):
+            reducer = reducer.reduce(comm)
+        if rank == 0:
+            summary = reducer.get_summary(get_param_names())
+            with open(args.summary_json, "w") as fout:
+                json.dump(summary, fout)
+            msg = "...wrote summary of {0} points with lowest loss {1:.4g} to `{2}`"
+            best_loss = summary["best_loss"][0] if summary["n_finite"] else np.nan
+            print(msg.format(summary["n_points"], best_loss, args.summary_json))
     if rank == 0:
-        end = time()
         runtime = end - start
-        print("\n...writing collated data to `{0}`".format(outname))
+        print(report)
+        if loss_cache is not None:
+            n_hits, n_misses = cache_counts
+            msg = "...loss cache: {0} hits, {1} misses, hit rate = {2:.1%}"
+            print(msg.format(n_hits, n_misses, n_hits / max(n_hits + n_misses, 1)))
+        if args.prescreen > 1:
+            n_screened, n_evaluated = prescreen_counts
+            msg = "...prescreen saved {0} evaluations, evaluating {1} of {2} candidates"
+            print(msg.format(n_screened, n_evaluated, n_screened + n_evaluated))
         msg = "For {0} total points with {1} ranks, wall-clock time = {2:.1f} seconds\n"
-        print(msg.format(n_tot, nranks, runtime))
-        cleanup_and_collate(outname)
+        if args.output == "npy":
+            print("\n...writing collated data to `{0}`".format(outname))
+            print(msg.format(n_tot, nranks, runtime))
+            # Files of a resumed scan also include those of the interrupted run,
+            # but not stray files of other scans with the same outname.
+            # Sorting by seed alone keeps the row order reproducible with the
+            # dynamic schedule, where the rank computing each seed varies
+            written = sum(written, []) + [(0, *x) for x in completed.items()]
+            written = sorted(written, key=lambda x: x[1])
+            rank_fnames = [x[2] for x in written]
+            with timer.phase("collate"):
+                cleanup_and_collate(outname, rank_fnames)
+        else:
+            print(msg.format(n_tot, nranks, runtime))
+
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats(get_profile_fname(outname, rank))
+    summary = gather_timing_summary(comm, timer, n_points, time() - start)
+    if rank == 0 and args.timing_json is not None:
+        write_timing_summary(summary, args.timing_json)
+        print("...wrote timing summary to `{0}`".format(args.timing_json))